@@ -69,20 +69,77 @@ export default function BoQPage({ darkMode, setDarkMode }) {
     }, [darkMode]);
 
     useEffect(() => {
+        // The BoQ is generated in the background once the conversation completes:
+        // use that table if it is ready or being generated, null if there is none
+        const fetchStoredBoQ = async () => {
+            for (let attempt = 0; attempt < 30; attempt++) {
+                const res = await fetch(`http://localhost:8000/boq/${sessionId}/result?format=json`);
+                if (res.status === 202) {
+                    const wait = Number(res.headers.get('Retry-After')) || 2;
+                    await new Promise(resolve => setTimeout(resolve, wait * 1000));
+                    continue;
+                }
+                if (!res.ok) return null;
+                return (await res.json()).table;
+            }
+            return null;
+        };
+
         const fetchBoQ = async () => {
             try {
-                const res = await fetch(`http://localhost:8000/create_boq/${sessionId}`, {
+                const stored = await fetchStoredBoQ();
+                if (stored?.rows.length) {
+                    showBoQ(stored);
+                    return;
+                }
+
+                // No background result: stream the table as it is generated instead of waiting for the full completion
+                const res = await fetch(`http://localhost:8000/create_boq/${sessionId}/stream`, {
                     method: 'POST',
                 });
 
-                const data = await res.json();
-
                 if (!res.ok) {
+                    const data = await res.json();
                     throw new Error(data.detail || 'Failed to generate BoQ');
                 }
 
-                if (data.agent_message) {
-                    parseBoQ(data.agent_message);
+                const reader = res.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                let markdown = '';
+                let finalMessage = null;
+
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+
+                    // SSE events are separated by a blank line
+                    const events = buffer.split('\n\n');
+                    buffer = events.pop();
+
+                    for (const raw of events) {
+                        const event = raw.match(/^event: (.*)$/m)?.[1];
+                        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+
+                        if (event === 'token') {
+                            markdown += data.text;
+                            // Render complete rows only, once the table has started
+                            const complete = markdown.slice(0, markdown.lastIndexOf('\n') + 1);
+                            if (/^\s*\|/m.test(complete)) {
+                                parseBoQ(complete);
+                                setLoading(false);
+                            }
+                        } else if (event === 'done') {
+                            finalMessage = data.agent_message;
+                        } else if (event === 'error') {
+                            throw new Error(data.detail || 'Failed to generate BoQ');
+                        }
+                    }
+                }
+
+                if (finalMessage) {
+                    parseBoQ(finalMessage);
                 } else {
                     setError('No BoQ data available.');
                 }
@@ -99,7 +156,6 @@ export default function BoQPage({ darkMode, setDarkMode }) {
     const parseBoQ = (markdown) => {
         // Basic Markdown Table Parser
         const lines = markdown.trim().split('\n');
-        const rows = [];
 
         // Filter out separator lines
         const dataLines = lines.filter(line =>
@@ -113,54 +169,63 @@ export default function BoQPage({ darkMode, setDarkMode }) {
                 .map(cell => cell.trim())
                 .filter(cell => cell !== '');
 
-            // Find the index of "Budgetary Pricing per unit" column
-            const budgetaryPricingIndex = headers.findIndex(h =>
-                h.toLowerCase().includes('budgetary pricing per unit')
-            );
-
-            // Find the index of "Qty/Value" column
-            const qtyValueIndex = headers.findIndex(h =>
-                h.toLowerCase().includes('qty') || h.toLowerCase().includes('value')
-            );
-
-            // Insert "Total Budgetary Pricing" header after "Budgetary Pricing per unit"
-            if (budgetaryPricingIndex !== -1) {
-                headers.splice(budgetaryPricingIndex + 1, 0, 'Total Budgetary Pricing');
-            }
-
             // Data rows
-            for (let i = 1; i < dataLines.length; i++) {
-                const cleanCells = dataLines[i]
+            const rows = dataLines.slice(1)
+                .map(line => line
                     .split('|')
                     .slice(1, -1)
-                    .map(c => c.trim().replace(/\*\*/g, '')); // Remove markdown bold
-
-                if (cleanCells.length > 0) {
-                    // Calculate Total Budgetary Pricing if both columns exist
-                    if (budgetaryPricingIndex !== -1 && qtyValueIndex !== -1) {
-                        const qtyValue = parseFloat(cleanCells[qtyValueIndex]?.replace(/[^0-9.-]/g, '') || 0);
-                        const budgetaryPrice = parseFloat(cleanCells[budgetaryPricingIndex]?.replace(/[^0-9.-]/g, '') || 0);
-                        const product = qtyValue * budgetaryPrice;
-
-                        // Display "-" if the product is NaN or if either value is 0
-                        // Otherwise, show whole numbers without decimals, or with decimals only if non-zero
-                        let totalBudgetaryPricing = '-';
-                        if (!isNaN(product) && product !== 0) {
-                            totalBudgetaryPricing = product % 1 === 0 ? product.toString() : product.toFixed(2);
-                        }
+                    .map(c => c.trim().replace(/\*\*/g, ''))) // Remove markdown bold
+                .filter(cells => cells.length > 0);
 
-                        // Insert the calculated value after budgetary pricing column
-                        cleanCells.splice(budgetaryPricingIndex + 1, 0, totalBudgetaryPricing);
-                    }
+            showBoQ({ headers, rows });
+        } else {
+            setError("BoQ format not recognized as a table.");
+        }
+    };
 
-                    rows.push(cleanCells);
+    // Table as parsed from markdown, or as sent by /boq/{id}/result?format=json
+    const showBoQ = (table) => {
+        const headers = [...table.headers];
+
+        // Find the index of "Budgetary Pricing per unit" column
+        const budgetaryPricingIndex = headers.findIndex(h =>
+            h.toLowerCase().includes('budgetary pricing per unit')
+        );
+
+        // Find the index of "Qty/Value" column
+        const qtyValueIndex = headers.findIndex(h =>
+            h.toLowerCase().includes('qty') || h.toLowerCase().includes('value')
+        );
+
+        // Insert "Total Budgetary Pricing" header after "Budgetary Pricing per unit"
+        if (budgetaryPricingIndex !== -1) {
+            headers.splice(budgetaryPricingIndex + 1, 0, 'Total Budgetary Pricing');
+        }
+
+        const rows = table.rows.map(row => {
+            const cleanCells = [...row];
+
+            // Calculate Total Budgetary Pricing if both columns exist
+            if (budgetaryPricingIndex !== -1 && qtyValueIndex !== -1) {
+                const qtyValue = parseFloat(cleanCells[qtyValueIndex]?.replace(/[^0-9.-]/g, '') || 0);
+                const budgetaryPrice = parseFloat(cleanCells[budgetaryPricingIndex]?.replace(/[^0-9.-]/g, '') || 0);
+                const product = qtyValue * budgetaryPrice;
+
+                // Display "-" if the product is NaN or if either value is 0
+                // Otherwise, show whole numbers without decimals, or with decimals only if non-zero
+                let totalBudgetaryPricing = '-';
+                if (!isNaN(product) && product !== 0) {
+                    totalBudgetaryPricing = product % 1 === 0 ? product.toString() : product.toFixed(2);
                 }
+
+                // Insert the calculated value after budgetary pricing column
+                cleanCells.splice(budgetaryPricingIndex + 1, 0, totalBudgetaryPricing);
             }
 
-            setBoqData({ headers, rows });
-        } else {
-            setError("BoQ format not recognized as a table.");
-        }
+            return cleanCells;
+        });
+
+        setBoqData({ headers, rows });
     };
 
     if (loading) {
@@ -63,11 +63,14 @@ export default function SummaryPage({ darkMode, setDarkMode }) {
   useEffect(() => {
     const fetchSession = async () => {
       try {
-        const res = await fetch(`http://localhost:8000/session/${sessionId}`);
+        // Only the summary is shown: skip the history and take the table already parsed
+        const res = await fetch(`http://localhost:8000/session/${sessionId}?limit=0&format=json`);
         if (!res.ok) throw new Error('Failed to load session');
         const data = await res.json();
 
-        if (data.next_response) {
+        if (data.summary_table?.rows.length) {
+          setSummaryData(data.summary_table);
+        } else if (data.next_response) {
           parseSummary(data.next_response);
         } else {
           setError('No summary available yet.');
@@ -0,0 +1,181 @@
+#answer_validator.py
+"""
+Local answer checks: numeric and yes/no parsing of a reply to one of
+prompts.QUESTIONS, using the BOQ engine's extraction rules.
+
+A reply that reads cleanly and is plausible is recorded without an LLM round
+trip. Anything the patterns cannot read (free text, per-building breakdowns)
+goes to the model as before.
+"""
+import os
+import re
+from typing import Dict, List, Literal, Optional, Tuple
+from pydantic import BaseModel
+from prompts import QUESTIONS, QUESTION_IDS, question_label, format_recorded
+from boq_engine import (CATALOG, CatalogItem, NUMBER, Q_AREA_DETAILS, Q_OFFICE_HARDWARE, Q_ACCOMMODATION_HARDWARE,
+                        extract_value, is_none_answer)
+
+LOCAL_VALIDATION = os.getenv("LOCAL_VALIDATION", "1").lower() not in ("0", "false", "no", "off")
+
+# General questions that have no BOQ row of their own
+Q_BUILDINGS = 0
+Q_NEOM_NETWORK = 1
+
+# Value kinds the patterns read reliably; questions with any other kind always go to the LLM
+CHECKED_KINDS = ("count", "yes_no", "calling", "selection", "coordinates")
+
+# Values read from each question: its catalog rows, plus the general questions
+FIELDS: Dict[int, List[CatalogItem]] = {
+    Q_BUILDINGS: [CatalogItem(key="buildings", section="", description="Number of buildings",
+                              source=Q_BUILDINGS, keywords=(r"buildings?",))],
+    Q_NEOM_NETWORK: [CatalogItem(key="neom_network", section="", description="Neom Network connectivity",
+                                 kind="yes_no", source=Q_NEOM_NETWORK, keywords=(r"neom",))],
+}
+for _item in CATALOG:
+    if _item.source is not None:
+        FIELDS.setdefault(_item.source, []).append(_item)
+
+# Rows an answer may leave out ("Any other types?")
+OPTIONAL_FIELDS = {"other_phone"}
+# Asked per building: with more than one building the LLM collects the breakdown
+PER_BUILDING = {Q_AREA_DETAILS, Q_OFFICE_HARDWARE, Q_ACCOMMODATION_HARDWARE}
+
+# Quantities accepted without asking for confirmation, as (min, max)
+LIMITS = {"buildings": (1, 50)}
+DEFAULT_LIMITS = (0, 5000)
+
+# Ranges and estimates ("30-40", "around 50") need confirmation, as do questions back
+ESTIMATE = re.compile(r"\d\s*(?:-|–|to)\s*\d|\b(?:around|about|approx\w*|roughly|maybe|not sure|tbd|tbc)\b|~|\?",
+                      re.IGNORECASE)
+# Tentative answers ("probably", "I think") are confirmed with the user rather than recorded as given
+HEDGE = re.compile(r"\b(?:probably|likely|possibly|perhaps|might|i think|i guess|i believe|depends|"
+                   r"not (?:yet )?(?:decided|confirmed)|undecided)\b", re.IGNORECASE)
+NOT_PROVIDED = re.compile(r"\W*(?:not provided(?: by user)?|unknown|\[not provided\])?\W*", re.IGNORECASE)
+
+
+class AnswerCheck(BaseModel):
+    """Outcome of checking one answer locally"""
+    status: Literal["accepted", "unreadable", "unclear", "implausible"]
+    values: Dict[str, object] = {}   # parsed values by catalog key
+    note: str = ""                   # why the answer was not accepted
+    normalized: Optional[str] = None  # answer to record instead of the reply (yes/no questions)
+
+    def recorded(self, text: str) -> str:
+        return self.normalized if self.normalized is not None else text.strip()
+
+
+def next_question(answers: Dict[str, str]) -> Optional[int]:
+    """Index of the first question without a recorded answer, or None when all are answered"""
+    return next((i for i, qid in enumerate(QUESTION_IDS) if qid not in answers), None)
+
+
+def asked(index: int, agent_message: str) -> bool:
+    """Whether an agent message asks question index (questions always carry their bold heading)"""
+    return f"**{question_label(QUESTIONS[index])}**" in agent_message
+
+
+def building_count(answers: Dict[str, str]) -> Optional[int]:
+    check = check_answer(Q_BUILDINGS, answers.get(QUESTION_IDS[Q_BUILDINGS], ""), {})
+    return check.values.get("buildings") if check.status == "accepted" else None
+
+
+def _describe(item: CatalogItem) -> str:
+    return item.description.split("<br>")[-1].replace("**", "").strip()
+
+
+def _read(item: CatalogItem, text: str, single_count: bool):
+    value = extract_value(item, text)
+    if value is None and single_count:
+        bare = re.fullmatch(rf"\W*{NUMBER}\W*", text)
+        value = int(bare.group(1).replace(",", "")) if bare else None
+    return value
+
+
+def check_answer(index: int, text: str, answers: Dict[str, str]) -> AnswerCheck:
+    """
+    Check a reply to question index against the answers recorded so far.
+    "accepted" means every value was read and is within limits; the answer
+    to a yes/no question is then recorded as plain "Yes" or "No".
+    """
+    fields = FIELDS.get(index, [])
+    text = text.strip()
+    if not text or not fields or any(item.kind not in CHECKED_KINDS for item in fields):
+        return AnswerCheck(status="unreadable", note="free-text question")
+    if index in PER_BUILDING and building_count(answers) != 1:
+        return AnswerCheck(status="unreadable", note="needs a per-building breakdown")
+    if ESTIMATE.search(text):
+        return AnswerCheck(status="unclear", note="a range or estimate")
+    if HEDGE.search(text):
+        return AnswerCheck(status="unclear", note="a tentative answer")
+
+    counts = [item for item in fields if item.kind == "count"]
+    values: Dict[str, object] = {}
+    if counts and len(counts) == len(fields) and is_none_answer(text):
+        values = {item.key: 0 for item in counts}
+    else:
+        for item in fields:
+            value = _read(item, text, single_count=len(fields) == 1 and item.kind == "count")
+            if value is None:
+                if item.key in OPTIONAL_FIELDS:
+                    continue
+                return AnswerCheck(status="unreadable", note=f"no value for {_describe(item)}")
+            values[item.key] = value
+
+    for item in counts:
+        low, high = LIMITS.get(item.key, DEFAULT_LIMITS)
+        value = values.get(item.key)
+        if value is not None and not low <= value <= high:
+            return AnswerCheck(status="implausible", values=values,
+                               note=f"{value} for {_describe(item)} is outside the expected range")
+    if "supervisors" in values and "seat_agents" in values and values["supervisors"] > values["seat_agents"]:
+        return AnswerCheck(status="implausible", values=values, note="more supervisors than seat agents")
+    if all(item.kind == "yes_no" for item in fields):
+        return AnswerCheck(status="accepted", values=values, normalized=str(values[fields[0].key]))
+    return AnswerCheck(status="accepted", values=values)
+
+
+def review_answers(given: Dict[str, str], answers: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, Tuple[str, AnswerCheck]]]:
+    """
+    Sort a bulk answer set (by question id) into answers to record and answers
+    to confirm with the user: unclear or implausible ones. Answers the patterns
+    cannot read are recorded as given. Empty and "not provided" answers are
+    left out, so those questions are asked as usual.
+    """
+    accepted, flagged = {}, {}
+    for index, qid in enumerate(QUESTION_IDS):
+        text = (given.get(qid) or "").strip()
+        if NOT_PROVIDED.fullmatch(text):
+            continue
+        # Checked in question order, so the building count is known for later questions
+        check = check_answer(index, text, {**answers, **accepted})
+        if check.status in ("unclear", "implausible"):
+            flagged[qid] = (text, check)
+        else:
+            accepted[qid] = check.recorded(text)
+    return accepted, flagged
+
+
+def format_intake(accepted: Dict[str, str], flagged: Dict[str, Tuple[str, AnswerCheck]]) -> str:
+    """Intake answers for the conversation prompt, one line per question"""
+    lines = []
+    for index, qid in enumerate(QUESTION_IDS):
+        if qid in accepted:
+            lines.append(format_recorded(index, accepted[qid]))
+        elif qid in flagged:
+            text, check = flagged[qid]
+            lines.append(format_recorded(index, f"NEEDS CONFIRMATION, user gave \"{text}\" ({check.note})"))
+    return "\n".join(lines)
+
+
+def intake_follow_up(recorded: int, index: int, flagged: Dict[str, Tuple[str, AnswerCheck]]) -> str:
+    """First follow-up after a bulk intake: what was recorded, then the first open question"""
+    if recorded:
+        intro = (f"Thanks, I've recorded answers to {recorded} of {len(QUESTIONS)} questions; "
+                 f"{len(QUESTIONS) - recorded} still need an answer.")
+    else:
+        intro = "Thanks. I couldn't find answers I could record in what you sent, so let's go through the questions."
+    qid = QUESTION_IDS[index]
+    if qid in flagged:
+        text, check = flagged[qid]
+        intro += f" For the next one you gave \"{text}\" ({check.note}); please confirm or correct it."
+    return f"{intro}\n\n{QUESTIONS[index]}"
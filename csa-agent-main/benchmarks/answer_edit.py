@@ -0,0 +1,90 @@
+# benchmarks/answer_edit.py
+"""
+Editing one answer of a completed session: PATCH /session/{id}/answers/{qid},
+which patches the generated BOQ in place, against regenerating the whole
+table for the new answers (what redoing the conversation ended with).
+
+Sessions are completed through /intake with the scripted answers, and their
+background BOQ job is awaited first. Each edit changes the Executive Phone
+quantity (Q5) or the video conferencing rooms (Q12). In engine mode the
+patched table is checked against a full engine render of the new answers.
+
+    python -m benchmarks.answer_edit --sessions 10 --latency 0.3 --tokens-per-sec 200
+"""
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+from prompts import QUESTION_IDS
+import fastapi_app
+
+EDITS = [
+    ("Q5", "Executive 7, Manager 15, Employee 100, Conference 3, no others"),
+    ("Q12", "Pods 2, Huddle 6, Small 2, Executive 1, Medium 1, Large 1, Board 1"),
+    ("Q5", "Executive 9, Manager 15, Employee 100, Conference 3, no others"),
+]
+
+
+async def completed_session(client: httpx.AsyncClient) -> str:
+    answers = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+    answers["Q1"] = "1 building"  # single building, so hardware answers are read without a breakdown
+    resp = (await client.post("/intake", json={"answers": answers})).json()
+    assert resp["status"] == "done", resp
+    session_id = resp["session_id"]
+    while (await client.get(f"/boq/{session_id}/result")).status_code == 202:
+        await asyncio.sleep(0.02)
+    return session_id
+
+
+async def run(mode: str, args) -> dict:
+    fastapi_app.BOQ_MODE = mode
+    edits, regenerations = [], []
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        sessions = await asyncio.gather(*(completed_session(client) for _ in range(args.sessions)))
+        for session_id in sessions:
+            for question_id, answer in EDITS:
+                start = time.perf_counter()
+                resp = await client.patch(f"/session/{session_id}/answers/{question_id}", json={"answer": answer})
+                edits.append(time.perf_counter() - start)
+                assert resp.status_code == 200, resp.text
+                body = resp.json()
+
+            state = await fastapi_app.validate_session(session_id)
+            start = time.perf_counter()
+            table = await fastapi_app.generate_boq_content(body["summary"], mode, state["answers"])
+            regenerations.append(time.perf_counter() - start)
+            patched = (await client.get(f"/boq/{session_id}/result")).json()["agent_message"]
+            if mode == "engine":
+                assert patched == table, "patched table differs from a full render"
+
+        # Refused edits: a range needs confirmation; a question id that does not exist
+        unclear = await client.patch(f"/session/{sessions[0]}/answers/Q5", json={"answer": "Executive around 10"})
+        unknown = await client.patch(f"/session/{sessions[0]}/answers/Q99", json={"answer": "1"})
+        assert (unclear.status_code, unknown.status_code) == (422, 404), (unclear.text, unknown.text)
+
+    return {
+        "edit_p50_ms": round(statistics.median(edits) * 1000, 2),
+        "edit_max_ms": round(max(edits) * 1000, 2),
+        "regenerate_p50_ms": round(statistics.median(regenerations) * 1000, 2),
+        "last_changes": [(c["key"], c["before"], c["after"]) for c in body["changes"]],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer edits: in-place BOQ patch vs full regeneration")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model latency (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="fake model output rate")
+    parser.add_argument("--modes", nargs="+", default=["engine", "hybrid", "llm"])
+    args = parser.parse_args()
+
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec))
+    for mode in args.modes:
+        result = asyncio.run(run(mode, args))
+        print(f"{mode:7s} edit p50 {result['edit_p50_ms']:8.2f} ms   max {result['edit_max_ms']:8.2f} ms   "
+              f"full regeneration p50 {result['regenerate_p50_ms']:9.2f} ms   last edit {result['last_changes']}")
@@ -0,0 +1,148 @@
+# benchmarks/batch.py
+"""
+Portfolio batch mode (boq_batch) against the fake model: items/sec at a range
+of pool sizes, resuming after the batch process is killed partway, and the
+/batch/boq endpoint.
+
+Items are the example summary tagged with their number, so they do not share
+one generation through the response cache. With --fail-rate, that share of
+items fails its first attempt, which exercises the per-item retries.
+
+    python -m benchmarks.batch --items 200 --concurrency 1 8 32 --tokens-per-sec 200
+"""
+import os
+import sys
+import json
+import time
+import signal
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import httpx
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.load import install_fake_model
+import boq_batch
+from create_boq import EXAMPLE_SUMMARY
+
+
+def write_items(path: str, count: int):
+    with open(path, "w") as f:
+        for n in range(count):
+            f.write(json.dumps({"id": f"site-{n}", "info_summary": f"{EXAMPLE_SUMMARY} (site {n})"}) + "\n")
+
+
+def flaky(generate, fail_rate: float, rng: random.Random):
+    """BOQ generator whose first call per item fails with probability fail_rate"""
+    seen = set()
+
+    async def generate_boq(info_summary, mode, answers=None):
+        if info_summary not in seen:
+            seen.add(info_summary)
+            if rng.random() < fail_rate:
+                raise TimeoutError("simulated provider timeout")
+        return await generate(info_summary, mode, answers)
+    return generate_boq
+
+
+def cli_args(input_path: str, output_path: str, args, concurrency: int) -> list:
+    return [input_path, "-o", output_path, "--mode", args.mode, "--concurrency", str(concurrency),
+            "--retry-delay", str(args.retry_delay)]
+
+
+def check_output(path: str, count: int):
+    """Every item ready exactly once"""
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    ids = [row["id"] for row in rows]
+    assert len(ids) == len(set(ids)), "duplicate rows"
+    assert {row["id"] for row in rows if row["status"] == "ready"} == {f"site-{n}" for n in range(count)}
+
+
+def run_child(args):
+    """Batch subcommand in this process, with the fake model installed"""
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec))
+    boq_batch.generate_boq = flaky(boq_batch.generate_boq, args.fail_rate, random.Random(os.getpid()))
+    parser = argparse.ArgumentParser()
+    boq_batch.add_arguments(parser)
+    sys.exit(asyncio.run(boq_batch.run_cli(parser.parse_args(args.child))))
+
+
+def throughput(workdir: str, args):
+    input_path = os.path.join(workdir, "items.jsonl")
+    write_items(input_path, args.items)
+    for concurrency in args.concurrency:
+        output_path = os.path.join(workdir, f"out-{concurrency}.jsonl")
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "benchmarks.batch", *child_options(args), "--child",
+                        *cli_args(input_path, output_path, args, concurrency)], check=True)
+        elapsed = time.perf_counter() - start
+        check_output(output_path, args.items)
+        print(f"concurrency {concurrency:4d}   {args.items} items in {elapsed:7.2f} s   "
+              f"{args.items / elapsed:7.2f} items/s (process start included)")
+
+
+def crash_and_resume(workdir: str, args):
+    """Kill the batch once a third of the items are written, then rerun it to completion"""
+    input_path = os.path.join(workdir, "items.jsonl")
+    output_path = os.path.join(workdir, "resumed.jsonl")
+    command = [sys.executable, "-m", "benchmarks.batch", *child_options(args), "--child",
+               *cli_args(input_path, output_path, args, max(args.concurrency))]
+    child = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    while child.poll() is None:
+        if os.path.exists(output_path) and os.path.getsize(output_path):
+            with open(output_path) as f:
+                if sum(1 for _ in f) >= args.items // 3:
+                    break
+        time.sleep(0.01)
+    child.send_signal(signal.SIGKILL)
+    child.wait()
+    with open(output_path) as f:
+        written = sum(1 for _ in f)
+    subprocess.run(command, check=True)
+    check_output(output_path, args.items)
+    print(f"killed after {written} rows, resumed: all {args.items} items ready exactly once")
+
+
+async def endpoint(args):
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec))
+    import fastapi_app
+    items = [{"id": f"site-{n}", "info_summary": f"{EXAMPLE_SUMMARY} (endpoint {n})"} for n in range(args.items)]
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        resp = await client.post("/batch/boq", json={"items": items, "mode": args.mode})
+        elapsed = time.perf_counter() - start
+        rows = [json.loads(line) for line in resp.text.splitlines()]
+        assert resp.status_code == 200 and len(rows) == args.items, resp.text[:200]
+        assert all(row["status"] == "ready" for row in rows)
+        resp = await client.post("/batch/boq", json={"items": items[:3], "mode": args.mode, "format": "csv"})
+        assert resp.text.startswith("id,status,"), resp.text[:200]
+    print(f"/batch/boq      {args.items} items in {elapsed:7.2f} s   {args.items / elapsed:7.2f} items/s "
+          f"(BATCH_CONCURRENCY={boq_batch.BATCH_CONCURRENCY})")
+
+
+def child_options(args) -> list:
+    return ["--latency", str(args.latency), "--tokens-per-sec", str(args.tokens_per_sec),
+            "--fail-rate", str(args.fail_rate)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portfolio batch throughput, crash resume and /batch/boq")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="pool sizes to compare")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model latency (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="fake model output rate")
+    parser.add_argument("--mode", default="llm", choices=("engine", "hybrid", "llm"))
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="share of items whose first attempt fails")
+    parser.add_argument("--retry-delay", type=float, default=0.2)
+    parser.add_argument("--child", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        throughput(workdir, args)
+        crash_and_resume(workdir, args)
+    asyncio.run(endpoint(args))
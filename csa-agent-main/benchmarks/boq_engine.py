@@ -0,0 +1,55 @@
+# benchmarks/boq_engine.py
+"""
+BOQ generation latency per mode, against the fake model.
+
+  llm     whole table written by the model (latency + output tokens at --tokens-per-sec)
+  hybrid  catalog engine; one small structured call only if a value is unreadable
+  engine  catalog engine only
+
+"free text" replaces one answer with wording the patterns cannot read, so hybrid
+has to make its fallback call.
+
+    python -m benchmarks.boq_engine --latency 0.5 --tokens-per-sec 60
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS, summary_table
+import create_boq
+import boq_engine
+import llm_registry
+
+
+async def time_mode(summary: str, mode: str, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await create_boq.generate_boq(summary, mode)
+        timings.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(timings) * 1000, "max_ms": max(timings) * 1000}
+
+
+async def run(latency: float, tokens_per_sec: float, runs: int):
+    fake = FakeChatModel(latency=latency, tokens_per_sec=tokens_per_sec)
+    llm_registry.register(fake)
+
+    free_text = list(SCRIPTED_ANSWERS)
+    free_text[4] = "A handful of executive sets, Manager 15, Employee 100, Conference 3, no others"
+    summaries = {"scripted": summary_table(), "free text": summary_table(free_text)}
+
+    for name, summary in summaries.items():
+        table = boq_engine.compute_boq(boq_engine.answers_from_summary(summary))
+        print(f"\n[{name}] {len(table.lines)} rows, unresolved: {', '.join(table.unresolved) or 'none'}")
+        for mode, mode_runs in (("llm", max(1, runs // 50)), ("hybrid", max(1, runs // 50)), ("engine", runs)):
+            result = await time_mode(summary, mode, mode_runs)
+            print(f"  {mode:7s} median {result['median_ms']:9.2f} ms   max {result['max_ms']:9.2f} ms   ({mode_runs} runs)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BOQ latency: LLM table vs catalog engine")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-sec", type=float, default=60)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.tokens_per_sec, args.runs))
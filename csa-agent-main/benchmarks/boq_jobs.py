@@ -0,0 +1,105 @@
+# benchmarks/boq_jobs.py
+"""
+Time from opening the BoQ page to having the table: generated on demand by
+/create_boq, or by the background job queued when the conversation completes
+(BOQ_ON_COMPLETION) and fetched from /boq/{id}/result the way BoQPage.jsx does.
+
+Users spend --read-time seconds on the summary page before opening the BoQ
+page. With --fail-rate, that share of jobs fails its first attempt, which
+exercises the retries. Each session's answers are tagged with its number, so
+sessions do not share one generation through the response cache's single-flight.
+
+    python -m benchmarks.boq_jobs --sessions 20 --tokens-per-sec 200 --read-time 2
+"""
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+import metrics
+import fastapi_app
+
+
+async def open_boq_page(client: httpx.AsyncClient, session_id: str, background: bool, mode: str) -> str:
+    if not background:
+        while True:  # a failed generation is retried by the user reloading the page
+            resp = await client.post(f"/create_boq/{session_id}?mode={mode}")
+            if resp.status_code == 200:
+                return resp.json()["agent_message"]
+    while True:
+        resp = await client.get(f"/boq/{session_id}/result")
+        if resp.status_code != 202:
+            resp.raise_for_status()
+            return resp.json()["agent_message"]
+        await asyncio.sleep(0.05)  # BoQPage waits Retry-After; poll faster to measure readiness
+
+
+async def run_session(client: httpx.AsyncClient, n: int, args, background: bool, waits: list):
+    resp = (await client.post("/start")).json()
+    session_id = resp["session_id"]
+    for answer in SCRIPTED_ANSWERS:
+        if resp["status"] == "done":
+            break
+        resp = (await client.post(f"/chat/{session_id}", json={"message": f"{answer} (site {n})"})).json()
+    await asyncio.sleep(args.read_time)
+    start = time.perf_counter()
+    table = await open_boq_page(client, session_id, background, args.mode)
+    waits.append(time.perf_counter() - start)
+    assert table.startswith("|") or "BOQ" in table, table[:200]
+
+
+def flaky(generate, fail_rate: float, rng: random.Random):
+    """BOQ generator whose first call per session fails with probability fail_rate"""
+    seen = set()
+
+    async def generate_boq(info_summary, mode, answers=None):
+        if info_summary not in seen:
+            seen.add(info_summary)
+            if rng.random() < fail_rate:
+                raise TimeoutError("simulated provider timeout")
+        return await generate(info_summary, mode, answers)
+    return generate_boq
+
+
+async def run(background: bool, args) -> dict:
+    fastapi_app.BOQ_ON_COMPLETION = background
+    fastapi_app.BOQ_MODE = args.mode
+    counters = dict(metrics.BOQ_JOBS.series)
+    waits: list = []
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    fastapi_app.boq_jobs.workers = args.workers  # read when the lifespan starts the queue
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        fastapi_app.boq_jobs.retry_delay = args.retry_delay
+        await asyncio.gather(*(run_session(client, n, args, background, waits) for n in range(args.sessions)))
+    waits.sort()
+    return {
+        "p50_s": round(statistics.median(waits), 3),
+        "p95_s": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3),
+        "jobs": {k[0]: v - counters.get(k, 0) for k, v in metrics.BOQ_JOBS.series.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BoQ page wait: on-demand generation vs background jobs")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model latency (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="fake model output rate")
+    parser.add_argument("--read-time", type=float, default=2.0, help="seconds on the summary page")
+    parser.add_argument("--mode", default="llm", choices=("engine", "hybrid", "llm"))
+    parser.add_argument("--fail-rate", type=float, default=0.2, help="share of jobs whose first attempt fails")
+    parser.add_argument("--retry-delay", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=fastapi_app.boq_jobs.workers, help="BOQ job workers")
+    args = parser.parse_args()
+
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec))
+    generate = fastapi_app.generate_boq_content
+    for background in (False, True):
+        fastapi_app.generate_boq_content = flaky(generate, args.fail_rate, random.Random(1))
+        result = asyncio.run(run(background, args))
+        name = "background job" if background else "on demand"
+        print(f"{name:15s} BoQ page wait p50 {result['p50_s']:6.3f} s   p95 {result['p95_s']:6.3f} s"
+              + (f"   jobs {result['jobs']}" if background else ""))
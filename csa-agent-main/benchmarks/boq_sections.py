@@ -0,0 +1,83 @@
+# benchmarks/boq_sections.py
+"""
+LLM-mode BOQ generation as one call for the whole table against one
+concurrent call per BOQ section (create_boq.BOQ_SECTION_CALLS), merged in
+section order.
+
+The fake model answers with the prompt's example table filled in, at a fixed
+token rate, so a call's duration follows the rows it writes. Each run
+streams the BOQ (stream_boq, as /create_boq/{id}/stream does) and reports
+time to the first table row and to the whole table, model calls and output
+tokens. Runs are done with every section answered and with the call center
+declined. The single call is not told which sections to leave out, so it
+writes all four. With every section answered, the merged table is checked to
+hold the single call's rows in the same order.
+
+    python -m benchmarks.boq_sections --runs 5 --latency 0.5 --tokens-per-sec 60
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS, summary_table
+from benchmarks.load import install_fake_model
+from boq_engine import table_rows, is_data_row
+import create_boq
+import metrics
+
+NO_CALL_CENTER = SCRIPTED_ANSWERS[:9] + ["None", "None"] + SCRIPTED_ANSWERS[11:]
+
+
+def llm_calls() -> int:
+    return sum(series[-1] for series in metrics.LLM_SECONDS.series.values())
+
+
+def output_tokens() -> float:
+    return sum(value for key, value in metrics.LLM_TOKENS.series.items() if key[1] == "output")
+
+
+async def timed_boq(info_summary: str) -> dict:
+    start = time.perf_counter()
+    first_row, parts = None, []
+    async for chunk in create_boq.stream_boq(info_summary, "llm"):
+        parts.append(chunk)
+        text = "".join(parts)
+        # Rows count once complete, as the BOQ page renders them
+        if first_row is None and any(is_data_row(line) for line in text[:text.rfind("\n") + 1].splitlines()):
+            first_row = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"first_row": first_row or total, "total": total, "table": "".join(parts)}
+
+
+async def run(info_summary: str, sectioned: bool, runs: int) -> dict:
+    create_boq.BOQ_SECTION_CALLS = sectioned
+    calls, tokens = llm_calls(), output_tokens()
+    results = [await timed_boq(info_summary) for _ in range(runs)]
+    return {
+        "first_row": statistics.median(r["first_row"] for r in results),
+        "total": statistics.median(r["total"] for r in results),
+        "calls": (llm_calls() - calls) / runs,
+        "tokens": (output_tokens() - tokens) / runs,
+        "table": results[-1]["table"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BOQ generation: one call vs one concurrent call per section")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model time to first token (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=60, help="fake model output rate")
+    args = parser.parse_args()
+
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec, echo_template=True))
+    for name, answers in (("all sections", SCRIPTED_ANSWERS), ("no call center", NO_CALL_CENTER)):
+        info_summary = summary_table(answers)
+        single = asyncio.run(run(info_summary, False, args.runs))
+        sections = asyncio.run(run(info_summary, True, args.runs))
+        if answers is SCRIPTED_ANSWERS:
+            rows = [[key for _, _, key, _ in table_rows(r["table"])] for r in (single, sections)]
+            assert rows[0] == rows[1], rows
+        for path, result in (("single call", single), ("per section", sections)):
+            print(f"{name:15s} {path:12s} first row {result['first_row']:6.2f} s   total {result['total']:6.2f} s   "
+                  f"calls {result['calls']:3.0f}   output tokens {result['tokens']:6.0f}")
+        print(f"{'':15s} speedup {single['total'] / sections['total']:.2f}x")
@@ -0,0 +1,248 @@
+# benchmarks/fake_llm.py
+import os
+import time
+import json
+import re
+import random
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+import anyio
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+# Dummy credentials in case anything reaches the real model factory (nothing does at import time)
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.openai.azure.com/")
+# Scripted conversations repeat exactly, so a response cache would turn every
+# model call after the first into a hit; benchmarks measure the model path
+os.environ.setdefault("RESPONSE_CACHE", "off")
+
+from prompts import QUESTIONS, QUESTION_IDS, SECTIONS, render_summary_table
+
+# One scripted user answer per entry in prompts.QUESTIONS
+SCRIPTED_ANSWERS = [
+    "3 buildings",
+    "Yes",
+    "Offices and Accommodations",
+    "Offices: A 10, B 5, C 5. Accommodations: A 0, B 50, C 50. No other areas.",
+    "Executive 5, Manager 15, Employee 100, Conference 3, no others",
+    "Living Room 100, Bed Room 200, Wash Room 0",
+    "Yes voice mail, Internal and External calls",
+    "25.276987, 55.296249; 50 DIDs and 30 channels",
+    "Local, Mobile, International",
+    "Supervisors 2, Seat Agents 10, Concurrent Calls 15",
+    "Yes, recordings with 6 months storage, IVR and reporting",
+    "Pods 2, Huddle 4, Small 2, Executive 1, Medium 1, Large 1, Board 1",
+]
+
+FAKE_BOQ = "## BOQ\n| Services | Requirements / Description | Qty/Value | Budgetary pricing per unit |\n| :--- | :--- | :--- | :--- |\n" + \
+    "\n".join(f"| **Item {i}** | Scripted line item | {i} | 1000 |" for i in range(1, 41))
+
+
+# Answers recorded by question id (bulk intake, earlier sections), not those awaiting confirmation
+RECORDED_LINE = re.compile(r"^- Q(\d+) \([^)]*\): (?!NEEDS CONFIRMATION)", re.MULTILINE)
+# Compact-mode answered-so-far lines, oldest answers first
+ANSWERED_LINE = re.compile(r"^- (?:.* — )?answered: ", re.MULTILINE)
+# Start of each transcript message
+TRANSCRIPT_MESSAGE = re.compile(r"^(User|AI Assistant): ", re.MULTILINE)
+# Section prompts: the current section, and what to ask once its questions are answered
+CURRENT_SECTION = re.compile(r"^=== CURRENT SECTION: (.+) ===$", re.MULTILINE)
+AFTER_SECTION = re.compile(r"^=== AFTER THIS SECTION ===\n(.*?)\n\n===", re.MULTILINE | re.DOTALL)
+
+
+def _message_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def summary_table(answers: List[str] = SCRIPTED_ANSWERS) -> str:
+    """Final summary for the given answers, as the chat node renders it"""
+    return render_summary_table(dict(zip(QUESTION_IDS, answers)))
+
+
+def asked_question(text: str) -> Optional[int]:
+    """Index of the question an agent message asks (questions are asked verbatim)"""
+    return next((i for i in range(len(QUESTIONS) - 1, -1, -1) if QUESTIONS[i] in text), None)
+
+
+def scripted_turn(messages: List[BaseMessage]) -> dict:
+    """
+    Next LLM_Response for a conversation: records the reply to the question
+    just asked, then asks the first question the prompt shows no answer for
+    (for a section prompt, the first of the section's, then the one after it)
+    """
+    text = _message_text(messages)
+    recorded = {int(n) - 1 for n in RECORDED_LINE.findall(text)}
+    for _ in ANSWERED_LINE.findall(text):
+        recorded.add(min(set(range(len(QUESTIONS))) - recorded))
+    parts = TRANSCRIPT_MESSAGE.split(text)
+    asked = answer = None
+    for role, body in zip(parts[1::2], parts[2::2]):
+        if role == "User":
+            answer = asked
+            if asked is not None:
+                recorded.add(asked)
+        else:
+            asked, answer = asked_question(body), None
+    recorded_now = [{"question_id": QUESTION_IDS[answer], "answer": SCRIPTED_ANSWERS[answer]}] \
+        if answer is not None else []
+    following = next((i for i in range(len(QUESTIONS)) if i not in recorded), None)
+    section = CURRENT_SECTION.search(text)
+    if section:
+        following = next((i for i in SECTIONS[section.group(1)] if i not in recorded), None)
+        if following is None:
+            following = asked_question(AFTER_SECTION.search(text).group(1))
+    if following is None:
+        return {"status": "done", "next_response": "", "answers": recorded_now, "progress": 100}
+    return {
+        "status": "not done",
+        "next_response": QUESTIONS[following],
+        "answers": recorded_now,
+        "progress": int(len(recorded) * 100 / len(QUESTIONS)),
+    }
+
+
+def intake_extraction(messages: List[BaseMessage]) -> dict:
+    """IntakeExtraction for a pasted document: every scripted answer that appears in it"""
+    document = str(messages[-1].content)
+    return {"answers": [{"question_id": qid, "answer": answer}
+                        for qid, answer in zip(QUESTION_IDS, SCRIPTED_ANSWERS) if answer in document]}
+
+
+# Placeholders of the BOQ example table, filled in by echo_template models
+PLACEHOLDER = re.compile(r"\[(?:Value|Yes/No|Selection)\]")
+
+
+def filled_template(messages: List[BaseMessage]) -> str:
+    """BOQ for a plain call: the prompt's example table (whole, or one section's) with every placeholder filled in"""
+    example = _message_text(messages).split("**Example Format:**", 1)[-1]
+    lines = [line.strip() for line in example.strip().splitlines() if line.strip().startswith(("|", "## "))]
+    return "\n".join(PLACEHOLDER.sub("7", line) for line in lines)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Stand-in for the Azure chat model: scripted responses with injected latency.
+    Structured calls (with_structured_output / response_format) get an LLM_Response JSON,
+    plain calls get a BOQ table. With tokens_per_sec set, output takes
+    latency (time to first token) + tokens / tokens_per_sec, and streams at that rate.
+    With quota_tpm set, calls beyond that many tokens per minute fail with a 429
+    RateLimitError carrying retry-after-ms, like Azure OpenAI. With malformed_rate set,
+    that share of structured responses is cut short, so they fail to parse (a sloppy small model).
+    With echo_template, plain calls answer with the prompt's example table filled in, so the
+    output length follows the prompt (a per-section BOQ call writes only its section).
+    """
+    latency: float = 0.5        # seconds per call (time to first token)
+    jitter: float = 0.0         # +/- seconds of uniform noise
+    blocking: bool = False      # sleep on a worker thread like a sync HTTP client would
+    tokens_per_sec: float = 0.0 # 0 = output arrives instantly after latency
+    chars_per_token: int = 4
+    seed: Optional[int] = None  # fixed seed makes the jitter sequence reproducible
+    quota_tpm: float = 0.0      # provider tokens-per-minute quota, 0 = unlimited
+    malformed_rate: float = 0.0 # share of structured responses returned as truncated JSON
+    echo_template: bool = False # plain calls: the prompt's example table filled in, instead of FAKE_BOQ
+    _rng: random.Random = PrivateAttr(default_factory=random.Random)
+    _quota: list = PrivateAttr(default_factory=lambda: [None, 0.0])  # [tokens left, last refill]
+    rate_limited_calls: int = 0
+
+    def model_post_init(self, context: Any):
+        super().model_post_init(context)
+        self._rng.seed(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _tokens(self, content: str) -> List[str]:
+        step = self.chars_per_token
+        return [content[i:i + step] for i in range(0, len(content), step)]
+
+    def _usage(self, messages: List[BaseMessage], content: str) -> dict:
+        """Token usage as a provider would report it (chars_per_token approximation)"""
+        input_tokens = sum(len(str(m.content)) for m in messages) // self.chars_per_token
+        output_tokens = len(self._tokens(content))
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _check_quota(self, messages: List[BaseMessage], content: str):
+        """Charge the call against quota_tpm, or raise a 429 saying when it would fit"""
+        if not self.quota_tpm:
+            return
+        usage = self._usage(messages, content)["total_tokens"]
+        now = time.monotonic()
+        tokens, updated = self._quota
+        rate = self.quota_tpm / 60
+        tokens = self.quota_tpm if tokens is None else min(self.quota_tpm, tokens + (now - updated) * rate)
+        if tokens < usage:
+            self._quota[:] = [tokens, now]
+            self.rate_limited_calls += 1
+            wait_ms = int((usage - tokens) / rate * 1000) + 1
+            response = httpx.Response(429, headers={"retry-after-ms": str(wait_ms)},
+                                      request=httpx.Request("POST", "https://benchmark.openai.azure.com/"))
+            raise openai.RateLimitError("Requests to the deployment have exceeded the token rate limit",
+                                        response=response, body=None)
+        self._quota[:] = [tokens - usage, now]
+
+    def _generation_time(self, content: str) -> float:
+        if not self.tokens_per_sec:
+            return 0.0
+        return len(self._tokens(content)) / self.tokens_per_sec
+
+    def _content(self, messages: List[BaseMessage], **kwargs: Any) -> str:
+        if kwargs.get("schema") == "IntakeExtraction":
+            return json.dumps(intake_extraction(messages))
+        if kwargs.get("schema") or kwargs.get("response_format"):
+            content = json.dumps(scripted_turn(messages))
+            if self.malformed_rate and self._rng.random() < self.malformed_rate:
+                return content[:len(content) // 2]
+            return content
+        return filled_template(messages) if self.echo_template else FAKE_BOQ
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._content(messages, **kwargs)
+        self._check_quota(messages, content)
+        time.sleep(self._delay() + self._generation_time(content))
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._content(messages, **kwargs)
+        self._check_quota(messages, content)
+        delay = self._delay() + self._generation_time(content)
+        if self.blocking:
+            # Holds a threadpool slot for the whole call, like the old sync endpoints did
+            await anyio.to_thread.run_sync(time.sleep, delay)
+        else:
+            await asyncio.sleep(delay)
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        content = self._content(messages, **kwargs)
+        self._check_quota(messages, content)
+        await asyncio.sleep(self._delay())
+        start = time.perf_counter()
+        tokens = self._tokens(content)
+        for n, token in enumerate(tokens, 1):
+            if self.tokens_per_sec:
+                # Sleep to an absolute deadline so timer overhead doesn't accumulate
+                await asyncio.sleep(max(0.0, start + n / self.tokens_per_sec - time.perf_counter()))
+            # Usage arrives with the last chunk, as with stream_options include_usage
+            usage = self._usage(messages, content) if n == len(tokens) else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(schema=schema.__name__) | RunnableLambda(lambda m: schema.model_validate_json(m.content))
@@ -0,0 +1,17 @@
+# benchmarks/fake_server.py
+"""
+fastapi_app with the fake model installed, importable by uvicorn workers
+(each worker process imports this module and gets its own fake model).
+
+    SESSION_STORE=sqlite python -m benchmarks.fake_server --workers 4 --no-reload
+"""
+import os
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.load import install_fake_model
+
+install_fake_model(FakeChatModel(latency=float(os.getenv("FAKE_LLM_LATENCY", "0.1"))))
+
+from fastapi_app import app, serve  # noqa: E402  (after the model is installed)
+
+if __name__ == "__main__":
+    serve("benchmarks.fake_server:app")
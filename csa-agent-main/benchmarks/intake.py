@@ -0,0 +1,97 @@
+# benchmarks/intake.py
+"""
+Time to a finished conversation, and chat model calls spent getting there:
+
+  turns, llm only      /start + one /chat per question, every turn answered by the model
+  turns, validated     same, with the local validator accepting well-formed answers
+  intake, json         /intake with the full answer set (no model call)
+  intake, document     /intake with a pasted document holding most answers, then /chat
+                       for whatever it left open
+
+    python -m benchmarks.intake --latency 1.5 --runs 5
+"""
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+from prompts import QUESTIONS, QUESTION_IDS
+import main
+import metrics
+import fastapi_app
+
+# Answers left out of the pasted document, so intake has to follow up
+DOCUMENT_GAPS = (2, 10)
+
+
+def llm_calls() -> int:
+    with metrics.LLM_SECONDS.lock:
+        return sum(series[-1] for series in metrics.LLM_SECONDS.series.values())
+
+
+async def finish(client: httpx.AsyncClient, resp: dict) -> int:
+    """Answer follow-ups until done (questions are asked verbatim, so the reply is looked up by text)"""
+    turns = 0
+    while resp["status"] != "done" and turns < 2 * len(SCRIPTED_ANSWERS):
+        asked = next((i for i, q in enumerate(QUESTIONS) if q in resp["agent_message"]), 0)
+        answer = SCRIPTED_ANSWERS[asked]
+        resp = (await client.post(f"/chat/{resp['session_id']}", json={"message": answer})).json()
+        turns += 1
+    return turns
+
+
+async def turns_flow(client: httpx.AsyncClient) -> int:
+    resp = (await client.post("/start")).json()
+    return 1 + await finish(client, resp)
+
+
+async def intake_json(client: httpx.AsyncClient) -> int:
+    resp = (await client.post("/intake", json={"answers": dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))})).json()
+    return 1 + await finish(client, resp)
+
+
+async def intake_document(client: httpx.AsyncClient) -> int:
+    document = "Site requirements\n" + "\n".join(
+        f"- {answer}" for i, answer in enumerate(SCRIPTED_ANSWERS) if i not in DOCUMENT_GAPS)
+    resp = (await client.post("/intake", json={"document": document})).json()
+    return 1 + await finish(client, resp)
+
+
+async def measure(client: httpx.AsyncClient, flow, runs: int) -> dict:
+    timings, requests, calls = [], [], []
+    for _ in range(runs):
+        before = llm_calls()
+        start = time.perf_counter()
+        requests.append(await flow(client))
+        timings.append(time.perf_counter() - start)
+        calls.append(llm_calls() - before)
+    return {"median_s": statistics.median(timings), "requests": statistics.median(requests),
+            "llm_calls": statistics.median(calls)}
+
+
+async def run(latency: float, runs: int):
+    install_fake_model(FakeChatModel(latency=latency))
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        flows = [
+            ("turns, llm only", turns_flow, False),
+            ("turns, validated", turns_flow, True),
+            ("intake, json", intake_json, True),
+            ("intake, document", intake_document, True),
+        ]
+        for name, flow, validation in flows:
+            main.LOCAL_VALIDATION = validation
+            result = await measure(client, flow, runs)
+            print(f"{name:17s} {result['median_s']:7.2f} s to done   {result['requests']:4.0f} requests   "
+                  f"{result['llm_calls']:4.0f} LLM calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Turn-by-turn intake vs local validation vs bulk intake")
+    parser.add_argument("--latency", type=float, default=1.5, help="fake LLM seconds per call")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.runs))
@@ -0,0 +1,82 @@
+# benchmarks/load.py
+"""
+Load benchmark for fastapi_app against a stubbed chat model.
+
+Runs full sessions (/start -> /chat x N -> /create_boq) at a given concurrency and
+reports sessions/sec. --blocking makes the fake model hold a threadpool slot for the
+whole call, which reproduces the old sync-endpoint concurrency ceiling.
+
+    python -m benchmarks.load --sessions 200 --concurrency 200 --latency 0.5
+    python -m benchmarks.load --sessions 200 --concurrency 200 --latency 0.5 --blocking
+"""
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+import llm_registry
+import fastapi_app
+
+
+def install_fake_model(fake: FakeChatModel):
+    """Point the chat node and the BOQ generator at the fake model"""
+    llm_registry.register(fake)
+
+
+async def run_session(client: httpx.AsyncClient, turn_latencies: list):
+    start = time.perf_counter()
+    resp = (await client.post("/start")).json()
+    turn_latencies.append(time.perf_counter() - start)
+    session_id = resp["session_id"]
+
+    for answer in SCRIPTED_ANSWERS:
+        if resp["status"] == "done":
+            break
+        start = time.perf_counter()
+        resp = (await client.post(f"/chat/{session_id}", json={"message": answer})).json()
+        turn_latencies.append(time.perf_counter() - start)
+
+    await client.post(f"/create_boq/{session_id}?mode=llm")
+
+
+async def run(sessions: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    turn_latencies: list = []
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+
+    # ASGITransport does not send lifespan events, so run startup/shutdown here
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def bounded():
+            async with semaphore:
+                await run_session(client, turn_latencies)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded() for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    turn_latencies.sort()
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(sessions / elapsed, 2),
+        "turn_p50_s": round(statistics.median(turn_latencies), 3),
+        "turn_p95_s": round(turn_latencies[int(len(turn_latencies) * 0.95) - 1], 3),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="fastapi_app load benchmark with a stubbed chat model")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency per call (s)")
+    parser.add_argument("--blocking", action="store_true", help="emulate sync endpoints on the threadpool")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    install_fake_model(FakeChatModel(latency=args.latency, blocking=args.blocking))
+    mode = "blocking (threadpool)" if args.blocking else "async"
+    print(f"[{mode}] {asyncio.run(run(args.sessions, args.concurrency))}")
@@ -0,0 +1,101 @@
+# benchmarks/model_tiers.py
+"""
+Model tiering (model_router) against two fake models: a slow "default" model
+and a fast "fast" one. Prints the tier the router picks for each scripted
+reply, then runs full sessions through /chat with every turn on the default
+model, with routing, and with routing to a sloppy fast model whose responses
+sometimes fail to parse (each escalated to the default model), and with a
+latency budget below the default model's latency (complex turns then go to
+the fast model too). Reports LLM turn latency, calls and estimated spend per
+tier, and routing decisions.
+
+Local validation is off, so every turn reaches the model.
+
+    python -m benchmarks.model_tiers --sessions 20 --malformed-rate 0.3
+"""
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+from prompts import QUESTIONS
+import llm_registry
+import model_router
+import metrics
+import main
+import fastapi_app
+
+
+def show_routes(router: model_router.ModelRouter):
+    print("routing decisions (reply -> tier, reason):")
+    for n, answer in enumerate(SCRIPTED_ANSWERS):
+        tier, reason = router.choose(answer, len(QUESTIONS) - n)
+        print(f"  Q{n + 1:<3d} {tier:8s} {reason:15s} {answer[:60]}")
+
+
+async def run_session(client: httpx.AsyncClient, n: int, latencies: list):
+    resp = (await client.post("/start")).json()
+    session_id = resp["session_id"]
+    for answer in SCRIPTED_ANSWERS:
+        if resp["status"] == "done":
+            break
+        start = time.perf_counter()
+        resp = await client.post(f"/chat/{session_id}", json={"message": f"{answer} (site {n})"})
+        latencies.append(time.perf_counter() - start)
+        resp = resp.json()
+    assert resp["status"] == "done", resp
+    assert resp["agent_message"].startswith("|") or "Summary" in resp["agent_message"], resp["agent_message"][:200]
+
+
+def delta(before: dict, after: dict) -> dict:
+    return {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+
+
+def tier_calls() -> dict:
+    return {key[0]: series[-1] for key, series in metrics.LLM_TIER_SECONDS.series.items()}
+
+
+async def run(name: str, fast: FakeChatModel, args, **router):
+    llm_registry.register(fast, "fast")
+    # Seed the budget run with the default model's latency, as after some traffic
+    model_router.configure(**router).observe("default", args.latency)
+    routes, cost, calls = dict(metrics.MODEL_ROUTES.series), dict(metrics.LLM_COST.series), tier_calls()
+    latencies: list = []
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(run_session(client, n, latencies) for n in range(args.sessions)))
+    latencies.sort()
+    spend = delta(cost, dict(metrics.LLM_COST.series))
+    print(f"{name:16s} turn p50 {statistics.median(latencies):6.3f} s   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:6.3f} s   "
+          f"calls {delta(calls, tier_calls())}   "
+          f"cost ${sum(spend.values()):.4f} {({k[0]: round(v, 4) for k, v in spend.items()})}")
+    print(f"{'':16s} routes {({'/'.join(k): v for k, v in delta(routes, dict(metrics.MODEL_ROUTES.series)).items()})}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model tier routing: latency, spend and escalations")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.6, help="default model latency (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=80, help="default model output rate")
+    parser.add_argument("--fast-latency", type=float, default=0.15, help="fast model latency (seconds)")
+    parser.add_argument("--fast-tokens-per-sec", type=float, default=400, help="fast model output rate")
+    parser.add_argument("--malformed-rate", type=float, default=0.3,
+                        help="share of the sloppy fast model's responses that fail to parse")
+    args = parser.parse_args()
+
+    main.LOCAL_VALIDATION = False
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec))
+    fast = FakeChatModel(latency=args.fast_latency, tokens_per_sec=args.fast_tokens_per_sec, seed=1)
+    sloppy = FakeChatModel(latency=args.fast_latency, tokens_per_sec=args.fast_tokens_per_sec, seed=1,
+                           malformed_rate=args.malformed_rate)
+
+    llm_registry.register(fast, "fast")
+    show_routes(model_router.configure(routing="on"))
+    asyncio.run(run("default only", fast, args, routing="off"))
+    asyncio.run(run("routed", fast, args, routing="on"))
+    asyncio.run(run("routed, sloppy", sloppy, args, routing="on"))
+    asyncio.run(run("routed, budget", fast, args, routing="on", latency_budget=args.latency / 2))
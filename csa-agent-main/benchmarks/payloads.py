@@ -0,0 +1,123 @@
+# benchmarks/payloads.py
+"""
+Bytes transferred per page load, before and after compression, cache
+validators and history cursors.
+
+Sessions are completed through /chat with the scripted answers and their
+background BOQ job is awaited. For each page the response body bytes read
+from the wire are summed over the sessions:
+- summary page: GET /session/{id} in full and uncompressed (before), against
+  ?limit=0&format=json compressed (after), and a reload sending the ETag;
+- BOQ page: GET /boq/{id}/result uncompressed, against ?format=json
+  compressed, and a reload sending the ETag;
+- history poll: a client holding the history asks for it again in full,
+  against since=<history_total> (nothing new) and against the ETag;
+- completing turn: the /chat response carrying the summary table.
+Also checks that an SSE turn is not compressed.
+
+    python -m benchmarks.payloads --sessions 20
+"""
+import asyncio
+import argparse
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+import compression
+import fastapi_app
+
+IDENTITY = {"Accept-Encoding": "identity"}
+COMPRESSED = {"Accept-Encoding": "br, gzip"}
+
+
+async def completed_session(client: httpx.AsyncClient, final_turn: dict) -> str:
+    resp = (await client.post("/start")).json()
+    session_id = resp["session_id"]
+    for answer in SCRIPTED_ANSWERS:
+        if resp["status"] == "done":
+            break
+        resp = await client.post(f"/chat/{session_id}", json={"message": answer}, headers=IDENTITY)
+        if resp.json()["status"] == "done":
+            final_turn["before"] += resp.num_bytes_downloaded
+        resp = resp.json()
+    assert resp["status"] == "done", resp
+    while (await client.get(f"/boq/{session_id}/result")).status_code == 202:
+        await asyncio.sleep(0.02)
+    return session_id
+
+
+async def read(client: httpx.AsyncClient, url: str, headers: dict, expect: int = 200) -> httpx.Response:
+    resp = await client.get(url, headers=headers)
+    assert resp.status_code == expect, (url, resp.status_code, resp.text[:200])
+    return resp
+
+
+async def page(client: httpx.AsyncClient, before_url: str, after_url: str) -> dict:
+    """Bytes for one page: old request, new request, and the new request revalidated"""
+    before = await read(client, before_url, IDENTITY)
+    after = await read(client, after_url, COMPRESSED)
+    reload = await read(client, after_url, {**COMPRESSED, "If-None-Match": after.headers["ETag"]}, 304)
+    return {"before": before.num_bytes_downloaded, "after": after.num_bytes_downloaded,
+            "reload": reload.num_bytes_downloaded, "encoding": after.headers.get("Content-Encoding", "identity"),
+            "json": after.json()}
+
+
+async def run(args) -> dict:
+    totals = {name: {"before": 0, "after": 0, "reload": 0} for name in ("summary page", "BOQ page", "history poll")}
+    final_turn = {"before": 0, "after": 0}
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        sessions = []
+        for _ in range(args.sessions):
+            sessions.append(await completed_session(client, final_turn))
+
+        for session_id in sessions:
+            full = (await read(client, f"/session/{session_id}", IDENTITY)).json()
+            summary = await page(client, f"/session/{session_id}", f"/session/{session_id}?limit=0&format=json")
+            table = summary["json"]["summary_table"]
+            assert table and table["rows"] and summary["json"]["history"] == [], summary["json"]
+            boq = await page(client, f"/boq/{session_id}/result", f"/boq/{session_id}/result?format=json")
+            assert boq["json"]["table"]["rows"], boq["json"]
+            poll = await page(client, f"/session/{session_id}",
+                              f"/session/{session_id}?since={full['history_total']}")
+            assert poll["json"]["history"] == [] and poll["json"]["history_total"] == len(full["history"])
+            for name, result in (("summary page", summary), ("BOQ page", boq), ("history poll", poll)):
+                for key in ("before", "after", "reload"):
+                    totals[name][key] += result[key]
+            encoding = summary["encoding"]
+
+        # The completing turn again, on a fresh session, accepting compression
+        resp = (await client.post("/start")).json()
+        for answer in SCRIPTED_ANSWERS:
+            if resp["status"] == "done":
+                break
+            raw = await client.post(f"/chat/{resp['session_id']}", json={"message": answer}, headers=COMPRESSED)
+            resp = raw.json()
+        final_turn["after"] = raw.num_bytes_downloaded * args.sessions
+
+        # SSE turns stream uncompressed
+        session_id = (await client.post("/start")).json()["session_id"]
+        async with client.stream("POST", f"/chat/{session_id}/stream", json={"message": SCRIPTED_ANSWERS[0]},
+                                 headers=COMPRESSED) as stream:
+            assert "content-encoding" not in stream.headers, stream.headers
+            async for _ in stream.aiter_bytes():
+                pass
+
+    totals["completing turn"] = {**final_turn, "reload": None}
+    return {"totals": totals, "encoding": encoding}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes per page load: full and uncompressed vs cursors, "
+                                                 "compression and ETags")
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+
+    install_fake_model(FakeChatModel(latency=0, tokens_per_sec=0))
+    result = asyncio.run(run(args))
+    print(f"{args.sessions} sessions, encodings available: {', '.join(compression.ENCODINGS)}, "
+          f"used: {result['encoding']}")
+    for name, total in result["totals"].items():
+        reload = "" if total["reload"] is None else f"   reload (304) {total['reload'] / args.sessions:8.0f} B"
+        print(f"{name:16s} before {total['before'] / args.sessions:8.0f} B   "
+              f"after {total['after'] / args.sessions:8.0f} B ({total['after'] / total['before']:5.1%}){reload}")
@@ -0,0 +1,111 @@
+# benchmarks/prompt_size.py
+"""
+Per-turn input tokens and prompt build time over a scripted 12-question conversation.
+
+  legacy   single HumanMessage rebuilt from scratch, transcript in the middle
+  full     cached system message + incrementally extended transcript
+  compact  as full, with validated Q&A pairs folded into an answered-so-far list
+  section  active section's questions and transcript only, earlier sections as a digest
+
+"cached" is the token prefix shared with the previous turn's prompt, i.e. what
+provider prompt caching can reuse. "uncached" is what has to be prefilled.
+
+    python -m benchmarks.prompt_size
+"""
+import time
+import asyncio
+import argparse
+from langchain_core.messages import HumanMessage
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.tokens import tokenize, TOKENIZER
+import main
+import llm_registry
+import prompts
+
+RULES_MARKER = "=== QUESTION FORMATTING RULES ==="
+
+
+def legacy_prompt(history: list) -> str:
+    """Layout before the split: instructions, transcript, then the rules, in one message"""
+    head, rules = prompts.NDA_SYSTEM_PROMPT.split(RULES_MARKER)
+    return f"{head}=== CONVERSATION SO FAR ===\n{prompts.format_answers(history)}\n\n{RULES_MARKER}{rules}"
+
+
+def common_prefix(a: list, b: list) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class RecordingModel(FakeChatModel):
+    """Fake model that keeps the last prompt it was sent"""
+    last_prompt: list = []
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.last_prompt = messages
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+async def run_mode(mode: str, prefill_tokens_per_sec: float) -> list:
+    model = RecordingModel(latency=0)
+    llm_registry.register(model)
+    main.PROMPT_HISTORY_MODE = "full" if mode == "legacy" else mode
+
+    state = {"history": [], "mode": "api"}
+    previous_tokens: list = []
+    turns = []
+    for turn in range(len(SCRIPTED_ANSWERS) + 1):
+        if mode == "legacy":
+            start = time.perf_counter()
+            text = legacy_prompt(state["history"])
+            build_ms = (time.perf_counter() - start) * 1e3
+            model.last_prompt = [HumanMessage(content=text)]
+            update = await main.llm_node(state)
+        else:
+            start = time.perf_counter()
+            main.build_conversation_prompt(state)
+            build_ms = (time.perf_counter() - start) * 1e3
+            update = await main.llm_node(state)
+            text = "".join(str(m.content) for m in model.last_prompt)
+
+        tokens = tokenize(text)
+        cached = common_prefix(tokens, previous_tokens)
+        previous_tokens = tokens
+        turns.append({
+            "turn": turn + 1,
+            "input_tokens": len(tokens),
+            "cached": cached,
+            "uncached": len(tokens) - cached,
+            "build_ms": round(build_ms, 3),
+            "prefill_ms": round((len(tokens) - cached) / prefill_tokens_per_sec * 1e3, 1),
+        })
+
+        state = {**state, **{k: v for k, v in update.items() if k not in ("history", "answers")}}
+        state["history"] = state["history"] + update["history"]
+        state["answers"] = main.merge_answers(state.get("answers"), update.get("answers"))
+        if turn < len(SCRIPTED_ANSWERS):
+            state["history"] = state["history"] + [HumanMessage(content=SCRIPTED_ANSWERS[turn])]
+    return turns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt tokens per turn for each prompt layout")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "full", "compact", "section"])
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=5000,
+                        help="modeled prefill rate for uncached input tokens")
+    args = parser.parse_args()
+
+    print(f"tokenizer: {TOKENIZER}")
+    for mode in args.modes:
+        turns = asyncio.run(run_mode(mode, args.prefill_tokens_per_sec))
+        print(f"\n[{mode}]")
+        for t in turns:
+            print("  turn {turn:2d}  input {input_tokens:5d}  cached {cached:5d}  uncached {uncached:5d}  "
+                  "build {build_ms:6.3f} ms  prefill ~{prefill_ms:6.1f} ms".format(**t))
+        total = sum(t["input_tokens"] for t in turns)
+        uncached = sum(t["uncached"] for t in turns)
+        print(f"  total input {total}, uncached {uncached}, last turn {turns[-1]['input_tokens']}, "
+              f"largest turn {max(t['input_tokens'] for t in turns)}")
@@ -0,0 +1,113 @@
+# benchmarks/rate_limit.py
+"""
+Sessions against a fake model with a provider token quota (429s with
+retry-after-ms once it is exceeded), under three admission settings:
+
+  no retries        every 429 goes straight back to the client
+  retries           429s retried with backoff, no client-side limiter
+  bucket + retries  token bucket sized to the quota, plus retries
+
+Clients behave like the frontend should: on 429/503 they wait Retry-After and
+resend the same message. Reports provider 429s, client-visible 429/503s, time
+to finish all sessions, and checks that no session history picked up an error
+message or a duplicated user message.
+
+A last run with a tiny queue shows saturation answered with 503 + Retry-After.
+Each session's messages are tagged with its number: identical concurrent
+prompts would otherwise share one model call through the response cache's
+single-flight.
+
+    python -m benchmarks.rate_limit --sessions 40 --quota-tpm 60000
+"""
+import time
+import asyncio
+import argparse
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+import llm_admission
+import main
+import fastapi_app
+
+
+async def post(client: httpx.AsyncClient, url: str, stats: dict, body=None) -> dict:
+    """POST, waiting out 429/503 responses the way a well-behaved client would"""
+    while True:
+        resp = await client.post(url, json=body)
+        if resp.status_code not in (429, 503):
+            resp.raise_for_status()
+            return resp.json()
+        stats[resp.status_code] = stats.get(resp.status_code, 0) + 1
+        await asyncio.sleep(float(resp.headers.get("Retry-After", "1")))
+
+
+async def run_session(client: httpx.AsyncClient, stats: dict, n: int) -> str:
+    resp = await post(client, "/start", stats)
+    session_id = resp["session_id"]
+    for answer in SCRIPTED_ANSWERS:
+        if resp["status"] == "done":
+            break
+        resp = await post(client, f"/chat/{session_id}", stats, {"message": f"{answer} (site {n})"})
+    return session_id
+
+
+async def check_history(client: httpx.AsyncClient, session_ids) -> dict:
+    poisoned = duplicated = 0
+    for session_id in session_ids:
+        history = (await client.get(f"/session/{session_id}")).json()["history"]
+        poisoned += any(str(m).startswith("Error processing request") for m in history)
+        user_messages = [m for m in history if "(site " in str(m)]
+        duplicated += len(user_messages) != len(set(user_messages))
+    return {"poisoned": poisoned, "duplicated": duplicated}
+
+
+async def scenario(name: str, sessions: int, quota_tpm: float, latency: float, **admission):
+    fake = FakeChatModel(latency=latency, quota_tpm=quota_tpm)
+    install_fake_model(fake)
+    llm_admission.configure(**admission)
+    stats: dict = {}
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        session_ids = await asyncio.gather(*(run_session(client, stats, n) for n in range(sessions)))
+        elapsed = time.perf_counter() - start
+        history = await check_history(client, session_ids)
+    print(f"{name:17s} {elapsed:7.2f} s   provider 429s {fake.rate_limited_calls:5d}   "
+          f"client 429s {stats.get(429, 0):4d}   client 503s {stats.get(503, 0):4d}   "
+          f"poisoned {history['poisoned']}   duplicated {history['duplicated']}")
+
+
+async def saturation(latency: float):
+    """More concurrent turns than in-flight slots plus queue: the excess gets 503 + Retry-After"""
+    install_fake_model(FakeChatModel(latency=latency))
+    main.LOCAL_VALIDATION = False  # every turn has to reach the model
+    llm_admission.configure()
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        session_ids = [(await client.post("/start")).json()["session_id"] for _ in range(10)]
+        llm_admission.configure(max_in_flight=2, queue_size=2, queue_timeout=5)
+        responses = await asyncio.gather(*(client.post(f"/chat/{sid}", json={"message": f"{n} buildings"})
+                                           for n, sid in enumerate(session_ids, 1)))
+    codes = [r.status_code for r in responses]
+    rejected = next((r for r in responses if r.status_code == 503), None)
+    print(f"\nsaturation: 10 concurrent turns, 2 in flight + 2 queued -> "
+          f"{codes.count(200)} x 200, {codes.count(503)} x 503"
+          + (f" (Retry-After: {rejected.headers.get('Retry-After')}, {rejected.json()['detail']!r})" if rejected else ""))
+
+
+async def run(sessions: int, quota_tpm: float, latency: float):
+    await scenario("no retries", sessions, quota_tpm, latency, tokens_per_minute=0, max_retries=0)
+    await scenario("retries", sessions, quota_tpm, latency, tokens_per_minute=0)
+    await scenario("bucket + retries", sessions, quota_tpm, latency, tokens_per_minute=quota_tpm)
+    await saturation(latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provider rate limits: retries, token bucket and saturation")
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--quota-tpm", type=float, default=60000, help="fake provider tokens per minute")
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.quota_tpm, args.latency))
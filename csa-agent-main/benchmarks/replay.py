@@ -0,0 +1,193 @@
+# benchmarks/replay.py
+"""
+Replay harness: recorded conversations through /start -> /chat x N -> /create_boq
+against the fake model, at a given concurrency. Reports p50/p95/p99 latency per
+endpoint, requests/sec, resident memory per live session and event-loop lag,
+and writes everything to JSON so runs can be compared between commits.
+
+Conversations are JSONL, one {"name": ..., "messages": [...]} per line; sessions
+cycle through them.
+
+    python -m benchmarks.replay --sessions 500 --concurrency 100 --latency 0.3 --jitter 0.1 \\
+        --output before.json
+    python -m benchmarks.replay ... --output after.json --compare before.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List
+import httpx
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.load import install_fake_model
+import fastapi_app
+
+DEFAULT_CONVERSATIONS = os.path.join(os.path.dirname(__file__), "conversations.jsonl")
+
+
+def load_conversations(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values, default=0.0) * 1000, 2),
+    }
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, on non-Linux
+
+
+async def monitor_loop_lag(samples: List[float], interval: float = 0.01):
+    """How late the event loop wakes a sleeping task: a direct measure of blocking work"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+async def replay_session(client: httpx.AsyncClient, conversation: dict, boq_mode: str,
+                         latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    async def call(endpoint: str, url: str, body=None) -> dict:
+        start = time.perf_counter()
+        resp = await client.post(url, json=body)
+        latencies[endpoint].append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+            return {}
+        return resp.json()
+
+    resp = await call("start", "/start")
+    session_id = resp.get("session_id")
+    if not session_id:
+        return
+    for message in conversation["messages"]:
+        if resp.get("status") == "done":
+            break
+        resp = await call("chat", f"/chat/{session_id}", {"message": message})
+    await call("create_boq", f"/create_boq/{session_id}?mode={boq_mode}")
+
+
+async def run(conversations: List[dict], sessions: int, concurrency: int, boq_mode: str) -> dict:
+    latencies: Dict[str, List[float]] = {"start": [], "chat": [], "create_boq": []}
+    errors: Dict[str, int] = {}
+    lag: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        async def bounded(i: int):
+            async with semaphore:
+                await replay_session(client, conversations[i % len(conversations)], boq_mode, latencies, errors)
+
+        gc.collect()
+        rss_before = rss_bytes()
+        monitor = asyncio.create_task(monitor_loop_lag(lag))
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+        monitor.cancel()
+        gc.collect()
+        # Sessions are still held by the store and checkpointer at this point
+        rss_after = rss_bytes()
+
+    requests = sum(len(v) for v in latencies.values())
+    all_latencies = [x for v in latencies.values() for x in v]
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 3),
+        "requests": requests,
+        "requests_per_s": round(requests / elapsed, 2),
+        "sessions_per_s": round(sessions / elapsed, 2),
+        "latency": {"all": summarize(all_latencies), **{k: summarize(v) for k, v in latencies.items()}},
+        "errors": errors,
+        "memory_per_session_kb": round(max(0, rss_after - rss_before) / sessions / 1024, 2),
+        "event_loop_lag": summarize(lag),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict):
+    """Print relative change of the headline numbers against a previous run"""
+    rows = [("requests_per_s", ("requests_per_s",)), ("memory_per_session_kb", ("memory_per_session_kb",))]
+    for endpoint in current["results"]["latency"]:
+        for q in ("p50_ms", "p95_ms", "p99_ms"):
+            rows.append((f"{endpoint}.{q}", ("latency", endpoint, q)))
+    rows.append(("event_loop_lag.p99_ms", ("event_loop_lag", "p99_ms")))
+
+    print(f"\ncompared with {baseline.get('revision', '?')}:")
+    for label, path in rows:
+        old, new = baseline["results"], current["results"]
+        for key in path:
+            old, new = old.get(key, {}) if isinstance(old, dict) else None, new.get(key)
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+            print(f"  {label:28s} {old:>10} -> {new:>10}  ({(new - old) / old * 100:+.1f}%)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded conversations against fastapi_app with a fake model")
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS, help="JSONL of recorded conversations")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM time to first token (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- uniform noise on latency (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="fake output rate (0 = instant)")
+    parser.add_argument("--seed", type=int, default=0, help="jitter seed, for reproducible runs")
+    parser.add_argument("--blocking", action="store_true", help="fake model holds a threadpool slot per call")
+    parser.add_argument("--boq-mode", default="llm", choices=["engine", "hybrid", "llm"])
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    install_fake_model(FakeChatModel(latency=args.latency, jitter=args.jitter, seed=args.seed,
+                                     tokens_per_sec=args.tokens_per_sec, blocking=args.blocking))
+    results = asyncio.run(run(load_conversations(args.conversations), args.sessions, args.concurrency, args.boq_mode))
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
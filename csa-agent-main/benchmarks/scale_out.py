@@ -0,0 +1,126 @@
+# benchmarks/scale_out.py
+"""
+Throughput of real uvicorn workers (1, 2, 4 ...) over one shared SQLite store.
+
+For each worker count a server is started with benchmarks.fake_server, full
+sessions (/start -> /chat until done) are run over HTTP at a fixed
+concurrency, and sessions/s is reported next to the ideal linear figure.
+Workers only add throughput while there are idle CPU cores to run them, so
+the core count is printed too. --max-in-flight caps model calls per worker
+(LLM_MAX_IN_FLIGHT), the per-process limit that extra workers multiply.
+
+Then the same-session race: pairs of concurrent /chat calls on one session.
+Each call either commits or gets 409; the check is that every session's
+history holds exactly the committed turns (nothing lost or interleaved).
+
+    python -m benchmarks.scale_out --workers 1 2 4 --sessions 200 --concurrency 64
+    python -m benchmarks.scale_out --latency 0.5 --max-in-flight 2
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import httpx
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, db: str, latency: float, max_in_flight: int) -> subprocess.Popen:
+    env = {**os.environ, "SESSION_STORE": "sqlite", "SESSION_DB_PATH": db, "RESPONSE_CACHE": "off",
+           "FAKE_LLM_LATENCY": str(latency), "LLM_MAX_IN_FLIGHT": str(max_in_flight)}
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.fake_server", "--host", "127.0.0.1",
+                             "--port", str(port), "--workers", str(workers), "--no-reload"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run_session(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, n: int):
+    """One conversation; answers are tagged so the response cache's single-flight cannot merge sessions"""
+    async with semaphore:
+        resp = (await client.post("/start")).json()
+        for answer in SCRIPTED_ANSWERS:
+            if resp["status"] == "done":
+                break
+            r = await client.post(f"/chat/{resp['session_id']}", json={"message": f"{answer} (site {n})"})
+            r.raise_for_status()
+            resp = r.json()
+
+
+async def race(client: httpx.AsyncClient, pairs: int) -> dict:
+    """Two concurrent turns per session; history must hold exactly the committed ones"""
+    outcomes = {200: 0, 409: 0}
+    consistent = 0
+    for n in range(pairs):
+        session_id = (await client.post("/start")).json()["session_id"]
+        responses = await asyncio.gather(*(client.post(f"/chat/{session_id}", json={"message": m})
+                                           for m in (f"{n + 2} buildings", f"{n + 3} buildings")))
+        for r in responses:
+            outcomes[r.status_code] = outcomes.get(r.status_code, 0) + 1
+        committed = sum(r.status_code == 200 for r in responses)
+        info = (await client.get(f"/session/{session_id}")).json()
+        consistent += len(info["history"]) == 1 + 2 * committed and info["version"] == 1 + committed
+    return {"outcomes": outcomes, "consistent": consistent, "pairs": pairs}
+
+
+async def measure(workers: int, args) -> dict:
+    sessions, concurrency = args.sessions, args.concurrency
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(workers, port, os.path.join(tmp, "sessions.db"), args.latency, args.max_in_flight)
+        try:
+            limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+                await wait_ready(client)
+                semaphore = asyncio.Semaphore(concurrency)
+                await asyncio.gather(*(run_session(client, semaphore, -n) for n in range(workers * 2)))  # warm up
+                start = time.perf_counter()
+                await asyncio.gather(*(run_session(client, semaphore, n) for n in range(sessions)))
+                elapsed = time.perf_counter() - start
+                raced = await race(client, args.pairs)
+        finally:
+            server.terminate()
+            server.wait()
+    return {"workers": workers, "sessions_per_s": sessions / elapsed, **raced}
+
+
+async def run(args):
+    print(f"{os.cpu_count()} CPU cores, fake model latency {args.latency}s, concurrency {args.concurrency}, "
+          f"{args.max_in_flight} model calls in flight per worker")
+    baseline = None
+    for workers in args.workers:
+        result = await measure(workers, args)
+        baseline = baseline or result["sessions_per_s"] / workers
+        print(f"workers {workers:2d}   {result['sessions_per_s']:7.2f} sessions/s   "
+              f"(linear {baseline * workers:7.2f})   race: {result['outcomes'].get(200, 0)} x 200, "
+              f"{result['outcomes'].get(409, 0)} x 409, {result['consistent']}/{result['pairs']} histories consistent")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-worker throughput over the shared SQLite store")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds per call")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="LLM_MAX_IN_FLIGHT per worker")
+    parser.add_argument("--pairs", type=int, default=20, help="sessions in the same-session race")
+    asyncio.run(run(parser.parse_args()))
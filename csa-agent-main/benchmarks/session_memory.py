@@ -0,0 +1,91 @@
+# benchmarks/session_memory.py
+"""
+Resident memory per idle session, with the in-memory store holding full
+checkpoints (SESSION_STATE=full: LangGraph's InMemorySaver) and compact
+session records (SESSION_STATE=compact).
+
+Each mode runs in its own process: N sessions are taken through a whole
+conversation (/start -> /chat until done) against the fake model and left
+idle, then RSS growth is divided by N. A final sample of sessions is read
+back through /session to check both modes return the same conversation.
+
+    python -m benchmarks.session_memory --sessions 10000
+"""
+import os
+import sys
+import gc
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+
+
+async def run_session(client, semaphore) -> str:
+    from benchmarks.fake_llm import SCRIPTED_ANSWERS
+    async with semaphore:
+        resp = (await client.post("/start")).json()
+        for answer in SCRIPTED_ANSWERS:
+            if resp["status"] == "done":
+                break
+            resp = (await client.post(f"/chat/{resp['session_id']}", json={"message": answer})).json()
+        return resp["session_id"]
+
+
+async def measure(sessions: int, concurrency: int, sample: int) -> dict:
+    import httpx
+    from benchmarks.fake_llm import FakeChatModel
+    from benchmarks.load import install_fake_model
+    from benchmarks.replay import rss_bytes
+    import fastapi_app
+
+    install_fake_model(FakeChatModel(latency=0))
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await run_session(client, semaphore)  # warm up imports, graph and prompt caches
+        gc.collect()
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        session_ids = await asyncio.gather(*(run_session(client, semaphore) for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        rss_after = rss_bytes()
+        views = [(await client.get(f"/session/{sid}")).json() for sid in session_ids[:sample]]
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 1),
+        "memory_per_session_kb": round((rss_after - rss_before) / sessions / 1024, 2),
+        "rss_mb": round(rss_after / 2 ** 20, 1),
+        "sample": [{k: v[k] for k in ("history", "status", "next_response", "answers")} for v in views],
+    }
+
+
+def run_mode(state: str, args) -> dict:
+    env = {**os.environ, "SESSION_STORE": "memory", "SESSION_STATE": state,
+           "MAX_SESSIONS": str(args.sessions + 10)}
+    out = subprocess.run([sys.executable, "-m", "benchmarks.session_memory", "--child",
+                          "--sessions", str(args.sessions), "--concurrency", str(args.concurrency),
+                          "--sample", str(args.sample)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory per idle session: full checkpoints vs compact records")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--sample", type=int, default=20, help="sessions read back to compare modes")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.sessions, args.concurrency, args.sample))))
+        sys.exit()
+
+    results = {state: run_mode(state, args) for state in ("full", "compact")}
+    for state, result in results.items():
+        print(f"{state:8s} {result['sessions']:6d} sessions   {result['memory_per_session_kb']:8.2f} KB/session   "
+              f"RSS {result['rss_mb']:7.1f} MB   built in {result['elapsed_s']:6.1f} s")
+    print(f"sessions read back identically: {results['full']['sample'] == results['compact']['sample']}")
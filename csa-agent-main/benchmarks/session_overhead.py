@@ -0,0 +1,80 @@
+# benchmarks/session_overhead.py
+"""
+Per-request session bookkeeping cost as the number of stored sessions grows.
+
+Compares the old per-request O(n) cleanup scan with the expiry-indexed store
+(lookup + touch on each request, expiry in the background reaper).
+
+    python -m benchmarks.session_overhead --sizes 1000 10000 100000
+    python -m benchmarks.session_overhead --store sqlite --db /tmp/bench_sessions.db
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from session_store import create_session_store
+
+SESSION_TIMEOUT = timedelta(hours=1)
+
+
+def legacy_request(sessions: dict, session_id: str):
+    """What every request used to do: scan all sessions under the lock, then look up"""
+    cutoff = datetime.now() - SESSION_TIMEOUT
+    expired = [sid for sid, data in sessions.items()
+               if data.get("created_at", datetime.now()) < cutoff]
+    for sid in expired:
+        del sessions[sid]
+    return sessions[session_id]
+
+
+async def indexed_request(store, session_id: str):
+    """Request path now: O(1)/O(log n) lookup plus an activity touch"""
+    record = await store.get(session_id)
+    record["updated_at"] = datetime.now()
+    await store.put(session_id, record)
+
+
+async def measure(size: int, requests: int, kind: str, db: str) -> dict:
+    now = datetime.now()
+    ids = [f"session-{i}" for i in range(size)]
+    sample = random.choices(ids, k=requests)
+
+    legacy = {sid: {"created_at": now, "updated_at": now, "status": "not done"} for sid in ids}
+    start = time.perf_counter()
+    for sid in sample:
+        legacy_request(legacy, sid)
+    legacy_us = (time.perf_counter() - start) / requests * 1e6
+
+    if kind == "sqlite" and os.path.exists(db):
+        os.remove(db)
+    store = create_session_store(kind, db)
+    for sid in ids:
+        await store.put(sid, {"created_at": now, "updated_at": now, "status": "not done"})
+    start = time.perf_counter()
+    for sid in sample:
+        await indexed_request(store, sid)
+    indexed_us = (time.perf_counter() - start) / requests * 1e6
+
+    # One reaper pass that evicts 1% of sessions via the LRU cap
+    start = time.perf_counter()
+    evicted = await store.expire(now - SESSION_TIMEOUT, size - size // 100)
+    reap_ms = (time.perf_counter() - start) * 1e3
+    await store.close()
+
+    return {"sessions": size, "legacy_us_per_req": round(legacy_us, 1),
+            "indexed_us_per_req": round(indexed_us, 1),
+            "reap_ms": round(reap_ms, 2), "reaped": len(evicted)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session bookkeeping overhead vs active sessions")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--db", default="/tmp/bench_sessions.db")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(asyncio.run(measure(size, args.requests, args.store, args.db)))
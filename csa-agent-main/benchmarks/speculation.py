@@ -0,0 +1,98 @@
+# benchmarks/speculation.py
+"""
+Perceived turn latency with and without speculative turns (SPECULATIVE_TURNS),
+against the fake model.
+
+Each simulated user reads the question, types the scripted answer over
+--typing seconds while the frontend reports the draft to /typing (halfway
+and when typing stops), then sends the message --send-delay later. With
+--edit-rate, that share of messages is changed after the last draft, so the
+prepared reply has to be discarded. Perceived latency is the /chat round
+trip, split by whether the local validator answers the turn or the model does.
+
+    python -m benchmarks.speculation --sessions 20 --latency 0.3 --typing 0.5
+"""
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+import metrics
+import fastapi_app
+
+
+async def run_session(client: httpx.AsyncClient, args, rng: random.Random, latencies: dict):
+    resp = (await client.post("/start")).json()
+    session_id = resp["session_id"]
+    for index, answer in enumerate(SCRIPTED_ANSWERS):
+        if resp["status"] == "done":
+            break
+        edited = rng.random() < args.edit_rate
+        draft = answer[:-1] if edited else answer
+        await asyncio.sleep(args.typing / 2)
+        halfway = asyncio.create_task(client.post(f"/chat/{session_id}/typing", json={"draft": answer[:len(answer) // 2]}))
+        await asyncio.sleep(args.typing / 2)
+        stopped = asyncio.create_task(client.post(f"/chat/{session_id}/typing", json={"draft": draft}))
+        await asyncio.sleep(args.send_delay)
+
+        start = time.perf_counter()
+        resp = (await client.post(f"/chat/{session_id}", json={"message": answer})).json()
+        latencies.setdefault(index, []).append(time.perf_counter() - start)
+        await asyncio.gather(halfway, stopped)
+
+
+def turn_paths() -> dict:
+    """Question index -> "local" or "llm": how each scripted answer is handled"""
+    from main import local_turn
+    from langchain_core.messages import AIMessage
+    from prompts import QUESTIONS, QUESTION_IDS
+    return {i: "local" if local_turn({"history": [AIMessage(content=QUESTIONS[i])], "user_message": answer,
+                                      "answers": dict(zip(QUESTION_IDS[:i], SCRIPTED_ANSWERS[:i]))}) else "llm"
+            for i, answer in enumerate(SCRIPTED_ANSWERS)}
+
+
+async def run(speculative: bool, args) -> dict:
+    fastapi_app.SPECULATIVE_TURNS = speculative
+    latencies: dict = {}
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await run_session(client, args, rng, {})  # warm up
+        counters = dict(metrics.SPECULATIONS.series)
+        await asyncio.gather(*(run_session(client, args, rng, latencies) for _ in range(args.sessions)))
+    outcomes = {k[0]: v - counters.get(k, 0) for k, v in metrics.SPECULATIONS.series.items()}
+    return {"latencies": latencies, "outcomes": outcomes}
+
+
+def summary(samples: list) -> str:
+    samples = sorted(samples)
+    if not samples:
+        return "-"
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"p50 {statistics.median(samples) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms   ({len(samples)} turns)"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perceived latency with speculative turns on and off")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model latency (seconds)")
+    parser.add_argument("--typing", type=float, default=0.5, help="seconds the user types each answer")
+    parser.add_argument("--send-delay", type=float, default=0.1, help="seconds from the last draft to sending")
+    parser.add_argument("--edit-rate", type=float, default=0.1, help="share of messages changed after the last draft")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    install_fake_model(FakeChatModel(latency=args.latency))
+    paths = turn_paths()
+    for speculative in (False, True):
+        result = asyncio.run(run(speculative, args))
+        print(f"\nSPECULATIVE_TURNS={'on' if speculative else 'off'}")
+        for path in ("local", "llm"):
+            samples = [s for i, values in result["latencies"].items() if paths[i] == path for s in values]
+            print(f"  {path:6s} turns  {summary(samples)}")
+        if speculative:
+            print(f"  speculative turns: {result['outcomes']}")
@@ -0,0 +1,83 @@
+# benchmarks/startup.py
+"""
+Cold-start report: import time of fastapi_app in a fresh interpreter (without
+Azure credentials), first vs second request latency, and the per-call cost of
+building a chat model that the shared registry now pays once per process.
+
+    python -m benchmarks.startup --runs 5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+# Runs in a fresh interpreter so module caches are cold
+PROBE = r"""
+import time, json, asyncio
+start = time.perf_counter()
+import fastapi_app
+import_s = time.perf_counter() - start
+
+import httpx
+import llm_registry
+from benchmarks.fake_llm import FakeChatModel
+llm_registry.register(FakeChatModel(latency=0.0))
+
+async def requests():
+    transport = httpx.ASGITransport(app=fastapi_app.app)
+    async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://probe") as client:
+        timings = []
+        for _ in range(2):
+            t = time.perf_counter()
+            (await client.post("/start")).raise_for_status()
+            timings.append(time.perf_counter() - t)
+        return timings
+
+first, second = asyncio.run(requests())
+print(json.dumps({"import_s": import_s, "first_request_s": first, "second_request_s": second}))
+"""
+
+
+def probe() -> dict:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("AZURE_OPENAI")}
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def model_construction(runs: int) -> dict:
+    """Per-request model construction (old create_boq) vs the cached registry lookup"""
+    from benchmarks import fake_llm  # noqa: F401  (dummy credentials for construction only)
+    import llm_registry
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        llm_registry.create_model()
+    fresh = (time.perf_counter() - start) / runs
+
+    llm_registry.get_llm()
+    start = time.perf_counter()
+    for _ in range(runs):
+        llm_registry.get_llm()
+    cached = (time.perf_counter() - start) / runs
+    asyncio.run(llm_registry.aclose())
+    return {"construct_ms": fresh * 1000, "cached_ms": cached * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    for key in ("import_s", "first_request_s", "second_request_s"):
+        values = [r[key] for r in results]
+        print(f"{key:17s} median {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+    cost = model_construction(50)
+    print(f"\nchat model construction {cost['construct_ms']:.2f} ms per call, "
+          f"registry lookup {cost['cached_ms'] * 1000:.2f} us")
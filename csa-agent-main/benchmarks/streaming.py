@@ -0,0 +1,94 @@
+# benchmarks/streaming.py
+"""
+Time-to-first-token vs full-completion latency for the JSON and SSE endpoints,
+against a fake model that streams at a fixed token rate.
+
+    python -m benchmarks.streaming --latency 0.4 --tokens-per-sec 60
+"""
+import time
+import asyncio
+import argparse
+import socket
+import contextlib
+import httpx
+import uvicorn
+from benchmarks.fake_llm import FakeChatModel, SCRIPTED_ANSWERS
+from benchmarks.load import install_fake_model
+import fastapi_app
+
+
+async def timed_json(client: httpx.AsyncClient, url: str, body=None) -> dict:
+    start = time.perf_counter()
+    resp = await client.post(url, json=body)
+    elapsed = time.perf_counter() - start
+    # A JSON client sees nothing until the whole completion is done
+    return {"first_token_s": round(elapsed, 3), "total_s": round(elapsed, 3), "payload": resp.json()}
+
+
+async def timed_stream(client: httpx.AsyncClient, url: str, body=None) -> dict:
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", url, json=body) as resp:
+        async for line in resp.aiter_lines():
+            if first_token is None and line == "event: token":
+                first_token = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"first_token_s": round(first_token or total, 3), "total_s": round(total, 3)}
+
+
+async def finish_conversation(client: httpx.AsyncClient) -> str:
+    """Drive a session to status == done and return its id"""
+    session_id = (await client.post("/start")).json()["session_id"]
+    for answer in SCRIPTED_ANSWERS:
+        await client.post(f"/chat/{session_id}", json={"message": answer})
+    return session_id
+
+
+@contextlib.asynccontextmanager
+async def live_server(app):
+    """Run the app under uvicorn on a free local port (ASGITransport buffers whole responses)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def run() -> dict:
+    async with live_server(fastapi_app.app) as base_url, \
+            httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        results = {}
+
+        # Chat turn: the final done-turn carries the longest completion (summary table)
+        for label, timer, suffix in (("chat_json", timed_json, ""), ("chat_sse", timed_stream, "/stream")):
+            session_id = (await client.post("/start")).json()["session_id"]
+            for answer in SCRIPTED_ANSWERS[:-1]:
+                await client.post(f"/chat/{session_id}", json={"message": answer})
+            result = await timer(client, f"/chat/{session_id}{suffix}", {"message": SCRIPTED_ANSWERS[-1]})
+            result.pop("payload", None)
+            results[label] = result
+
+        session_id = await finish_conversation(client)
+        boq_json = await timed_json(client, f"/create_boq/{session_id}?mode=llm")
+        boq_json.pop("payload")
+        results["boq_json"] = boq_json
+        results["boq_sse"] = await timed_stream(client, f"/create_boq/{session_id}/stream?mode=llm")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TTFT benchmark for the streaming endpoints")
+    parser.add_argument("--latency", type=float, default=0.4, help="fake time to first token (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=60)
+    args = parser.parse_args()
+
+    install_fake_model(FakeChatModel(latency=args.latency, tokens_per_sec=args.tokens_per_sec))
+    for name, timing in asyncio.run(run()).items():
+        print(f"{name:10s} first token {timing['first_token_s']:7.3f}s   total {timing['total_s']:7.3f}s")
@@ -0,0 +1,26 @@
+# benchmarks/tokens.py
+import re
+
+# gpt-4o tokenizer when its BPE file is available (it is downloaded on first use),
+# otherwise a word/punctuation split, which tracks it closely for English prompts
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+_APPROX = re.compile(r"\w+|[^\w\s]")
+
+
+def tokenize(text: str) -> list:
+    """Token sequence for text (ids with tiktoken, strings with the approximation)"""
+    if _encoding is not None:
+        return _encoding.encode(text)
+    return _APPROX.findall(text)
+
+
+def count_tokens(text: str) -> int:
+    return len(tokenize(text))
+
+
+TOKENIZER = "o200k_base" if _encoding is not None else "approximate (word/punctuation)"
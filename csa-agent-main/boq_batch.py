@@ -0,0 +1,197 @@
+#boq_batch.py
+"""
+Portfolio batch mode: BOQs for many projects from completed summaries or
+answer sets, without a conversation per project.
+
+Items come from a JSONL file (one object per line) or a directory (one .json
+object, or a .md/.txt summary, per file; the file name is the id). An object
+carries "id", plus "info_summary" (the summary table) and/or "answers" (by
+question id, Q1..Qn); answers alone are rendered into the summary table.
+
+Items run on a boq_jobs.InProcessJobQueue: a bounded pool of async workers
+with per-item retries. Generation is I/O-bound (LLM calls through the shared
+admission controller), so one event loop keeps the pool busy. Results are
+yielded as they finish, and the CLI appends each one to the output file
+straight away; the output file is also the checkpoint, so a rerun after a
+crash skips the items already "ready" there (the last row per id wins).
+
+    python create_boq.py batch portfolio.jsonl -o boqs.jsonl --concurrency 32
+"""
+import io
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from prompts import QUESTION_IDS, render_summary_table
+from create_boq import generate_boq, BOQ_MODES, BOQ_MODE
+from boq_jobs import InProcessJobQueue, BOQ_JOB_RETRIES, BOQ_JOB_RETRY_DELAY
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))   # items generated at once
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))     # per /batch/boq request
+
+COLUMNS = ("id", "status", "mode", "attempts", "elapsed_s", "boq", "error")
+SUMMARY_SUFFIXES = (".md", ".txt")
+
+
+def normalize_item(raw: Dict[str, Any], default_id: str) -> Dict[str, Any]:
+    """{"id", "info_summary", "answers"} from an input object; ValueError if it has nothing to build from"""
+    item_id = str(raw.get("id") or default_id)
+    answers = raw.get("answers") or None
+    if answers is not None and (not isinstance(answers, dict) or set(answers) - set(QUESTION_IDS)):
+        raise ValueError(f"Item {item_id}: answers must map question ids ({QUESTION_IDS[0]}..{QUESTION_IDS[-1]}) to text")
+    info_summary = raw.get("info_summary") or raw.get("summary")
+    if not info_summary and not answers:
+        raise ValueError(f"Item {item_id}: needs an info_summary or answers")
+    return {"id": item_id, "info_summary": info_summary or render_summary_table(answers), "answers": answers}
+
+
+def load_items(path: str) -> List[Dict[str, Any]]:
+    """Items from a JSONL file or a directory of .json / .md / .txt files"""
+    raw_items = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, suffix = os.path.splitext(name)
+            with open(os.path.join(path, name)) as f:
+                if suffix == ".json":
+                    raw_items.append((json.load(f), stem))
+                elif suffix in SUMMARY_SUFFIXES:
+                    raw_items.append(({"info_summary": f.read()}, stem))
+    else:
+        with open(path) as f:
+            raw_items = [(json.loads(line), str(n)) for n, line in enumerate(f, 1) if line.strip()]
+
+    items, seen = [], set()
+    for raw, default_id in raw_items:
+        item = normalize_item(raw, default_id)
+        if item["id"] in seen:
+            raise ValueError(f"Duplicate item id: {item['id']}")
+        seen.add(item["id"])
+        items.append(item)
+    return items
+
+
+async def iter_batch(items: List[Dict[str, Any]], mode: str = BOQ_MODE, concurrency: int = BATCH_CONCURRENCY,
+                     retries: int = BOQ_JOB_RETRIES, retry_delay: float = BOQ_JOB_RETRY_DELAY
+                     ) -> AsyncIterator[Dict[str, Any]]:
+    """Generate a BOQ per item; yields one result row (see COLUMNS) per item, in completion order"""
+    by_id = {item["id"]: item for item in items}
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def generate(item_id: str, payload: Dict[str, Any], attempt: int):
+        item = by_id[item_id]
+        table = await generate_boq(item["info_summary"], mode, item["answers"])
+        results.put_nowait(result_row(item_id, "ready", mode, attempt, payload["queued"], boq=table))
+
+    async def fail(item_id: str, payload: Dict[str, Any], error: Exception):
+        results.put_nowait(result_row(item_id, "failed", mode, retries + 1, payload["queued"], error=str(error)))
+
+    queue = InProcessJobQueue(generate, fail, workers=concurrency, retries=retries, retry_delay=retry_delay)
+    await queue.start()
+    try:
+        for item in items:
+            await queue.enqueue(item["id"], {"queued": time.perf_counter()})
+        for _ in items:
+            yield await results.get()
+    finally:
+        await queue.close()
+
+
+def result_row(item_id: str, status: str, mode: str, attempts: int, queued: float,
+               boq: str = "", error: str = "") -> Dict[str, Any]:
+    return {"id": item_id, "status": status, "mode": mode, "attempts": attempts,
+            "elapsed_s": round(time.perf_counter() - queued, 3), "boq": boq, "error": error}
+
+
+def format_row(row: Dict[str, Any], fmt: str) -> str:
+    """One output line: JSON object, or CSV record (quoted, so tables may span lines)"""
+    if fmt == "jsonl":
+        return json.dumps(row, ensure_ascii=False) + "\n"
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([row.get(column, "") for column in COLUMNS])
+    return buffer.getvalue()
+
+
+def csv_header() -> str:
+    return format_row(dict(zip(COLUMNS, COLUMNS)), "csv")
+
+
+def read_results(path: str, fmt: str) -> Dict[str, Dict[str, Any]]:
+    """Last complete row per id in an existing output file (a row torn by a crash is skipped)"""
+    rows: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, newline="") as f:
+        if fmt == "jsonl":
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                rows[row["id"]] = row
+        else:
+            reader = csv.reader(f)
+            next(reader, None)
+            for record in reader:
+                if len(record) == len(COLUMNS):
+                    row = dict(zip(COLUMNS, record))
+                    rows[row["id"]] = row
+    return rows
+
+
+def resume(path: str, fmt: str) -> Set[str]:
+    """
+    Rewrite an output file with its last complete row per id, dropping a row
+    torn by a crash and superseded failures; returns the ids already "ready"
+    """
+    rows = read_results(path, fmt)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        if fmt == "csv":
+            f.write(csv_header())
+        for row in rows.values():
+            f.write(format_row(row, fmt))
+    os.replace(tmp_path, path)
+    return {item_id for item_id, row in rows.items() if row["status"] == "ready"}
+
+
+def output_format(path: str, fmt: Optional[str]) -> str:
+    return fmt or ("csv" if path.endswith(".csv") else "jsonl")
+
+
+def add_arguments(parser):
+    parser.add_argument("input", help="JSONL file, or directory of .json / .md / .txt files")
+    parser.add_argument("-o", "--output", required=True,
+                        help="results file (.jsonl or .csv); also the checkpoint a rerun resumes from")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the output file extension")
+    parser.add_argument("--mode", default=BOQ_MODE, choices=BOQ_MODES)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=BOQ_JOB_RETRIES, help="retries per item")
+    parser.add_argument("--retry-delay", type=float, default=BOQ_JOB_RETRY_DELAY, help="seconds, doubled per retry")
+    parser.add_argument("--restart", action="store_true", help="ignore existing results and start over")
+
+
+async def run_cli(args) -> int:
+    """Batch subcommand: returns the process exit code (1 if any item failed)"""
+    fmt = output_format(args.output, args.format)
+    items = load_items(args.input)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = resume(args.output, fmt)
+    pending = [item for item in items if item["id"] not in done]
+
+    with open(args.output, "a", newline="") as out:
+        counts = {"ready": 0, "failed": 0}
+        start = time.perf_counter()
+        async for row in iter_batch(pending, args.mode, args.concurrency, args.retries, args.retry_delay):
+            out.write(format_row(row, fmt))
+            out.flush()
+            counts[row["status"]] += 1
+        elapsed = time.perf_counter() - start
+
+    rate = len(pending) / elapsed if elapsed > 0 else 0.0
+    print(f"[batch] {len(pending)} items in {elapsed:.2f} s ({rate:.2f} items/s): {counts['ready']} ready, "
+          f"{counts['failed']} failed, {len(items) - len(pending)} already done", file=sys.stderr)
+    return 1 if counts["failed"] else 0
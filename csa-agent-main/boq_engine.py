@@ -0,0 +1,729 @@
+#boq_engine.py
+"""
+Deterministic BOQ engine: maps the user's answers onto the price catalog and
+renders the BOQ table locally, without an LLM round trip.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, create_model
+from prompts import QUESTIONS, QUESTION_IDS, QUESTION_SECTIONS, SECTIONS as QUESTIONNAIRE_SECTIONS, question_label
+from llm_admission import get_admission, estimate_tokens
+
+NOT_SPECIFIED = "[Not Specified]"
+OPTIONAL = "[Optional]"
+PRICE_ON_REQUEST = "Pricing depends on requirements"
+TOTALS_HEADING = "### Budgetary totals"
+
+# Question indices in prompts.QUESTIONS that each catalog value is read from
+Q_AREA_DETAILS = 3
+Q_OFFICE_HARDWARE = 4
+Q_ACCOMMODATION_HARDWARE = 5
+Q_SERVICE_FEATURES = 6
+Q_SIP_GENERAL = 7
+Q_SIP_CALLING = 8
+Q_CALL_CENTER_CAPACITY = 9
+Q_CALL_CENTER_FEATURES = 10
+Q_VIDEO_ROOMS = 11
+
+CALLING_OPTIONS = ["Local", "National", "Mobile", "International", "Toll Free"]
+
+
+class CatalogItem(BaseModel):
+    """One row of the BOQ price catalog"""
+    model_config = ConfigDict(frozen=True)
+
+    key: str                          # stable identifier, e.g. "executive_phone"
+    section: str                      # BOQ service column
+    description: str                  # Requirements / Description cell (markdown)
+    kind: str = "count"               # count | yes_no | calling | selection | coordinates | text | phrase | heading
+    unit_price: Optional[int] = None  # budgetary price per unit
+    price_note: str = "-"             # price cell when there is no unit price
+    placeholder: str = "[Value]"      # Qty/Value cell in the LLM template
+    source: Optional[int] = None      # index into prompts.QUESTIONS
+    keywords: Tuple[str, ...] = ()    # regexes locating the value in the answer
+    alternative_to: Optional[str] = None  # key of the row this one replaces when chosen
+    choice: Tuple[str, ...] = ()      # regexes in the answer's clause choosing this alternative
+
+
+def _item(key, section, description, source=None, keywords=(), choice=(), **kwargs) -> CatalogItem:
+    return CatalogItem(key=key, section=section, description=description,
+                       source=source, keywords=tuple(keywords), choice=tuple(choice), **kwargs)
+
+IPT, SIP, CC, VC = "IP Telephony", "SIP Trunk_ISP", "Customer Care / Call Center", "Video Conferencing"
+
+# Price catalog, in BOQ order. Also rendered as the example table in create_boq.user_prompt.
+CATALOG: List[CatalogItem] = [
+    _item("offices", IPT, "**Area Type**<br>Offices - Number of admin/management offices per building",
+          Q_AREA_DETAILS, [r"offices?"], kind="text"),
+    _item("accommodations", IPT, "Accommodations - Number of accommodation units",
+          Q_AREA_DETAILS, [r"accommodations?"], kind="text"),
+    _item("other_areas", IPT, "Other area types (Hotel, Hospital etc) and rooms: [Details]",
+          Q_AREA_DETAILS, [r"other"], kind="text", placeholder="-"),
+    _item("office_phones", IPT, "**IP Phones - Office Area**", kind="heading", price_note="", placeholder=""),
+    _item("executive_phone", IPT, "Executive Phone: Cisco 8845", Q_OFFICE_HARDWARE, [r"executive"], unit_price=1250),
+    _item("manager_phone", IPT, "Manager Phone: Cisco 9871", Q_OFFICE_HARDWARE, [r"manager"], unit_price=1600),
+    _item("employee_phone", IPT, "Employee Phone: Cisco 9851", Q_OFFICE_HARDWARE, [r"employee"], unit_price=950),
+    _item("conference_phone", IPT, "Conference Room: Cisco 8832", Q_OFFICE_HARDWARE, [r"conference"], unit_price=3500),
+    _item("other_phone", IPT, "Any other: [Specify]", Q_OFFICE_HARDWARE, [r"others?", r"any other"]),
+    _item("accommodation_phones", IPT, "**IP Phones - Accommodation Area**", kind="heading", price_note="", placeholder=""),
+    _item("living_room_phone", IPT, "Living Room: Cisco 9851", Q_ACCOMMODATION_HARDWARE, [r"living"], unit_price=950),
+    _item("bed_room_phone", IPT, "Bed Room: Cisco 7821", Q_ACCOMMODATION_HARDWARE, [r"bed ?rooms?"], unit_price=600),
+    _item("wash_room_phone", IPT, "Wash Room / Rest Room: Cisco 7811", Q_ACCOMMODATION_HARDWARE,
+          [r"wash ?rooms?", r"rest ?rooms?"], unit_price=450),
+    _item("voice_mail", IPT, "**Features**<br>Voice mail required", Q_SERVICE_FEATURES, [r"voice ?mail"],
+          kind="yes_no", placeholder="[Yes/No]"),
+    _item("calling", IPT, "Calling Requirements (Internal Only / Internal + SIP Trunk)", Q_SERVICE_FEATURES,
+          kind="calling", placeholder="[Selection]"),
+    _item("coordinates", SIP, "**Location Coordinates**", Q_SIP_GENERAL, kind="coordinates"),
+    _item("dids", SIP, "**Number of DIDs required**", Q_SIP_GENERAL, [r"dids?(?! ?/ ?dod)", r"direct numbers?"],
+          price_note=PRICE_ON_REQUEST),
+    _item("channels", SIP, "**Number of DID/DOD channels required**", Q_SIP_GENERAL, [r"channels?"],
+          price_note=PRICE_ON_REQUEST),
+    _item("calling_options", SIP, "**Required calling options**<br>Local, National, Mobile, International, Toll Free, etc.",
+          Q_SIP_CALLING, kind="selection", placeholder="[Selection]"),
+    _item("supervisors", CC, "**Staffing**<br>Number of supervisors", Q_CALL_CENTER_CAPACITY, [r"supervisors?"],
+          price_note=PRICE_ON_REQUEST),
+    _item("seat_agents", CC, "Number of Seat Agents", Q_CALL_CENTER_CAPACITY, [r"(?:seat )?agents?"],
+          price_note=PRICE_ON_REQUEST),
+    _item("call_recordings", CC, "**Features**<br>Call Recordings", Q_CALL_CENTER_FEATURES, [r"recordings?"], kind="yes_no"),
+    _item("storage", CC, "Storage", Q_CALL_CENTER_FEATURES, [r"storage"], kind="phrase"),
+    _item("concurrent_calls", CC, "Concurrent Calls", Q_CALL_CENTER_CAPACITY, [r"concurrent(?: calls?)?"]),
+    _item("detailed_features", CC, "Detailed Features", Q_CALL_CENTER_FEATURES,
+          [r"(?:need|want)s?", r"ivr", r"features?"], kind="phrase"),
+    _item("meeting_pods", VC, "**Meeting Pods/Silent Room/Focus Room**<br>1-2 Person: Desk Mini/Desk/DeskPro",
+          Q_VIDEO_ROOMS, [r"pods?", r"silent", r"focus"]),
+    _item("huddle_room", VC, "**Huddle Room**<br>1-3 Person/Chair: Room Bar with 55 inch TV screen and Accessories",
+          Q_VIDEO_ROOMS, [r"huddle"], unit_price=18000),
+    _item("small_room_bar", VC, "**Small Room**<br>3-6 Person/Chair: Room Bar Pro with 65 inch TV screen and Accessories",
+          Q_VIDEO_ROOMS, [r"small"], unit_price=38000),
+    _item("small_room_board", VC, "3-6 Person/Chair: Webex Board 55 Pro (interactive)",
+          Q_VIDEO_ROOMS, [r"small"], unit_price=55000, alternative_to="small_room_bar",
+          choice=[r"(?:webex )?board", r"interactive"], placeholder=OPTIONAL),
+    _item("executive_office_bar", VC, "**Executive Director personal office**<br>1-3 Person/Chair: Room Bar Pro with 65 inch TV screen and Accessories",
+          Q_VIDEO_ROOMS, [r"executive"], unit_price=38000),
+    _item("executive_office_board", VC, "1-3 Person/Chair: Webex Board 75 Pro (interactive)",
+          Q_VIDEO_ROOMS, [r"executive"], unit_price=95000, alternative_to="executive_office_bar",
+          choice=[r"(?:webex )?board", r"interactive"], placeholder=OPTIONAL),
+    _item("medium_room_board", VC, "**Medium meeting room**<br>6-8 Person/Chair: Webex Board 75 Pro (interactive)",
+          Q_VIDEO_ROOMS, [r"medium"], unit_price=95000),
+    _item("medium_room_kit", VC, "6-8 Person/Chair: Room Kit EQ with 70 inch TV screen and accessories",
+          Q_VIDEO_ROOMS, [r"medium"], unit_price=60000, alternative_to="medium_room_board",
+          choice=[r"room kit", r"kit eq", r"70 ?inch"], placeholder=OPTIONAL),
+    _item("large_room", VC, "**Large meeting room**<br>8-14 Person/Chair: Room Kit Pro with 75 inch TV screen and accessories",
+          Q_VIDEO_ROOMS, [r"large"], unit_price=75000),
+    _item("board_room", VC, "**Board Room**<br>12-18 Person/Chair: Room Kit Pro with 2x 75 inch or 1x 85 inch TV screen and accessories",
+          Q_VIDEO_ROOMS, [r"board(?: ?rooms?)?"], unit_price=80000),
+]
+
+CATALOG_BY_KEY: Dict[str, CatalogItem] = {item.key: item for item in CATALOG}
+# Rows offered instead of another (e.g. an interactive board instead of a room bar), by the key they replace.
+# One of the pair gets the quantity, the other is shown as [Optional].
+ALTERNATIVES: Dict[str, CatalogItem] = {item.alternative_to: item for item in CATALOG if item.alternative_to}
+SECTIONS: List[str] = list(dict.fromkeys(item.section for item in CATALOG))
+
+TABLE_HEADER = [
+    "| Services | Requirements / Description | Qty/Value | Budgetary pricing per unit |",
+    "| :--- | :--- | :--- | :--- |",
+]
+
+
+def price_cell(item: CatalogItem) -> str:
+    return str(item.unit_price) if item.unit_price is not None else item.price_note
+
+
+def render_template_rows(sections: Optional[Iterable[str]] = None) -> str:
+    """Catalog (or the rows of some sections) as the example table shown to the LLM, placeholders instead of values"""
+    items = CATALOG if sections is None else [item for item in CATALOG if item.section in set(sections)]
+    return "\n".join(TABLE_HEADER + [_row(item, item.placeholder, first) for item, first in _with_section_start(items)])
+
+
+def _with_section_start(items):
+    seen = set()
+    for item in items:
+        yield item, item.section not in seen
+        seen.add(item.section)
+
+
+def _row(item: CatalogItem, qty: str, first_in_section: bool, price: Optional[str] = None) -> str:
+    service = f"**{item.section}**" if first_in_section else ""
+    price = price_cell(item) if price is None else price
+    cells = [service, item.description, qty, price]
+    return "|" + "|".join(f" {cell} " if cell else " " for cell in cells) + "|"
+
+
+# ---------------------------------------------------------------------------
+# Reading answers out of the final summary table
+# ---------------------------------------------------------------------------
+
+def _clean(cell: str) -> str:
+    return re.sub(r"\s+", " ", cell.replace("**", "").replace("<br>", " ")).strip()
+
+
+def parse_summary_table(info_summary: str) -> List[List[str]]:
+    """Rows of the markdown summary table (header and separator rows removed)"""
+    text = info_summary.strip()
+    if "\n" not in text:
+        # Table flattened onto one line: rows are joined by "| |"
+        text = text.replace("| |", "|\n|")
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("|"):
+            continue
+        cells = [_clean(c) for c in line.strip("|").split("|")]
+        if all(re.fullmatch(r":?-{3,}:?", c) or not c for c in cells):
+            continue
+        rows.append(cells)
+    if rows and any("response" in c.lower() for c in rows[0]):
+        rows = rows[1:]
+    return rows
+
+
+def markdown_table(text: str) -> Tuple[List[str], List[List[str]]]:
+    """
+    (header, rows) of a markdown summary or BOQ table, cells as the frontend
+    shows them: trimmed, bold markers removed, <br> line breaks kept
+    """
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip().startswith("|")]
+    table = []
+    for line in lines:
+        inner = line[1:-1] if line.endswith("|") and len(line) > 1 else line[1:]
+        cells = [cell.strip().replace("**", "") for cell in inner.split("|")]
+        if not all(re.fullmatch(r":?-{3,}:?", c) or not c for c in cells):
+            table.append(cells)
+    if not table:
+        return [], []
+    return [cell for cell in table[0] if cell], table[1:]
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _overlap(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+LABEL_WORDS = [_words(question_label(q)) for q in QUESTIONS]
+QUESTION_WORDS = [_words(q) for q in QUESTIONS]
+
+
+def summary_rows(info_summary: str) -> List[Tuple[int, List[str]]]:
+    """
+    (question index, cells) per summary row: each row goes to the question whose
+    label (first column) or text (question column) shares the most words with it.
+    """
+    rows = []
+    for cells in parse_summary_table(info_summary):
+        if len(cells) < 2:
+            continue
+        section = _words(cells[0])
+        question = _words(cells[-2]) if len(cells) > 2 else frozenset()
+        index = max(range(len(QUESTIONS)), key=lambda i: max(_overlap(section, LABEL_WORDS[i]),
+                                                              _overlap(question, QUESTION_WORDS[i])))
+        rows.append((index, cells))
+    return rows
+
+
+def answers_from_summary(info_summary: str) -> Dict[int, str]:
+    """Answers by question index read back from the summary table; responses for the same question are joined"""
+    answers: Dict[int, List[str]] = {}
+    for index, cells in summary_rows(info_summary):
+        answers.setdefault(index, []).append(cells[-1])
+    return {index: "; ".join(texts) for index, texts in answers.items()}
+
+
+def answers_by_index(answers: Dict[str, str]) -> Dict[int, str]:
+    """GraphState.answers (keyed Q1..Qn) keyed by index into QUESTIONS"""
+    return {QUESTION_IDS.index(qid): text for qid, text in answers.items() if qid in QUESTION_IDS}
+
+
+# ---------------------------------------------------------------------------
+# Extraction
+# ---------------------------------------------------------------------------
+
+NONE_WORDS = r"(?:none|no|nil|n/?a|zero|not required|not applicable)"
+NUMBER = r"(\d+(?:,\d{3})*)"
+
+
+def _number(text: str) -> int:
+    return int(text.replace(",", ""))
+
+
+def is_none_answer(text: str) -> bool:
+    """Answer that declines the whole question ("None", "N/A", "Not required", "0")"""
+    return bool(re.fullmatch(rf"\W*(?:{NONE_WORDS}|0)\W*", text.strip(), re.IGNORECASE))
+
+
+def extract_count(text: str, keywords: Tuple[str, ...]) -> Optional[int]:
+    """
+    Quantity stated next to one of the keywords ("Executive: 5", "50 DIDs"),
+    or 0 for "none". When a number sits on both sides, the closer one wins.
+    """
+    for keyword in keywords:
+        if re.search(rf"(?:\b{NONE_WORDS}\b\s+(?:\w+\s)?{keyword}\b|\b{keyword}\b[^,;\n]{{0,20}}?\b{NONE_WORDS}\b)",
+                     text, re.IGNORECASE):
+            return 0
+        # keyword then number, without crossing into the next list item
+        after = re.search(rf"\b{keyword}\b([^0-9,;\n]{{0,30}}?){NUMBER}", text, re.IGNORECASE)
+        # number then keyword ("50 DIDs", "2 x huddle rooms")
+        before = re.search(rf"{NUMBER}(\s*(?:x\s*)?(?:\w+\s)?){keyword}\b", text, re.IGNORECASE)
+        if after and (not before or len(after.group(1)) <= len(before.group(2))):
+            return _number(after.group(2))
+        if before:
+            return _number(before.group(1))
+    return None
+
+
+def extract_yes_no(text: str, keywords: Tuple[str, ...]) -> Optional[str]:
+    for keyword in keywords:
+        match = re.search(rf"(?:\b(yes|no)\b[^,;.\n]{{0,25}}\b{keyword}\b|\b{keyword}\b[^,;.\n]{{0,25}}?\b(yes|no|not)\b)",
+                          text, re.IGNORECASE)
+        if match:
+            return "No" if (match.group(1) or match.group(2)).lower() in ("no", "not") else "Yes"
+        if re.search(rf"\b{keyword}\b", text, re.IGNORECASE):
+            negated = re.search(rf"\b(?:no|not|without)\b[^,;.\n]{{0,15}}\b{keyword}\b", text, re.IGNORECASE)
+            return "No" if negated else "Yes"
+    leading = re.match(r"\W*(yes|no)\b", text, re.IGNORECASE)
+    return leading.group(1).capitalize() if leading else None
+
+
+def extract_clause(text: str, keywords: Tuple[str, ...], boundary: str = ".;\n") -> Optional[str]:
+    """The fragment between two boundary characters that mentions the keyword"""
+    for keyword in keywords:
+        match = re.search(rf"[^{boundary}]*\b{keyword}\b[^{boundary}]*", text, re.IGNORECASE)
+        if match:
+            return match.group(0).strip(" :,")
+    return None
+
+
+def extract_value(item: CatalogItem, text: str):
+    """Value for a catalog row from the answer text, or None if it cannot be read locally"""
+    if item.kind == "count":
+        return extract_count(text, item.keywords)
+    if item.kind == "yes_no":
+        return extract_yes_no(text, item.keywords)
+    if item.kind == "calling":
+        if re.search(r"\bexternal\b", text, re.IGNORECASE):
+            return "Internal + SIP Trunk"
+        if re.search(r"\binternal\b", text, re.IGNORECASE):
+            return "Internal Only"
+        return None
+    if item.kind == "selection":
+        # Options named only to rule them out ("no International") are not selected
+        found = [opt for opt in CALLING_OPTIONS if re.search(rf"\b{opt}\b", text, re.IGNORECASE)
+                 and not re.search(rf"\b(?:no|not|without|except|excluding)\b[^,;.\n]{{0,15}}\b{opt}\b",
+                                   text, re.IGNORECASE)]
+        other = re.search(r"\bother\b[^.;\n]*", text, re.IGNORECASE)
+        if other and not is_none_answer(other.group(0)[5:]):
+            found.append(other.group(0).strip())
+        return ", ".join(found) or None
+    if item.kind == "coordinates":
+        match = re.search(r"-?\d+\.\d+\s*,\s*-?\d+\.\d+", text)
+        return match.group(0) if match else None
+    if item.kind == "text":
+        return extract_clause(text, item.keywords)
+    if item.kind == "phrase":
+        return extract_clause(text, item.keywords, boundary=",.;\n")
+    return None
+
+
+# ---------------------------------------------------------------------------
+# BOQ computation and rendering
+# ---------------------------------------------------------------------------
+
+class BOQLine(BaseModel):
+    """A computed BOQ row"""
+    key: str
+    section: str
+    description: str
+    value: Optional[str] = None      # Qty/Value cell content (None = not specified)
+    quantity: Optional[int] = None
+    unit_price: Optional[int] = None
+    heading: bool = False
+
+    @property
+    def total(self) -> Optional[int]:
+        """quantity * unit_price, for rows with both"""
+        if self.quantity is None or self.unit_price is None:
+            return None
+        return self.quantity * self.unit_price
+
+
+class BOQTable(BaseModel):
+    lines: List[BOQLine]
+    unresolved: List[str] = []       # keys whose value could not be read locally
+
+    def section_totals(self) -> Dict[str, int]:
+        """Sum of the line totals per section, in table order; sections with no priced quantity are left out"""
+        totals: Dict[str, int] = {}
+        for line in self.lines:
+            if line.total is not None:
+                totals[line.section] = totals.get(line.section, 0) + line.total
+        return totals
+
+    @property
+    def grand_total(self) -> int:
+        return sum(self.section_totals().values())
+
+
+def section_answers(answers: Dict[int, str]) -> Dict[str, str]:
+    """Answer text per BOQ section (all its source questions joined)"""
+    texts: Dict[str, List[str]] = {}
+    for item in CATALOG:
+        if item.source is not None and answers.get(item.source):
+            texts.setdefault(item.section, [])
+            if answers[item.source] not in texts[item.section]:
+                texts[item.section].append(answers[item.source])
+    return {section: "; ".join(parts) for section, parts in texts.items()}
+
+
+def included_sections(answers: Dict[int, str]) -> List[str]:
+    """Sections the user gave details for; declined or missing sections are left out"""
+    by_section = section_answers(answers)
+    return [section for section in SECTIONS
+            if section in by_section and not all(is_none_answer(part) for part in by_section[section].split("; "))]
+
+
+def option_chosen(item: CatalogItem, answers: Dict[int, str]) -> bool:
+    """
+    Whether a row of an alternative pair takes the quantity: the alternative
+    when the answer's clause for the room asks for it (e.g. "Small Rooms: 2,
+    Webex Board"), the row it replaces otherwise. Rows without an alternative
+    are always chosen.
+    """
+    alternative = item if item.alternative_to else ALTERNATIVES.get(item.key)
+    if alternative is None:
+        return True
+    clause = extract_clause(answers.get(alternative.source, ""), alternative.keywords, boundary=",.;\n") or ""
+    asked = any(re.search(rf"\b{pattern}\b", clause, re.IGNORECASE) for pattern in alternative.choice)
+    return asked == (item is alternative)
+
+
+def compute_line(item: CatalogItem, answers: Dict[int, str], overrides: Dict[str, object]) -> BOQLine:
+    line = BOQLine(key=item.key, section=item.section, description=item.description,
+                   unit_price=item.unit_price, heading=item.kind == "heading")
+    if line.heading:
+        return line
+
+    if item.key in overrides:
+        value = overrides[item.key]
+    else:
+        text = answers.get(item.source, "") if item.source is not None else ""
+        value = extract_value(item, text) if text else None
+        if value is None and item.kind == "count" and text and is_none_answer(text):
+            value = 0
+
+    if value is None:
+        return line
+    if item.kind == "count" and not option_chosen(item, answers):
+        line.value = OPTIONAL
+    elif item.kind == "count":
+        line.quantity = int(value)
+        line.value = str(line.quantity)
+    else:
+        line.value = str(value)
+    return line
+
+
+def compute_boq(answers: Dict[int, str], overrides: Optional[Dict[str, object]] = None) -> BOQTable:
+    """BOQ lines for the answered sections. overrides supplies values by catalog key."""
+    overrides = overrides or {}
+    sections = set(included_sections(answers))
+    lines, unresolved = [], []
+    for item in CATALOG:
+        if item.section not in sections:
+            continue
+        line = compute_line(item, answers, overrides)
+        if not line.heading and line.value is None and item.source is not None and answers.get(item.source):
+            unresolved.append(item.key)
+        lines.append(line)
+    return BOQTable(lines=lines, unresolved=unresolved)
+
+
+def render_lines(lines: List[BOQLine]) -> List[str]:
+    """Table rows for computed lines, each section's name on its first row"""
+    rows, started = [], set()
+    for line in lines:
+        first = line.section not in started
+        started.add(line.section)
+        qty = "" if line.heading else (line.value if line.value is not None else NOT_SPECIFIED)
+        rows.append(_row(CATALOG_BY_KEY[line.key], qty, first))
+    return rows
+
+
+def render_totals(table: BOQTable) -> List[str]:
+    """
+    Totals block shown below the table: each priced line (quantity x unit
+    price), a total per section and the grand total. Kept out of the table
+    so its four columns stay the ones the LLM path writes.
+    """
+    totals = table.section_totals()
+    if not totals:
+        return []
+    rows = ["", TOTALS_HEADING]
+    for section, section_total in totals.items():
+        rows.append(f"**{section}**")
+        rows.extend(f"- {_clean(line.description)}: {line.quantity} x {line.unit_price:,} = {line.total:,}"
+                    for line in table.lines if line.section == section and line.total is not None)
+        rows.append(f"- Section total: {section_total:,}")
+    rows.append(f"**Grand total: {table.grand_total:,}**")
+    return rows
+
+
+def render_boq(table: BOQTable) -> str:
+    """Markdown BOQ in the same layout the LLM path produces, followed by its totals"""
+    return "\n".join(["## BOQ"] + TABLE_HEADER + render_lines(table.lines) + render_totals(table))
+
+
+# ---------------------------------------------------------------------------
+# Incremental updates: one answer edited, only the rows that read it recomputed
+# ---------------------------------------------------------------------------
+
+# Catalog rows, and the BOQ sections they belong to, that read each question
+# (index into prompts.QUESTIONS). Questions with no rows (building count,
+# network connectivity) change nothing in the table.
+QUESTION_ROWS: Dict[int, List[str]] = {}
+for _entry in CATALOG:
+    if _entry.source is not None:
+        QUESTION_ROWS.setdefault(_entry.source, []).append(_entry.key)
+BOQ_DEPENDENCIES: Dict[int, List[str]] = {
+    index: list(dict.fromkeys(CATALOG_BY_KEY[key].section for key in keys)) for index, keys in QUESTION_ROWS.items()
+}
+
+DESCRIPTION_KEYS = {_clean(item.description): item.key for item in CATALOG}
+SECTION_NAMES = {_clean(section).lower(): section for section in SECTIONS}
+
+
+class RowChange(BaseModel):
+    """A BOQ row changed by an edit: its Qty/Value cell before and after (None = no such row)"""
+    key: Optional[str] = None        # catalog key (None for rows the LLM added)
+    section: Optional[str] = None
+    description: str
+    before: Optional[str] = None
+    after: Optional[str] = None
+
+
+def _data_cells(line: str) -> Optional[List[str]]:
+    """Cells of a BOQ table data row; None for the header, separator rows and anything else"""
+    stripped = line.strip()
+    if not stripped.startswith("|"):
+        return None
+    cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+    if all(re.fullmatch(r":?-{3,}:?", c) or not c for c in cells) or _clean(cells[0]).lower() == "services":
+        return None
+    return cells
+
+
+def is_data_row(line: str) -> bool:
+    return _data_cells(line) is not None
+
+
+def table_rows(text: str) -> List[Tuple[int, Optional[str], Optional[str], List[str]]]:
+    """
+    (line number, section, catalog key, cells) per data row of a BOQ table,
+    engine- or LLM-written. Rows are matched to the catalog by description;
+    others belong to the section named in their first cell, else the one above.
+    """
+    rows, section = [], None
+    for n, line in enumerate(text.splitlines()):
+        cells = _data_cells(line)
+        if cells is None:
+            continue
+        key = DESCRIPTION_KEYS.get(_clean(cells[1])) if len(cells) > 1 else None
+        section = CATALOG_BY_KEY[key].section if key else SECTION_NAMES.get(_clean(cells[0]).lower(), section)
+        rows.append((n, section, key, cells))
+    return rows
+
+
+def _qty(cells: List[str]) -> str:
+    return cells[2] if len(cells) > 2 else ""
+
+
+def priced_lines(text: str) -> BOQTable:
+    """The catalog rows of a rendered table that have a unit price and a whole-number quantity"""
+    lines = []
+    for _, section, key, cells in table_rows(text):
+        item = CATALOG_BY_KEY.get(key)
+        if item is not None and item.unit_price is not None and _qty(cells).isdigit():
+            lines.append(BOQLine(key=key, section=section, description=item.description, value=_qty(cells),
+                                 quantity=int(_qty(cells)), unit_price=item.unit_price))
+    return BOQTable(lines=lines)
+
+
+def with_totals(text: str) -> str:
+    """text with its totals block (if any) replaced by one computed from its rows"""
+    start = text.find(TOTALS_HEADING)
+    table = text[:start].rstrip("\n") if start >= 0 else text
+    return "\n".join([table] + render_totals(priced_lines(table)))
+
+
+def patch_table(text: str, answers: Dict[int, str], index: int,
+                overrides: Optional[Dict[str, object]] = None) -> BOQTable:
+    """
+    Lines of the BOQ sections that read question index, after its answer
+    changed: rows reading it are recomputed, the others keep their Qty/Value
+    from text (which may have come from the LLM). unresolved lists the
+    recomputed rows the patterns could not read.
+    """
+    overrides = overrides or {}
+    sections = set(BOQ_DEPENDENCIES.get(index, [])) & set(included_sections(answers))
+    kept = {key: _qty(cells) for _, section, key, cells in table_rows(text)
+            if key is not None and CATALOG_BY_KEY[key].source != index}
+    lines, unresolved = [], []
+    for item in CATALOG:
+        if item.section not in sections:
+            continue
+        if item.key in kept and item.key not in overrides:
+            value = kept[item.key]
+            lines.append(BOQLine(key=item.key, section=item.section, description=item.description,
+                                 value=None if value in ("", NOT_SPECIFIED) else value,
+                                 unit_price=item.unit_price, heading=item.kind == "heading"))
+            continue
+        line = compute_line(item, answers, overrides)
+        if not line.heading and line.value is None and item.source is not None and answers.get(item.source):
+            unresolved.append(item.key)
+        lines.append(line)
+    return BOQTable(lines=lines, unresolved=unresolved)
+
+
+def splice_rows(text: str, table: BOQTable, sections: Iterable[str]) -> str:
+    """
+    text with every row of the given sections replaced by table's rows for
+    them; a section new to the table goes where the catalog order puts it.
+    A totals block below the table is recomputed for the new rows.
+    """
+    lines = text.splitlines()
+    rows = table_rows(text)
+    affected = set(sections)
+    first_row: Dict[str, int] = {}
+    for n, section, _, _ in rows:
+        first_row.setdefault(section, n)
+    removed = {n for n, section, _, _ in rows if section in affected}
+    table_end = max((n for n, line in enumerate(lines) if line.strip().startswith("|")), default=len(lines) - 1) + 1
+
+    inserted: Dict[int, List[str]] = {}
+    for position, section in enumerate(SECTIONS):
+        new_rows = render_lines([line for line in table.lines if line.section == section])
+        if section not in affected or not new_rows:
+            continue
+        if section in first_row:
+            anchor = first_row[section]
+        else:
+            anchor = next((first_row[later] for later in SECTIONS[position + 1:] if later in first_row), table_end)
+        inserted.setdefault(anchor, []).extend(new_rows)
+
+    out = []
+    for n, line in enumerate(lines):
+        out.extend(inserted.pop(n, []))
+        if n not in removed:
+            out.append(line)
+    for anchor in sorted(inserted):
+        out.extend(inserted[anchor])
+    spliced = "\n".join(out)
+    return with_totals(spliced) if TOTALS_HEADING in text else spliced
+
+
+def row_changes(before: str, after: str, sections: Iterable[str]) -> List[RowChange]:
+    """Rows of the given sections whose Qty/Value differs between two tables, in table order"""
+    affected = set(sections)
+
+    def values(text: str) -> Dict[str, Tuple[Optional[str], Optional[str], str]]:
+        return {key or _clean(cells[1] if len(cells) > 1 else cells[0]): (key, section, _qty(cells))
+                for _, section, key, cells in table_rows(text) if section in affected}
+
+    old, new = values(before), values(after)
+    changes = []
+    for name in list(new) + [name for name in old if name not in new]:
+        key, section, value = new.get(name) or old[name]
+        previous = old[name][2] if name in old else None
+        current = new[name][2] if name in new else None
+        if previous != current:
+            changes.append(RowChange(key=key, section=section, description=_clean(CATALOG_BY_KEY[key].description)
+                                     if key else name, before=previous, after=current))
+    return changes
+
+
+# ---------------------------------------------------------------------------
+# Per-section slices of the summary, for one LLM call per BOQ section
+# ---------------------------------------------------------------------------
+
+def _question_sections(index: int) -> List[str]:
+    """
+    BOQ sections a question feeds. General questions without rows of their
+    own (building count, area types) feed those of their questionnaire section.
+    """
+    if index in BOQ_DEPENDENCIES:
+        return BOQ_DEPENDENCIES[index]
+    peers = QUESTIONNAIRE_SECTIONS[QUESTION_SECTIONS[index]]
+    return list(dict.fromkeys(section for peer in peers for section in BOQ_DEPENDENCIES.get(peer, [])))
+
+
+SECTION_QUESTIONS: Dict[str, List[int]] = {
+    section: [index for index in range(len(QUESTIONS)) if section in _question_sections(index)] for section in SECTIONS
+}
+
+
+def section_summaries(info_summary: str) -> Dict[str, str]:
+    """
+    The summary table split by BOQ section, in BOQ order: each section gets
+    the rows of the questions it is written from. Sections the user gave no
+    details for or declined are left out (see included_sections).
+    """
+    rows = summary_rows(info_summary)
+    answers: Dict[int, List[str]] = {}
+    for index, cells in rows:
+        answers.setdefault(index, []).append(cells[-1])
+    included = included_sections({index: "; ".join(texts) for index, texts in answers.items()})
+    slices = {}
+    for section in included:
+        lines = ["| " + " | ".join(cells) + " |" for index, cells in rows if index in SECTION_QUESTIONS[section]]
+        slices[section] = "\n".join(["| Section | Question | User Response |", "| --- | --- | --- |"] + lines)
+    return slices
+
+
+# ---------------------------------------------------------------------------
+# Optional LLM fallback for free-text answers the patterns could not read
+# ---------------------------------------------------------------------------
+
+def fallback_schema(keys: List[str]):
+    """Structured-output model with one optional field per unresolved catalog key"""
+    fields = {}
+    for key in keys:
+        item = CATALOG_BY_KEY[key]
+        field_type = Optional[int] if item.kind == "count" else Optional[str]
+        fields[key] = (field_type, None)
+    return create_model("BOQFields", **fields)
+
+
+def fallback_prompt(table: BOQTable, answers: Dict[int, str]) -> str:
+    wanted = "\n".join(f"- {key}: {_clean(CATALOG_BY_KEY[key].description)}" for key in table.unresolved)
+    sources = sorted({CATALOG_BY_KEY[key].source for key in table.unresolved})
+    context = "\n".join(f"Q: {question_label(QUESTIONS[i])}\nA: {answers[i]}" for i in sources)
+    return (
+        "Extract the following values from the user's answers. Use integers for quantities. "
+        "Use null when a value is not stated.\n\n"
+        f"Values:\n{wanted}\n\nAnswers:\n{context}"
+    )
+
+
+async def resolve_with_llm(llm, table: BOQTable, answers: Dict[int, str]) -> Dict[str, object]:
+    """One structured call for all unresolved values; returns the values it found"""
+    structured = llm.with_structured_output(fallback_schema(table.unresolved))
+    prompt = fallback_prompt(table, answers)
+    result = await get_admission().call(lambda: structured.ainvoke(prompt), estimate_tokens(prompt))
+    return {key: value for key, value in result.model_dump().items() if value is not None}
+
+
+async def build_boq(info_summary: str, llm=None, answers: Optional[Dict[str, str]] = None) -> str:
+    """
+    Render the BOQ locally. Uses the structured answers map (by question id)
+    when given, else reads the answers back out of the summary table.
+    With an llm, values the patterns could not read are extracted in one
+    small structured call.
+    """
+    answers = answers_by_index(answers) if answers else answers_from_summary(info_summary)
+    table = compute_boq(answers)
+    if llm is not None and table.unresolved:
+        table = compute_boq(answers, await resolve_with_llm(llm, table, answers))
+    return render_boq(table)
@@ -0,0 +1,125 @@
+#boq_jobs.py
+"""
+Background job queue for BOQ generation.
+
+A finished conversation's BOQ is generated by a pool of worker tasks instead
+of inside the HTTP request that asks for it, so a slow completion or a client
+timeout no longer loses the work. Failed attempts are retried with
+exponential backoff (honoring a Retry-After hint); after the last one the
+job's failure handler runs. The handlers keep job state and the finished
+table in the session record (see fastapi_app), so any worker can answer
+status and result requests.
+
+"inprocess" runs the workers on the application's event loop and needs no
+broker. Jobs queued there are lost on restart, which is why job state in the
+record expires (see fastapi_app.BOQ_JOB_TIMEOUT).
+"""
+import os
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import metrics
+
+BOQ_JOB_QUEUE = os.getenv("BOQ_JOB_QUEUE", "inprocess")
+BOQ_JOB_WORKERS = int(os.getenv("BOQ_JOB_WORKERS", "8"))              # jobs generated concurrently
+BOQ_JOB_RETRIES = int(os.getenv("BOQ_JOB_RETRIES", "2"))              # retries after a failed attempt
+BOQ_JOB_RETRY_DELAY = float(os.getenv("BOQ_JOB_RETRY_DELAY", "2"))    # seconds, doubled per retry
+
+# handler(job_id, payload, attempt) and on_failure(job_id, payload, error)
+JobHandler = Callable[[str, Dict[str, Any], int], Awaitable[None]]
+FailureHandler = Callable[[str, Dict[str, Any], Exception], Awaitable[None]]
+
+
+class JobQueue(ABC):
+    """Runs handler once per job id until it succeeds or retries run out"""
+
+    def __init__(self, handler: JobHandler, on_failure: FailureHandler,
+                 retries: int = BOQ_JOB_RETRIES, retry_delay: float = BOQ_JOB_RETRY_DELAY):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    @abstractmethod
+    async def start(self):
+        """Start the workers (application startup)"""
+
+    @abstractmethod
+    async def enqueue(self, job_id: str, payload: Dict[str, Any]) -> bool:
+        """Queue a job; returns False if a job with this id is already queued or running"""
+
+    @abstractmethod
+    def pending(self, job_id: str) -> bool:
+        """Whether a job with this id is queued or running"""
+
+    async def close(self):
+        """Stop the workers (application shutdown)"""
+
+    async def run(self, job_id: str, payload: Dict[str, Any]):
+        """One job: attempts with backoff, then the failure handler"""
+        for attempt in range(1, self.retries + 2):
+            try:
+                with metrics.stage("boq_job"):
+                    await self.handler(job_id, payload, attempt)
+                metrics.BOQ_JOBS.inc(1, "ready")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.record_error("boq_job", e)
+                if attempt > self.retries:
+                    metrics.BOQ_JOBS.inc(1, "failed")
+                    await self.on_failure(job_id, payload, e)
+                    return
+                metrics.BOQ_JOBS.inc(1, "retried")
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                await asyncio.sleep(max(delay, getattr(e, "retry_after", None) or 0))
+
+
+class InProcessJobQueue(JobQueue):
+    """asyncio.Queue drained by worker tasks on the event loop"""
+
+    def __init__(self, handler: JobHandler, on_failure: FailureHandler, workers: int = BOQ_JOB_WORKERS, **kwargs):
+        super().__init__(handler, on_failure, **kwargs)
+        self.workers = workers
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks = []
+        self.active: Set[str] = set()   # ids queued or running
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def enqueue(self, job_id: str, payload: Dict[str, Any]) -> bool:
+        if job_id in self.active:
+            return False
+        self.active.add(job_id)
+        self.queue.put_nowait((job_id, payload))
+        metrics.BOQ_JOBS.inc(1, "queued")
+        return True
+
+    def pending(self, job_id: str) -> bool:
+        return job_id in self.active
+
+    async def _work(self):
+        while True:
+            job_id, payload = await self.queue.get()
+            try:
+                await self.run(job_id, payload)
+            finally:
+                self.active.discard(job_id)
+                self.queue.task_done()
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.active.clear()
+
+
+def create_job_queue(handler: JobHandler, on_failure: FailureHandler, kind: str = BOQ_JOB_QUEUE) -> JobQueue:
+    """Build the queue selected by BOQ_JOB_QUEUE"""
+    if kind == "inprocess":
+        return InProcessJobQueue(handler, on_failure)
+    raise ValueError(f"Unknown BOQ_JOB_QUEUE '{kind}' (expected 'inprocess')")
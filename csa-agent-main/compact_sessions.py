@@ -0,0 +1,217 @@
+#compact_sessions.py
+"""
+Compact in-memory checkpointer for idle sessions.
+
+LangGraph's InMemorySaver keeps every checkpoint of a thread, each with a
+serialized copy of every channel that changed, so a finished conversation
+holds its history once per turn plus the formatted transcript and the last
+reply alongside it. A session only ever resumes from its committed
+checkpoint: the latest one, or its parent while a turn is in flight or after
+one failed (a failed turn's checkpoint is still written). So this saver keeps
+one SessionRecord per thread, linked to its parent's record until the session
+store prunes it once the turn is committed:
+
+- history as a tuple of (role, text) turns; long texts (the done-turn summary
+  table) are zlib-compressed. LangChain messages are rebuilt when a turn loads
+  the checkpoint;
+- next_response dropped when it is the last agent turn, and the transcript
+  cache dropped entirely (the next turn rebuilds it from history);
+- everything else serialized with the checkpointer's serde.
+
+Checkpoint history (get_state_history, time travel) is therefore not kept.
+"""
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+COMPRESS_ABOVE = 512  # characters; shorter texts cost more compressed than plain
+
+# Channels rebuilt from history on the next turn (see main.build_conversation_prompt)
+DERIVED_CHANNELS = ("transcript", "transcript_len")
+
+MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage}
+
+
+def pack_text(text: str):
+    return zlib.compress(text.encode()) if len(text) > COMPRESS_ABOVE else text
+
+
+def unpack_text(packed) -> str:
+    return zlib.decompress(packed).decode() if isinstance(packed, bytes) else packed
+
+
+def pack_turns(messages) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    """(role, text) turns, or None if a message carries more than plain text"""
+    turns = []
+    for m in messages:
+        if (type(m) is not MESSAGE_TYPES.get(m.type) or not isinstance(m.content, str)
+                or m.additional_kwargs or getattr(m, "tool_calls", None)):
+            return None
+        turns.append((m.type, pack_text(m.content)))
+    return tuple(turns)
+
+
+def unpack_turns(turns) -> list:
+    return [MESSAGE_TYPES[role](content=unpack_text(text)) for role, text in turns]
+
+
+class SessionRecord:
+    """Latest checkpoint of one thread"""
+    __slots__ = ("checkpoint_id", "checkpoint", "metadata", "turns", "values", "writes", "parent")
+
+    def __init__(self, checkpoint_id: str, checkpoint, metadata, turns, values):
+        self.checkpoint_id = checkpoint_id
+        self.checkpoint = checkpoint  # serialized, without channel_values
+        self.metadata = metadata      # serialized
+        self.turns = turns            # packed history, or None if history is kept in values
+        self.values = values          # serialized remaining channel values
+        self.writes = None            # {(task_id, idx): (task_id, channel, serialized value, task_path)}
+        self.parent = None            # record this checkpoint was created from (its own parent is dropped)
+
+
+class CompactSaver(BaseCheckpointSaver[int]):
+    """Keeps the latest checkpoint and its parent per thread and namespace, in SessionRecords"""
+
+    def __init__(self, *, serde=None):
+        super().__init__(serde=serde)
+        self.threads: Dict[str, Dict[str, SessionRecord]] = {}
+
+    def _record(self, config: RunnableConfig) -> Optional[SessionRecord]:
+        namespaces = self.threads.get(config["configurable"]["thread_id"])
+        if namespaces is None:
+            return None
+        record = namespaces.get(config["configurable"].get("checkpoint_ns", ""))
+        checkpoint_id = get_checkpoint_id(config)
+        if record is not None and checkpoint_id and checkpoint_id != record.checkpoint_id:
+            record = record.parent if record.parent and record.parent.checkpoint_id == checkpoint_id else None
+        return record
+
+    def _values(self, record: SessionRecord) -> Dict[str, Any]:
+        values = self.serde.loads_typed(record.values)
+        if record.turns is not None:
+            values["history"] = unpack_turns(record.turns)
+            if "next_response" not in values and record.turns and record.turns[-1][0] == "ai":
+                values["next_response"] = unpack_text(record.turns[-1][1])
+        return values
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, record: SessionRecord) -> CheckpointTuple:
+        writes = sorted((record.writes or {}).items(), key=lambda item: writes_sort_key(item[1][3], *item[0]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": record.checkpoint_id}},
+            checkpoint={**self.serde.loads_typed(record.checkpoint), "channel_values": self._values(record)},
+            metadata=self.serde.loads_typed(record.metadata),
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value))
+                            for _, (task_id, channel, value, _) in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        record = self._record(config)
+        if record is None:
+            return None
+        return self._tuple(config["configurable"]["thread_id"],
+                           config["configurable"].get("checkpoint_ns", ""), record)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        thread_ids = [config["configurable"]["thread_id"]] if config else list(self.threads)
+        for thread_id in thread_ids:
+            for checkpoint_ns, record in self.threads.get(thread_id, {}).items():
+                if config and config["configurable"].get("checkpoint_ns", checkpoint_ns) != checkpoint_ns:
+                    continue
+                if before and record.checkpoint_id >= get_checkpoint_id(before):
+                    continue
+                if filter and any(self.serde.loads_typed(record.metadata).get(k) != v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield self._tuple(thread_id, checkpoint_ns, record)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        skeleton = dict(checkpoint)
+        values = {k: v for k, v in skeleton.pop("channel_values").items()
+                  if v is not None and k not in DERIVED_CHANNELS}
+        turns = pack_turns(values["history"]) if "history" in values else None
+        if turns is not None:
+            del values["history"]
+            if turns and turns[-1][0] == "ai" and values.get("next_response") == unpack_text(turns[-1][1]):
+                del values["next_response"]
+        parent = self._record(config) if get_checkpoint_id(config) else None
+        record = SessionRecord(
+            checkpoint["id"],
+            self.serde.dumps_typed(skeleton),
+            self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            turns,
+            self.serde.dumps_typed(values),
+        )
+        if parent is not None:
+            parent.parent = None
+            record.parent = parent
+        self.threads.setdefault(thread_id, {})[checkpoint_ns] = record
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        record = self._record(config)
+        if record is None:
+            return  # writes against a checkpoint that has since been replaced
+        if record.writes is None:
+            record.writes = {}
+        for idx, (channel, value) in enumerate(writes):
+            key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if key[1] >= 0 and key in record.writes:
+                continue
+            record.writes[key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.threads.pop(thread_id, None)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """Drop the parents of the threads' latest checkpoints ("keep_latest") or the threads ("delete")"""
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.delete_thread(thread_id)
+                continue
+            for record in self.threads.get(thread_id, {}).values():
+                record.parent = None
+
+    # Everything is in memory on the event loop thread, so the async API just delegates
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        self.prune(thread_ids, strategy=strategy)
@@ -0,0 +1,97 @@
+#compression.py
+"""
+Response compression for buffered responses.
+
+Session reads, BOQ results and completing turns carry markdown tables of
+several kilobytes that compress well. A response sent in one piece and at
+least COMPRESS_MIN_BYTES long is compressed with brotli (if the `brotli`
+package is installed and the client accepts it) or gzip. Streamed responses
+(SSE turns and BOQ tables, batch rows) pass through untouched: compressing
+them would hold events back in the compressor's buffer.
+"""
+import os
+import gzip
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # smaller bodies are sent as is, 0 = off
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))   # 1 (fastest) .. 9 (smallest)
+COMPRESS_BROTLI_QUALITY = 5                                        # 0 .. 11; 5 is about gzip -6 speed, smaller output
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding the client accepts (brotli, then gzip); None for identity"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        accepted[name.strip()] = weight
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing single-message response bodies (see module docstring)"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http" and self.minimum_size:
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None  # response start, held back until the first body message shows whether it streams
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if not message.get("more_body", False) and len(body) >= self.minimum_size \
+                    and "content-encoding" not in headers:
+                compressed = compress(body, encoding)
+                if len(compressed) < len(body):
+                    metrics.RESPONSE_BYTES.inc(len(body), encoding, "raw")
+                    metrics.RESPONSE_BYTES.inc(len(compressed), encoding, "sent")
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "body": compressed}
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
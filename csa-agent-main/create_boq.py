@@ -1,12 +1,29 @@
 #create_boq.py
 import os
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from langchain.messages import SystemMessage, HumanMessage
-from langchain.chat_models import init_chat_model
+from llm_registry import get_llm, LLM_MODEL
+from llm_admission import get_admission, estimate_tokens
+from response_cache import get_response_cache, cache_key
+import metrics
+from prompts import QUESTION_IDS
+from boq_engine import (render_template_rows, build_boq, answers_by_index, patch_table, splice_rows, row_changes,
+                        resolve_with_llm, section_summaries, is_data_row, RowChange, BOQ_DEPENDENCIES, TABLE_HEADER)
 
 # Load environment variables
 load_dotenv()
 
+# "engine": price catalog only, no LLM call (default)
+# "hybrid": catalog, plus one small LLM call for values the engine could not read
+#           (both catalog modes add budgetary totals below the table)
+# "llm":    the whole table is written by the LLM
+BOQ_MODES = ("engine", "hybrid", "llm")
+BOQ_MODE = os.getenv("BOQ_MODE", "engine")
+# "llm" mode: one call per BOQ section, run concurrently, instead of one call for the whole table
+BOQ_SECTION_CALLS = os.getenv("BOQ_SECTION_CALLS", "1").lower() not in ("0", "false", "no", "off")
+
 
 system_prompt = """
 You are an expert BOQ (Bill of Quantities) generator for a project.
@@ -22,69 +39,228 @@ Information received from the user:
 1.  **Output Format:** Output *only* the BOQ table in the provided format. Do not include any introductory text, running commentary, or concluding remarks.
 2.  **Missing Sections:** If details for a specific section (e.g., "Video Conferencing") are not provided or specified by the user, **do not include that section** in the final BOQ table.
 3.  **Missing Values:** If specific values are not provided by the user, replace them with `[Not Specified]`.
+4.  **Alternatives:** A row with `[Optional]` is an alternative to the row above it. Give the quantity to only one of the two: keep `[Optional]` unless the user asked for that alternative, in which case mark the row above `[Optional]` instead.
 
 **Example Format:**
 ## BOQ
-| Services | Requirements / Description | Qty/Value | Budgetary pricing per unit |
-| :--- | :--- | :--- | :--- |
-| **IP Telephony** | **Area Type**<br>Offices - Number of admin/management offices per building | [Value] | - |
-| | Accommodations - Number of accommodation units | [Value] | - |
-| | Other area types (Hotel, Hospital etc) and rooms: [Details] | - | - |
-| | **IP Phones - Office Area** | | |
-| | Executive Phone: Cisco 8845 | [Value] | 1250 |
-| | Manager Phone: Cisco 9871 | [Value] | 1600 |
-| | Employee Phone: Cisco 9851 | [Value] | 950 |
-| | Conference Room: Cisco 8832 | [Value] | 3500 |
-| | Any other: [Specify] | [Value] | - |
-| | **IP Phones - Accommodation Area** | | |
-| | Living Room: Cisco 9851 | [Value] | 950 |
-| | Bed Room: Cisco 7821 | [Value] | 600 |
-| | Wash Room / Rest Room: Cisco 7811 | [Value] | 450 |
-| | **Features**<br>Voice mail required | [Yes/No] | - |
-| | Calling Requirements (Internal Only / Internal + SIP Trunk) | [Selection] | - |
-| **SIP Trunk_ISP** | **Location Coordinates** | [Value] | - |
-| | **Number of DIDs required** | [Value] | Pricing depends on requirements |
-| | **Number of DID/DOD channels required** | [Value] | Pricing depends on requirements |
-| | **Required calling options**<br>Local, National, Mobile, International, Toll Free, etc. | [Selection] | - |
-| **Customer Care / Call Center** | **Staffing**<br>Number of supervisors | [Value] | Pricing depends on requirements |
-| | Number of Seat Agents | [Value] | Pricing depends on requirements |
-| | **Features**<br>Call Recordings | [Value] | - |
-| | Storage | [Value] | - |
-| | Concurrent Calls | [Value] | - |
-| | Detailed Features | [Value] | - |
-| **Video Conferencing** | **Meeting Pods/Silent Room/Focus Room**<br>1-2 Person: Desk Mini/Desk/DeskPro | [Value] | - |
-| | **Huddle Room**<br>1-3 Person/Chair: Room Bar with 55 inch TV screen and Accessories | [Value] | 18000 |
-| | **Small Room**<br>3-6 Person/Chair: Room Bar Pro with 65 inch TV screen and Accessories | [Value] | 38000 |
-| | 3-6 Person/Chair: Webex Board 55 Pro (interactive) | [Value] | 55000 |
-| | **Executive Director personal office**<br>1-3 Person/Chair: Room Bar Pro with 65 inch TV screen and Accessories | [Value] | 38000 |
-| | 1-3 Person/Chair: Webex Board 75 Pro (interactive) | [Value] | 95000 |
-| | **Medium meeting room**<br>6-8 Person/Chair: Webex Board 75 Pro (interactive) | [Value] | 95000 |
-| | 6-8 Person/Chair: Room Kit EQ with 70 inch TV screen and accessories | [Value] | 60000 |
-| | **Large meeting room**<br>8-14 Person/Chair: Room Kit Pro with 75 inch TV screen and accessories | [Value] | 75000 |
-| | **Board Room**<br>12-18 Person/Chair: Room Kit Pro with 2x 75 inch or 1x 85 inch TV screen and accessories | [Value] | 80000 |
+{boq_template}
+""".replace("{boq_template}", render_template_rows())
+
+section_prompt = """
+Based on the following information received from the user, write the **{section}** rows of a BOQ (Bill of Quantities) for the project in the format provided.
+
+Information received from the user:
+{info_summary}
+
+**Instructions:**
+1.  **Output Format:** Output *only* the {section} rows of the table, the first one naming the section in the Services column. Do not include the heading, the header row, other sections or any other text.
+2.  **Missing Values:** If specific values are not provided by the user, replace them with `[Not Specified]`.
+3.  **Alternatives:** A row with `[Optional]` is an alternative to the row above it. Give the quantity to only one of the two: keep `[Optional]` unless the user asked for that alternative, in which case mark the row above `[Optional]` instead.
+
+**Example Format:**
+{boq_template}
 """
 
-def create_boq(info_summary:str):
+def build_boq_messages(info_summary: str):
+    """Messages for the BOQ generation call"""
+    final_user_prompt = user_prompt.replace("{info_summary}", info_summary)
+    return [SystemMessage(content=system_prompt),
+            HumanMessage(content=final_user_prompt)]
+
+def build_section_messages(section: str, section_summary: str):
+    """Messages for the call writing one BOQ section: its part of the summary and of the price template"""
+    final_user_prompt = (section_prompt.replace("{boq_template}", render_template_rows([section]))
+                         .replace("{section}", section).replace("{info_summary}", section_summary))
+    return [SystemMessage(content=system_prompt),
+            HumanMessage(content=final_user_prompt)]
+
+def boq_cache_key(messages) -> str:
+    return cache_key("boq", LLM_MODEL, [m.content for m in messages])
+
+class EmptySection(Exception):
+    """The call for a BOQ section wrote no table rows"""
+
+    def __init__(self, section: str):
+        super().__init__(f"the model wrote no rows for the {section} section")
+        self.section = section
+
+def has_rows(text: str) -> bool:
+    return any(is_data_row(line) for line in text.splitlines())
+
+async def stream_completion(messages, valid: Optional[Callable[[str], bool]] = None) -> AsyncIterator[str]:
+    """
+    Stream a BOQ completion, or replay it from the response cache. A
+    completion valid() rejects is not cached (nor replayed, if stored earlier).
+    """
+    key = boq_cache_key(messages)
+    cache = get_response_cache()
+    cached = await cache.get(key)
+    if cached is not None and (valid is None or valid(cached)):
+        yield cached
+        return
+
+    parts = []
+    async for chunk in get_admission().stream(
+        lambda: get_llm().astream(messages, config={"callbacks": metrics.callbacks()}),
+        estimate_tokens(messages)
+    ):
+        if chunk.content:
+            parts.append(chunk.content)
+            yield chunk.content
+    text = "".join(parts)
+    if valid is None or valid(text):
+        await cache.put(key, text)
+
+async def section_rows(section: str, section_summary: str) -> AsyncIterator[str]:
+    """
+    The section's table rows as each one completes; anything else the model
+    writes is dropped. Raises EmptySection if it wrote no rows at all.
+    """
+    pending, rows = "", 0
+    async for chunk in stream_completion(build_section_messages(section, section_summary), has_rows):
+        *lines, pending = (pending + chunk).split("\n")
+        for line in lines:
+            if is_data_row(line):
+                rows += 1
+                yield line.strip()
+    if is_data_row(pending):
+        rows += 1
+        yield pending.strip()
+    if not rows:
+        raise EmptySection(section)
+
+async def stream_sections(slices: Dict[str, str]) -> AsyncIterator[str]:
+    """
+    One concurrent call per BOQ section (slices: section summary by section,
+    in BOQ order), merged into one table in that order. The first section
+    streams row by row as it is written; the rows of later ones are held
+    until the sections before them are complete. A section the model wrote
+    no rows for fails the table with EmptySection once its turn comes, after
+    the rows before it, rather than being left out.
+    """
+    queues: Dict[str, asyncio.Queue] = {section: asyncio.Queue() for section in slices}
+
+    async def generate(section: str):
+        try:
+            async for row in section_rows(section, slices[section]):
+                queues[section].put_nowait(row)
+            queues[section].put_nowait(None)
+        except Exception as e:
+            queues[section].put_nowait(e)
+
+    tasks = [asyncio.create_task(generate(section)) for section in slices]
+    try:
+        yield "\n".join(["## BOQ"] + TABLE_HEADER) + "\n"
+        for section in slices:
+            while (row := await queues[section].get()) is not None:
+                if isinstance(row, Exception):
+                    raise row
+                yield row + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def create_boq(info_summary:str):
     """
     Generate BOQ from the summary.
-    Initializes LLM on demand to avoid side effects during import.
+    Uses the shared model from llm_registry (created on first use, pooled connections).
+    With BOQ_SECTION_CALLS, each requested section is written by its own call
+    (see stream_sections); sections the user declined get none.
+    Identical summaries are served from the response cache, unless the
+    response held no table rows.
     """
-    # Initialize the LLM here to avoid global scope issues
-    llm = init_chat_model("gpt-4o", model_provider="azure_openai", api_version="2025-01-01-preview")
-    
-    final_user_prompt = user_prompt.replace("{info_summary}", info_summary)
-    
-    # Use proper message types 
-    messages= [SystemMessage(content=system_prompt), 
-                HumanMessage(content=final_user_prompt)]
-                
-    response = llm.invoke(messages)
-    return response.content
+    slices = section_summaries(info_summary) if BOQ_SECTION_CALLS else None
+    if slices:
+        return "".join([chunk async for chunk in stream_sections(slices)])
+    messages = build_boq_messages(info_summary)
 
-if __name__ == "__main__":
-    info_summary = """
-        | Section | Question | User Response | |----------------------------------------------|-----------------------------------------------|------------------------------------------------------| | IP Telephony - General Requirements | How many buildings require IP telephony services, and will the site have connectivity to the ABC Network (Yes/No)? | 3 buildings requiring services, Yes | | IP Telephony - Area Breakdown | Could you please specify the details for the different area types? Offices: How many admin/management offices are in each building? Accommodations: How many accommodation units are in each building? Other: Are there any other area types (e.g., Hotel, Hospital) and how many rooms in each building? | Offices: Building A has 10, Building B has 5, Building C has 5. Accommodations: Building A has 0, Buildings B and C have 50 each. Other: No other area types. | | IP Telephony - Office Hardware | For the Office Area, please specify the quantities required for each phone type- Executive Phone, Manager Phone, Employee Phone, Conference Phone, Any other types? | Executive Phone: 5, Manager Phone: 15, Employee Phone: 100, Conference Phone: 3, Other: None | | IP Telephony - Accommodation Hardware | For the Accommodation Area, please specify the quantities required for Living Room, Bed Room, Wash Room / Rest Room | Living Room: 100, Bed Room: 200, Wash Room: 0 | | IP Telephony - Service Features | Is voice mail required (Yes/No)? And regarding calling requirements, do you need Only Internal calls or Internal and External calls both? | Yes, voice mail required, both Internal and External calling capabilities. | | SIP Trunk & ISP - General | Please provide the Location Coordinates. How many DID (direct numbers) and DID/DOD channels are required? | Coordinates: 25.276987, 55.296249; 50 DIDs, 30 Channels. | | SIP Trunk & ISP - Calling Options | Which of the following calling options are required? Local, National, Mobile, International, Toll Free, Any other (please specify)? | Local, Mobile, International | | Customer Care / Call Center - Capacity | For the Call Center, please specify: Number of Supervisors, Number of Seat Agents, Number of Concurrent Calls | Supervisors: 2, Seat Agents: 10, Concurrent Calls: 15 | | Customer Care / Call Center - Features | Regarding Call Center features, do you require Call Recordings and Storage? Please also list any other detailed features needed. | Yes, call recording required with storage for 6 months; need IVR and basic reporting features. | | Video Conferencing - Room Types & Quantities | Please specify the number of rooms required for each Video Conferencing type: Meeting Pods/Silent Room/Focus Room (1-2 Person), Huddle Room (1-3 Person/Chair), Small Room (3-6 Person/Chair), Executive Director personal office (1-3 Person/Chair), Medium meeting room (6-8 Person/Chair), Large meeting room (8-14 Person/Chair), Board Room (12-18 Person/Chair) | Meeting Pods: 2, Huddle Rooms: 4, Small Rooms: 2, Executive Director Office: 1, Medium Meeting Rooms: 1, Large Meeting Rooms: 1, Board Room: 1 |
+    async def generate():
+        response = await get_admission().call(
+            lambda: get_llm().ainvoke(messages, config={"callbacks": metrics.callbacks()}),
+            estimate_tokens(messages)
+        )
+        return response.content
+
+    return await get_response_cache().get_or_compute(boq_cache_key(messages), generate, has_rows)
+
+async def generate_boq(info_summary: str, mode: str = BOQ_MODE, answers: Optional[Dict[str, str]] = None):
     """
-    print(create_boq(info_summary=info_summary))
+    Generate the BOQ with the selected mode (see BOQ_MODES).
+    Engine modes use the conversation's structured answers (by question id) when
+    given, so the summary table does not have to be parsed back.
+    """
+    if mode == "llm":
+        return await create_boq(info_summary)
+    if mode == "engine":
+        return await build_boq(info_summary, answers=answers)
+    if mode == "hybrid":
+        try:
+            return await build_boq(info_summary, get_llm(), answers)
+        except Exception as e:
+            # The catalog table is still valid, just with [Not Specified] gaps
+            metrics.record_error("boq_fallback", e)
+            return await build_boq(info_summary, answers=answers)
+    raise ValueError(f"Unknown BOQ mode '{mode}' (expected one of {', '.join(BOQ_MODES)})")
 
+async def patch_boq(table: str, answers: Dict[str, str], question_id: str,
+                    mode: str = BOQ_MODE) -> Tuple[str, List[RowChange]]:
+    """
+    Update a generated BOQ after the answer to question_id changed (answers
+    holds the new one). Only the rows of the BOQ sections that read that
+    question are recomputed by the engine (boq_engine.BOQ_DEPENDENCIES); the
+    rest of the table is kept as generated. Outside engine mode, values the
+    patterns cannot read from the new answer are extracted in one small
+    structured call. Returns the new table and its changed rows.
+    """
+    index = QUESTION_IDS.index(question_id)
+    by_index = answers_by_index(answers)
+    patched = patch_table(table, by_index, index)
+    if mode != "engine" and patched.unresolved:
+        try:
+            patched = patch_table(table, by_index, index, await resolve_with_llm(get_llm(), patched, by_index))
+        except Exception as e:
+            # Rows the patterns could not read stay [Not Specified]
+            metrics.record_error("boq_fallback", e)
+    sections = BOQ_DEPENDENCIES.get(index, [])
+    updated = splice_rows(table, patched, sections)
+    return updated, row_changes(table, updated, sections)
 
+async def stream_boq(info_summary: str, mode: str = BOQ_MODE, answers: Optional[Dict[str, str]] = None):
+    """
+    Stream the BOQ table as it is generated.
+    Yields text chunks; the concatenation equals generate_boq's output.
+    Engine modes render in one piece, so the whole table is a single chunk.
+    """
+    if mode != "llm":
+        yield await generate_boq(info_summary, mode, answers)
+        return
+
+    slices = section_summaries(info_summary) if BOQ_SECTION_CALLS else None
+    chunks = stream_sections(slices) if slices else stream_completion(build_boq_messages(info_summary))
+    async for chunk in chunks:
+        yield chunk
+
+EXAMPLE_SUMMARY = """
+        | Section | Question | User Response | |----------------------------------------------|-----------------------------------------------|------------------------------------------------------| | IP Telephony - General Requirements | How many buildings require IP telephony services, and will the site have connectivity to the ABC Network (Yes/No)? | 3 buildings requiring services, Yes | | IP Telephony - Area Breakdown | Could you please specify the details for the different area types? Offices: How many admin/management offices are in each building? Accommodations: How many accommodation units are in each building? Other: Are there any other area types (e.g., Hotel, Hospital) and how many rooms in each building? | Offices: Building A has 10, Building B has 5, Building C has 5. Accommodations: Building A has 0, Buildings B and C have 50 each. Other: No other area types. | | IP Telephony - Office Hardware | For the Office Area, please specify the quantities required for each phone type- Executive Phone, Manager Phone, Employee Phone, Conference Phone, Any other types? | Executive Phone: 5, Manager Phone: 15, Employee Phone: 100, Conference Phone: 3, Other: None | | IP Telephony - Accommodation Hardware | For the Accommodation Area, please specify the quantities required for Living Room, Bed Room, Wash Room / Rest Room | Living Room: 100, Bed Room: 200, Wash Room: 0 | | IP Telephony - Service Features | Is voice mail required (Yes/No)? And regarding calling requirements, do you need Only Internal calls or Internal and External calls both? | Yes, voice mail required, both Internal and External calling capabilities. | | SIP Trunk & ISP - General | Please provide the Location Coordinates. How many DID (direct numbers) and DID/DOD channels are required? | Coordinates: 25.276987, 55.296249; 50 DIDs, 30 Channels. | | SIP Trunk & ISP - Calling Options | Which of the following calling options are required? Local, National, Mobile, International, Toll Free, Any other (please specify)? | Local, Mobile, International | | Customer Care / Call Center - Capacity | For the Call Center, please specify: Number of Supervisors, Number of Seat Agents, Number of Concurrent Calls | Supervisors: 2, Seat Agents: 10, Concurrent Calls: 15 | | Customer Care / Call Center - Features | Regarding Call Center features, do you require Call Recordings and Storage? Please also list any other detailed features needed. | Yes, call recording required with storage for 6 months; need IVR and basic reporting features. | | Video Conferencing - Room Types & Quantities | Please specify the number of rooms required for each Video Conferencing type: Meeting Pods/Silent Room/Focus Room (1-2 Person), Huddle Room (1-3 Person/Chair), Small Room (3-6 Person/Chair), Executive Director personal office (1-3 Person/Chair), Medium meeting room (6-8 Person/Chair), Large meeting room (8-14 Person/Chair), Board Room (12-18 Person/Chair) | Meeting Pods: 2, Huddle Rooms: 4, Small Rooms: 2, Executive Director Office: 1, Medium Meeting Rooms: 1, Large Meeting Rooms: 1, Board Room: 1 |
+"""
+
+def main(argv=None) -> int:
+    """CLI: the BOQ for EXAMPLE_SUMMARY, or `batch` for a whole portfolio (see boq_batch)"""
+    import argparse
+    import boq_batch
+
+    parser = argparse.ArgumentParser(description="Generate BOQs")
+    commands = parser.add_subparsers(dest="command")
+    example = commands.add_parser("example", help="BOQ for the built-in example summary (default)")
+    example.add_argument("--mode", default=BOQ_MODE, choices=BOQ_MODES)
+    boq_batch.add_arguments(commands.add_parser(
+        "batch", help="BOQs for a portfolio of completed summaries or answer sets"))
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        return asyncio.run(boq_batch.run_cli(args))
+    print(asyncio.run(generate_boq(info_summary=EXAMPLE_SUMMARY, mode=getattr(args, "mode", BOQ_MODE))))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
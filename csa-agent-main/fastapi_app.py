@@ -1,16 +1,51 @@
 #fastapi_app.py
+import time
+IMPORT_STARTED = time.perf_counter()  # cold-start timing, before the heavy imports
+import os
+import math
+import json
 import uuid
-from threading import RLock
-from typing import Dict, Any
+import logging
+import weakref
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, AIMessage
-from main import app as langgraph_app
-from create_boq import create_boq as generate_boq_content
+from main import build_graph, NextResponseStream, chunk_text
+from prompts import QUESTION_IDS, render_summary_table
+from answer_validator import check_answer
+from boq_engine import RowChange, markdown_table
+from create_boq import generate_boq as generate_boq_content, stream_boq, patch_boq, BOQ_MODES, BOQ_MODE
+from session_store import create_session_store, SESSION_STORE
+import llm_registry
+from llm_admission import get_admission, LLMUnavailable
+from response_cache import get_response_cache, close_response_cache, RESPONSE_CACHE
+from speculation import SpeculationCache, SPECULATIVE_TURNS, prefetch
+from boq_jobs import create_job_queue
+from boq_batch import iter_batch, normalize_item, format_row, csv_header, BATCH_MAX_ITEMS
+from compression import CompressionMiddleware
+import metrics
 
-app = FastAPI(title="CSA Backend API")
+logger = logging.getLogger(__name__)
+metrics.configure_logging(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    reaper = asyncio.create_task(reap_sessions_periodically())
+    await boq_jobs.start()
+    yield
+    reaper.cancel()
+    await boq_jobs.close()
+    await session_store.close()
+    await llm_registry.aclose()
+    await close_response_cache()
+
+app = FastAPI(title="CSA Backend API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -21,138 +56,344 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory session storage with timestamps
-sessions: Dict[str, Dict[str, Any]] = {}
-session_lock = RLock()
-SESSION_TIMEOUT = timedelta(hours=1)
+# gzip/brotli for large buffered responses (summary and BOQ tables); streams are left alone
+app.add_middleware(CompressionMiddleware)
+
+# Cold-start report: module import time, and latency of the first request
+# (which pays graph compilation, model creation and the first connection)
+startup_report: Dict[str, Any] = {"import_s": None, "first_request_s": None, "first_request_path": None}
+
+@app.middleware("http")
+async def record_first_request(request, call_next):
+    if startup_report["first_request_s"] is not None:
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    if startup_report["first_request_s"] is None:
+        startup_report["first_request_s"] = round(time.perf_counter() - start, 4)
+        startup_report["first_request_path"] = request.url.path
+        logger.info(f"[startup] import {startup_report['import_s']}s, first request "
+                    f"{request.url.path} {startup_report['first_request_s']}s")
+    return response
+
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable(request, error: LLMUnavailable):
+    """Model saturated (503), rate limited (429) or failed (502): nothing was recorded, the client can retry"""
+    headers = {"Retry-After": str(math.ceil(error.retry_after))} if error.retry_after else None
+    return JSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers=headers)
+
+# Session metadata store (SESSION_STORE=memory|sqlite); conversation state lives
+# in the graph's checkpointer, keyed by session_id
+session_store = create_session_store()
+SESSION_TIMEOUT = timedelta(hours=1)                                # idle time before a session expires
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))              # least recently active evicted beyond this
+REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "30"))     # seconds between reaper passes
+# Idempotency-Key records kept in the session record, so a retried turn is
+# recognized by any worker and whatever the response cache holds
+IDEMPOTENCY_KEYS = int(os.getenv("IDEMPOTENCY_KEYS", "20"))          # most recent keys kept per session
+
+langgraph_app = None
+graph_lock = asyncio.Lock()
+
+# One asyncio.Lock per active session: turns on the same session are serialized
+# within this worker, different sessions never wait on each other. Entries
+# vanish once unused. Across workers, the session version decides (see commit_turn).
+session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+# BOQ generated in the background once a conversation completes (BOQ_ON_COMPLETION),
+# job state and result kept in the session record under "boq"
+BOQ_ON_COMPLETION = os.getenv("BOQ_ON_COMPLETION", "1").lower() not in ("0", "false", "no", "off")
+BOQ_JOB_TIMEOUT = float(os.getenv("BOQ_JOB_TIMEOUT", "600"))   # seconds without progress before a job counts as lost
+BOQ_POLL_INTERVAL = 2                                           # Retry-After for pending results
+
+# Next turns prepared while users type (SPECULATIVE_TURNS=on, see /chat/{session_id}/typing)
+speculations = SpeculationCache()
 
 # Models
 class UserMessage(BaseModel):
     message: str
 
+class TypingUpdate(BaseModel):
+    draft: Optional[str] = None                   # message typed so far
+
+class TypingResponse(BaseModel):
+    session_id: str
+    prepared: bool = False                        # prompt built and model connection warmed
+    answered_ahead: bool = False                  # sending exactly the draft commits a reply already written
+
+class IntakeRequest(BaseModel):
+    document: Optional[str] = None                # pasted spec sheet, email or notes
+    answers: Dict[str, str] = {}                  # answers by question id (Q1..Qn)
+
 class ChatResponse(BaseModel):
     session_id: str
     agent_message: str
     status: str
     progress: int = 0
+    version: int = 0                              # session version after this turn
+
+class BoqStatus(BaseModel):
+    session_id: str
+    status: str                                   # "pending", "ready" or "failed"
+    mode: str
+    attempts: int = 0
+    error: Optional[str] = None
+    updated_at: str
+
+class BatchRequest(BaseModel):
+    items: list                                   # {"id", "info_summary" and/or "answers"} per project
+    mode: str = BOQ_MODE
+    format: str = "jsonl"                         # "jsonl" or "csv"
+
+class AnswerEdit(BaseModel):
+    answer: str
+
+class AnswerEditResponse(BaseModel):
+    session_id: str
+    question_id: str
+    answer: str
+    summary: str                                  # summary table with the new answer
+    boq_status: Optional[str] = None              # "ready" (patched in place), "pending" (queued) or None
+    changes: List[RowChange] = []                 # BOQ rows whose Qty/Value changed
+    version: int = 0
+
+class Table(BaseModel):
+    headers: List[str]
+    rows: List[List[str]]                         # cells as shown: bold markers removed, <br> kept
+
+class BoqResult(ChatResponse):
+    table: Optional[Table] = None                 # agent_message parsed (format=json)
 
 class SessionInfo(BaseModel):
     session_id: str
     status: str
-    history: list
+    history: list                                 # entries history_start.. of the stored history
     next_response: str
+    answers: Dict[str, str] = {}
     created_at: str
+    version: int = 0
+    history_start: int = 0
+    history_total: int = 0                        # entries stored; pass as since= to get only newer ones
+    summary_table: Optional[Table] = None         # next_response parsed, once done (format=json)
 
 # Helper Functions
-def cleanup_old_sessions():
-    """Remove sessions older than timeout"""
+async def get_graph():
+    """Compile the conversation graph on first use, against the store's checkpointer"""
+    global langgraph_app
+    if langgraph_app is None:
+        async with graph_lock:
+            if langgraph_app is None:
+                langgraph_app = build_graph(checkpointer=await session_store.open_checkpointer())
+    return langgraph_app
+
+def graph_config(session_id: str, checkpoint_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run config that binds a graph invocation to the session's checkpoint thread,
+    starting from checkpoint_id (the session's committed checkpoint) if given
+    """
+    configurable = {"thread_id": session_id}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"recursion_limit": 400, "configurable": configurable, "callbacks": metrics.callbacks()}
+
+def session_lock(session_id: str) -> asyncio.Lock:
+    """Per-session lock guarding a turn's read-invoke-save sequence"""
+    lock = session_locks.get(session_id)
+    if lock is None:
+        lock = session_locks[session_id] = asyncio.Lock()
+    return lock
+
+async def cleanup_old_sessions():
+    """Remove sessions idle longer than timeout, then LRU sessions beyond MAX_SESSIONS"""
     cutoff = datetime.now() - SESSION_TIMEOUT
-    with session_lock:
-        expired = [sid for sid, data in sessions.items() 
-                   if data.get("created_at", datetime.now()) < cutoff]
+    expired = await session_store.expire(cutoff, MAX_SESSIONS)
+    if expired:
+        graph = await get_graph()
         for sid in expired:
-            del sessions[sid]
+            await graph.checkpointer.adelete_thread(sid)
+    return expired
 
-def validate_session(session_id: str) -> Dict[str, Any]:
-    """Validate session exists and is not expired"""
-    cleanup_old_sessions()
-    
-    with session_lock:
-        if session_id not in sessions:
-            raise HTTPException(status_code=404, detail="Session not found or expired")
-        
-        return sessions[session_id]
+async def reap_sessions_periodically():
+    """Background reaper: keeps expiry off the request path"""
+    while True:
+        await asyncio.sleep(REAP_INTERVAL)
+        try:
+            await cleanup_old_sessions()
+        except Exception as e:
+            metrics.record_error("reaper", e)
 
-# API Endpoints
-@app.post("/start", response_model=ChatResponse)
-def start_conversation():
-    """Start a new conversation and get the first question"""
-    cleanup_old_sessions()
-    
-    session_id = str(uuid.uuid4())
-    
-    initial_state = {
-        "history": [],
-        "status": "not done",
-        "next_response": None,
-        "mode": "api",
-        "progress": 0
-    }
-    
-    result = langgraph_app.invoke(initial_state, {"recursion_limit": 400})
-    
-    # Add metadata
-    result["created_at"] = datetime.now()
-    result["updated_at"] = datetime.now()
-    with session_lock:
-        sessions[session_id] = result
-    
-    agent_message = str(result.get("next_response", "")).strip()
-    
-    return ChatResponse(
-        session_id=session_id,
-        agent_message=agent_message,
-        status=result.get("status", "not done"),
-        progress=result.get("progress", 0)
-    )
+async def session_record(session_id: str) -> Dict[str, Any]:
+    """Session metadata (version, BOQ job state) without the graph state; 404 if missing or expired"""
+    with metrics.stage("store_get"):
+        record = await session_store.get(session_id)
+    # Sessions idle past the timeout are gone even if the reaper has not run yet
+    if record is None or record["updated_at"] < datetime.now() - SESSION_TIMEOUT:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    metrics.set_trace(record.get("trace_id"))
+    return record
 
-@app.post("/chat/{session_id}", response_model=ChatResponse)
-def send_message(session_id: str, user_msg: UserMessage):
-    """Send user response and get next question"""
-    previous_state = validate_session(session_id)
-    
+async def validate_session(session_id: str, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Validate session exists and is not expired; returns its metadata merged with graph state"""
+    if record is None:
+        record = await session_record(session_id)
+    with metrics.stage("checkpoint_get"):
+        snapshot = await (await get_graph()).aget_state(graph_config(session_id, record.get("checkpoint_id")))
+    return {**record, **snapshot.values}
+
+def build_turn_state(previous_state: Dict[str, Any], message: str) -> Dict[str, Any]:
+    """
+    Graph input for the next turn of an existing session.
+    Only the new message is sent; the node answering it appends both to the
+    stored history, so a failed turn does not leave the message behind.
+    """
     if previous_state.get("status") == "done":
         raise HTTPException(
             status_code=400, 
             detail="Conversation already completed."
         )
     
-    # Build updated state
-    current_history = previous_state.get("history", [])
-    state_update = {
-        "history": current_history + [HumanMessage(content=user_msg.message)],
+    return {
+        "user_message": message,
         "mode": "api",
-        "status": "not done",
-        "progress": previous_state.get("progress", 0)
+        "status": "not done"
     }
-    
-    # Invoke graph
-    result = langgraph_app.invoke(state_update, {"recursion_limit": 400})
-    
-    # Update session with metadata
-    result["created_at"] = previous_state.get("created_at", datetime.now())
-    result["updated_at"] = datetime.now()
-    with session_lock:
-        sessions[session_id] = result
-    
-    agent_message = str(result.get("next_response", "")).strip()
-    
+
+def turn_config(session_id: str, previous_state: Dict[str, Any]) -> Dict[str, Any]:
+    """Graph config for a turn: continues from the checkpoint the session last committed"""
+    return graph_config(session_id, previous_state.get("checkpoint_id"))
+
+async def run_turn(graph, state_update: Dict[str, Any], config: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """Invoke the graph (one checkpoint write per turn); returns the final state and that checkpoint's id"""
+    result, checkpoint_id = None, None
+    with metrics.graph_turn():
+        async for mode, chunk in graph.astream(state_update, config, stream_mode=["values", "checkpoints"],
+                                               durability="exit"):
+            if mode == "values":
+                result = chunk
+            else:
+                checkpoint_id = chunk["config"]["configurable"]["checkpoint_id"]
+    return result, checkpoint_id
+
+def use_speculation(session_id: str, previous_state: Dict[str, Any], state_update: Dict[str, Any],
+                    message: str) -> Tuple[Optional[Tuple[Dict[str, Any], str]], Dict[str, Any]]:
+    """
+    What was prepared for this turn while the user typed: the reply and its
+    checkpoint if message was answered ahead, else None and the graph input
+    extended with the prebuilt prompt state
+    """
+    speculation = speculations.take(session_id, previous_state.get("checkpoint_id"), message)
+    if speculation is None:
+        return None, state_update
+    if speculation.answers(message):
+        metrics.SPECULATIONS.inc(1, "used")
+        metrics.TURNS.inc(1, "local")
+        return (speculation.result, speculation.checkpoint_id), state_update
+    return None, {**state_update, **speculation.prompt_updates}
+
+async def answer_turn(graph, session_id: str, previous_state: Dict[str, Any], state_update: Dict[str, Any],
+                      message: str) -> Tuple[Dict[str, Any], str]:
+    """Run the turn, or use the reply prepared for this message while the user typed"""
+    prepared, state_update = use_speculation(session_id, previous_state, state_update, message)
+    if prepared is not None:
+        return prepared
+    return await run_turn(graph, state_update, turn_config(session_id, previous_state))
+
+async def commit_turn(session_id: str, previous_state: Dict[str, Any], result: Dict[str, Any],
+                      checkpoint_id: str, endpoint: str = "chat", boq: Optional[Dict[str, Any]] = None,
+                      idempotency_key: Optional[str] = None, message: str = "") -> int:
+    """
+    Make the turn's checkpoint the session's committed one and update its
+    metadata, if no other turn (possibly on another worker) committed since
+    previous_state was read. Otherwise the turn is dropped with a 409; its
+    checkpoint stays behind unreferenced. Returns the new session version.
+    boq is BOQ state to keep in the record; a done session committed without
+    one gets a BOQ job (BOQ_ON_COMPLETION). With idempotency_key, the turn's
+    response is stored with it in the same commit (see replay_turn).
+    """
+    version = previous_state.get("version", 0)
+    record = {
+        "created_at": previous_state.get("created_at", datetime.now()),
+        "updated_at": datetime.now(),
+        "status": result.get("status", "not done"),
+        "progress": result.get("progress", 0),
+        "trace_id": previous_state.get("trace_id"),
+        "checkpoint_id": checkpoint_id,
+        "idempotency": remember_turn(previous_state, idempotency_key, message,
+                                     to_chat_response(session_id, result, version + 1))
+    }
+    # A completing turn commits its BOQ job as pending, then queues it
+    generate = BOQ_ON_COMPLETION and record["status"] == "done" and boq is None
+    if generate:
+        record["boq"] = boq_state("pending", BOQ_MODE)
+    elif boq is not None:
+        record["boq"] = boq
+    with metrics.stage("store_put"):
+        committed = await session_store.commit(session_id, record, version)
+    if not committed:
+        metrics.SESSION_CONFLICTS.inc(1, endpoint)
+        raise HTTPException(
+            status_code=409,
+            detail="The session was updated by another request. Reload it and send the message again."
+        )
+    if generate:
+        await queue_boq_job(session_id, BOQ_MODE)
+    return version + 1
+
+def replay_turn(previous_state: Dict[str, Any], idempotency_key: Optional[str], message: str) -> Optional[ChatResponse]:
+    """Stored response for a repeated Idempotency-Key, or None if this is a new turn"""
+    if not idempotency_key:
+        return None
+    stored = (previous_state.get("idempotency") or {}).get(idempotency_key)
+    if stored is None:
+        return None
+    if stored["message"] != message:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different message"
+        )
+    return ChatResponse(**stored["response"])
+
+def remember_turn(previous_state: Dict[str, Any], idempotency_key: Optional[str], message: str,
+                  response: ChatResponse) -> Dict[str, Dict[str, Any]]:
+    """
+    The session's Idempotency-Key records for the next commit: the stored
+    ones, plus this turn's response under its key, newest IDEMPOTENCY_KEYS kept
+    """
+    stored = dict(previous_state.get("idempotency") or {})
+    if idempotency_key:
+        stored.pop(idempotency_key, None)
+        stored[idempotency_key] = {"message": message, "response": response.model_dump()}
+    return dict(list(stored.items())[-IDEMPOTENCY_KEYS:])
+
+def to_chat_response(session_id: str, result: Dict[str, Any], version: int) -> ChatResponse:
     return ChatResponse(
         session_id=session_id,
-        agent_message=agent_message,
+        agent_message=str(result.get("next_response", "")).strip(),
         status=result.get("status", "not done"),
-        progress=result.get("progress", 0)
+        progress=result.get("progress", 0),
+        version=version
     )
 
-@app.post("/create_boq/{session_id}", response_model=ChatResponse)
-def create_boq(session_id: str):
-    """Create BOQ for the project based on the information received from the user"""
-    # This acts as a creation endpoint for the BOQ document.
-    
-    # Validate session
-    current_state = validate_session(session_id)
-    
-    # Retrieve status and summary
-    status = current_state.get("status", "not done")
-    
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def unavailable_event(error: LLMUnavailable) -> str:
+    """SSE error event for a turn the model could not take"""
+    return sse_event("error", {"detail": error.detail, "status": error.status_code,
+                               "retry_after": error.retry_after})
+
+def get_info_summary(current_state: Dict[str, Any]) -> str:
+    """Completed-conversation summary that the BOQ is generated from"""
     # Ideally we expect status to be done to generate final BOQ
-    if status != "done":
+    if current_state.get("status", "not done") != "done":
          raise HTTPException(
             status_code=400, 
             detail="Conversation not completed. Please finish the questions first."
         )
 
-    # The summary is stored in 'next_response' of the completed session
     # The summary is stored in 'next_response' of the completed session
     info_summary = str(current_state.get("next_response", "")).strip()
     
@@ -161,11 +402,357 @@ def create_boq(session_id: str):
             status_code=400, 
             detail="No information summary available. Please complete conversation first."
         )
+    return info_summary
+
+def boq_state(status: str, mode: str, **fields) -> Dict[str, Any]:
+    """BOQ job state as kept in the session record"""
+    return {"status": status, "mode": mode, "updated": time.time(), **fields}
 
-    # Generate BOQ
+def current_boq(session_id: str, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The session's BOQ job state, or None if none was requested. A job left
+    pending without progress for BOQ_JOB_TIMEOUT (its worker restarted) is
+    reported as failed, so it can be requested again.
+    """
+    boq = state.get("boq")
+    if (boq is not None and boq["status"] == "pending" and not boq_jobs.pending(session_id)
+            and time.time() - boq["updated"] > BOQ_JOB_TIMEOUT):
+        return {**boq, "status": "failed", "error": "The BOQ job was lost; request it again"}
+    return boq
+
+async def store_boq_state(session_id: str, boq: Dict[str, Any]) -> bool:
+    """
+    Save BOQ job state in the session record. A versioned commit like a turn's,
+    re-read and retried if another write got there first; False if the
+    session is gone.
+    """
+    for _ in range(3):
+        record = await session_store.get(session_id)
+        if record is None:
+            return False
+        version = record.pop("version", 0)
+        if await session_store.commit(session_id, {**record, "updated_at": datetime.now(), "boq": boq}, version):
+            return True
+    return False
+
+async def run_boq_job(session_id: str, payload: Dict[str, Any], attempt: int):
+    """Job handler: generate the session's BOQ and store it with the session"""
+    mode = payload["mode"]
     try:
-        boq_output = generate_boq_content(info_summary)
+        state = await validate_session(session_id)
+        info_summary = get_info_summary(state)
+    except HTTPException as e:
+        metrics.log(f"BOQ job for session {session_id} dropped: {e.detail}")
+        return
+    if attempt > 1:
+        await store_boq_state(session_id, boq_state("pending", mode, attempts=attempt - 1))
+    with metrics.stage(f"boq_{mode}"):
+        table = await generate_boq_content(info_summary, mode, state.get("answers"))
+    await store_boq_state(session_id, boq_state("ready", mode, attempts=attempt, result=table))
+
+async def fail_boq_job(session_id: str, payload: Dict[str, Any], error: Exception):
+    """Job failure handler: record why, so the frontend can fall back to generating it live"""
+    await store_boq_state(session_id, boq_state("failed", payload["mode"], attempts=boq_jobs.retries + 1,
+                                                error=f"Failed to generate BOQ: {error}"))
+
+boq_jobs = create_job_queue(run_boq_job, fail_boq_job)
+
+BOQ_JOB_BUSY = "A BOQ job for this session is still running; request it again once it has finished"
+
+async def queue_boq_job(session_id: str, mode: str) -> bool:
+    """
+    Queue the BOQ job whose pending state was just stored. If the queue
+    refuses it (a job for the session is still queued or running), the state
+    is marked failed instead of staying pending with no job behind it, and
+    False is returned.
+    """
+    if await boq_jobs.enqueue(session_id, {"mode": mode}):
+        return True
+    await store_boq_state(session_id, boq_state("failed", mode, error=BOQ_JOB_BUSY))
+    return False
+
+def stored_boq(session_id: str, state: Dict[str, Any], mode: str) -> Optional[str]:
+    """Table generated by the session's BOQ job in this mode, if it is ready"""
+    boq = current_boq(session_id, state)
+    return boq["result"] if boq is not None and boq["status"] == "ready" and boq["mode"] == mode else None
+
+def to_boq_status(session_id: str, boq: Dict[str, Any]) -> BoqStatus:
+    return BoqStatus(
+        session_id=session_id,
+        status=boq["status"],
+        mode=boq["mode"],
+        attempts=boq.get("attempts", 0),
+        error=boq.get("error"),
+        updated_at=datetime.fromtimestamp(boq["updated"]).isoformat()
+    )
+
+TABLE_FORMATS = ("markdown", "json")
+
+def validate_table_format(format: str) -> str:
+    if format not in TABLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{format}'. Use one of: {', '.join(TABLE_FORMATS)}")
+    return format
+
+def to_table(markdown: str) -> Table:
+    headers, rows = markdown_table(markdown)
+    return Table(headers=headers, rows=rows)
+
+def entity_tag(version: int, *variant) -> str:
+    """
+    Weak ETag of a session read. Every change to a session (turn, answer
+    edit, BOQ job update) commits a new version, so the version and the
+    representation asked for identify the body.
+    """
+    return 'W/"' + "-".join(str(part) for part in (version, *variant)) + '"'
+
+def not_modified(endpoint: str, etag: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """304 if the client's If-None-Match already names etag, else None"""
+    if not if_none_match:
+        return None
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" not in tags and etag.removeprefix("W/") not in tags:
+        return None
+    metrics.NOT_MODIFIED.inc(1, endpoint)
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def set_validators(response: Response, etag: str):
+    """Let the browser keep the body and revalidate it on every read"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+async def one_chunk(text: str):
+    yield text
+
+# API Endpoints
+@app.post("/start", response_model=ChatResponse)
+async def start_conversation():
+    """Start a new conversation and get the first question"""
+    session_id = str(uuid.uuid4())
+    
+    initial_state = {
+        "history": [],
+        "status": "not done",
+        "next_response": None,
+        "mode": "api",
+        "progress": 0
+    }
+    
+    trace_id = metrics.new_trace_id()
+    metrics.set_trace(trace_id)
+    metrics.log(f"session {session_id} started")
+
+    graph = await get_graph()
+    result, checkpoint_id = await run_turn(graph, initial_state, graph_config(session_id))
+    version = await commit_turn(session_id, {"trace_id": trace_id}, result, checkpoint_id)
+    
+    return to_chat_response(session_id, result, version)
+
+@app.post("/intake", response_model=ChatResponse)
+async def start_with_intake(intake: IntakeRequest):
+    """
+    Start a new conversation from a pasted document and/or a JSON answer set.
+    All answers are recorded at once (one LLM call for a document, none for
+    JSON answers); the reply asks only for what is missing or needs confirming.
+    """
+    unknown = sorted(set(intake.answers) - set(QUESTION_IDS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown question ids: {', '.join(unknown)}. Expected {QUESTION_IDS[0]}..{QUESTION_IDS[-1]}"
+        )
+    if not (intake.document or "").strip() and not intake.answers:
+        raise HTTPException(status_code=400, detail="Provide a document or answers.")
+
+    session_id = str(uuid.uuid4())
+    initial_state = {
+        "history": [],
+        "status": "not done",
+        "next_response": None,
+        "mode": "api",
+        "progress": 0,
+        "intake_request": intake.model_dump()
+    }
+
+    trace_id = metrics.new_trace_id()
+    metrics.set_trace(trace_id)
+    metrics.log(f"session {session_id} started from intake")
+
+    graph = await get_graph()
+    result, checkpoint_id = await run_turn(graph, initial_state, graph_config(session_id))
+    version = await commit_turn(session_id, {"trace_id": trace_id}, result, checkpoint_id)
+
+    return to_chat_response(session_id, result, version)
+
+@app.post("/chat/{session_id}", response_model=ChatResponse)
+async def send_message(session_id: str, user_msg: UserMessage,
+                       idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """
+    Send user response and get next question.
+    With an Idempotency-Key header, a repeated submission returns the stored
+    turn instead of appending the message again. Returns 409 if another turn
+    on the session (on another worker) was committed while this one ran.
+    """
+    async with session_lock(session_id):
+        previous_state = await validate_session(session_id)
+        replayed = replay_turn(previous_state, idempotency_key, user_msg.message)
+        if replayed is not None:
+            metrics.IDEMPOTENT_REPLAYS.inc(1, "chat")
+            return replayed
+        state_update = build_turn_state(previous_state, user_msg.message)
+        
+        graph = await get_graph()
+        result, checkpoint_id = await answer_turn(graph, session_id, previous_state, state_update, user_msg.message)
+        version = await commit_turn(session_id, previous_state, result, checkpoint_id,
+                                    idempotency_key=idempotency_key, message=user_msg.message)
+    
+    return to_chat_response(session_id, result, version)
+
+@app.post("/chat/{session_id}/stream")
+async def stream_message(session_id: str, user_msg: UserMessage,
+                         idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """
+    Send user response and stream the next question as Server-Sent Events.
+    Emits `token` events with next_response deltas, then a `done` event
+    carrying the same payload as /chat/{session_id}. A `reset` event means
+    the text streamed so far is discarded (a fast model answer escalated to
+    the default model) and the tokens that follow replace it. A repeated
+    Idempotency-Key replays the stored turn as one `token` and the `done` event.
+    """
+    # Fail fast with a proper status code before the stream starts
+    previous_state = await validate_session(session_id)
+    if replay_turn(previous_state, idempotency_key, user_msg.message) is None:
+        build_turn_state(previous_state, user_msg.message)
+    graph = await get_graph()
+
+    async def events():
+        async with session_lock(session_id):
+            # Re-read under the lock: another turn may have finished meanwhile
+            try:
+                previous_state = await validate_session(session_id)
+                replayed = replay_turn(previous_state, idempotency_key, user_msg.message)
+                if replayed is None:
+                    state_update = build_turn_state(previous_state, user_msg.message)
+            except HTTPException as e:
+                yield sse_event("error", {"detail": e.detail})
+                return
+            if replayed is not None:
+                metrics.IDEMPOTENT_REPLAYS.inc(1, "stream")
+                yield sse_event("token", {"text": replayed.agent_message})
+                yield sse_event("done", replayed.model_dump())
+                return
+
+            parser = NextResponseStream()
+            streamed = []
+            tier = None
+            result = checkpoint_id = None
+            prepared, state_update = use_speculation(session_id, previous_state, state_update, user_msg.message)
+            if prepared is not None:
+                result, checkpoint_id = prepared
+            else:
+                try:
+                    with metrics.graph_turn():
+                        # The LLM node runs inside a section subgraph, so its tokens come
+                        # with the subgraph's namespace; state and checkpoints are the parent's
+                        async for namespace, mode, chunk in graph.astream(
+                            state_update, turn_config(session_id, previous_state),
+                            stream_mode=["messages", "values", "checkpoints"], durability="exit", subgraphs=True
+                        ):
+                            if mode != "messages" and namespace:
+                                continue
+                            if mode == "values":
+                                result = chunk
+                                continue
+                            if mode == "checkpoints":
+                                checkpoint_id = chunk["config"]["configurable"]["checkpoint_id"]
+                                continue
+                            message_chunk, metadata = chunk
+                            if metadata.get("langgraph_node") != "llm":
+                                continue
+                            # Model tokens carry their tier; a switch means the fast answer was escalated
+                            if metadata.get("llm_tier", tier) != tier:
+                                tier = metadata["llm_tier"]
+                                if streamed:
+                                    parser, streamed = NextResponseStream(), []
+                                    yield sse_event("reset", {})
+                            delta = parser.feed(chunk_text(message_chunk))
+                            if delta:
+                                streamed.append(delta)
+                                yield sse_event("token", {"text": delta})
+                except LLMUnavailable as e:
+                    yield unavailable_event(e)
+                    return
+
+            # Text the model did not stream: the summary table rendered on done turns,
+            # a turn answered by the local validator, or a response served from the cache
+            final, sent = str(result.get("next_response") or ""), "".join(streamed)
+            if final != sent:
+                yield sse_event("token", {"text": final[len(sent):] if final.startswith(sent) else final})
+
+            try:
+                version = await commit_turn(session_id, previous_state, result, checkpoint_id, "stream",
+                                            idempotency_key=idempotency_key, message=user_msg.message)
+            except HTTPException as e:
+                yield sse_event("error", {"detail": e.detail, "status": e.status_code})
+                return
+        yield sse_event("done", to_chat_response(session_id, result, version).model_dump())
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/chat/{session_id}/typing", response_model=TypingResponse)
+async def typing(session_id: str, update: TypingUpdate):
+    """
+    Typing signal from the frontend, optionally with the draft so far. With
+    SPECULATIVE_TURNS=on the next turn is prepared meanwhile: prompt built,
+    model connection warmed, and a draft that passes local validation answered
+    ahead, so /chat with exactly that message only has to commit the reply.
+    Skipped while a turn on the session is running.
+    """
+    lock = session_lock(session_id)
+    if not SPECULATIVE_TURNS or lock.locked():
+        return TypingResponse(session_id=session_id)
+    async with lock:
+        state = await validate_session(session_id)
+        build_turn_state(state, update.draft or "")
+        config = turn_config(session_id, state)
+        speculation = await prefetch(await get_graph(), config, state, update.draft,
+                                     speculations.get(session_id, state.get("checkpoint_id")))
+        speculations.put(session_id, speculation)
+    await llm_registry.prewarm()
+    return TypingResponse(session_id=session_id, prepared=True,
+                          answered_ahead=speculation.answers(update.draft or ""))
+
+def validate_boq_mode(mode: str) -> str:
+    if mode not in BOQ_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown BOQ mode '{mode}'. Expected one of: {', '.join(BOQ_MODES)}"
+        )
+    return mode
+
+@app.post("/create_boq/{session_id}", response_model=ChatResponse)
+async def create_boq(session_id: str, mode: str = BOQ_MODE):
+    """
+    Create BOQ for the project based on the information received from the user.
+    mode: "engine" (price catalog, no LLM), "hybrid" (catalog + LLM for
+    unreadable free text) or "llm" (table written by the LLM).
+    """
+    # This acts as a creation endpoint for the BOQ document.
+    validate_boq_mode(mode)
+
+    # Validate session
+    current_state = await validate_session(session_id)
+    info_summary = get_info_summary(current_state)
+
+    # Generate BOQ, unless the background job already did
+    boq_output = stored_boq(session_id, current_state, mode)
+    try:
+        if boq_output is None:
+            with metrics.stage(f"boq_{mode}"):
+                boq_output = await generate_boq_content(info_summary, mode, current_state.get("answers"))
+    except LLMUnavailable:
+        raise
     except Exception as e:
+        metrics.record_error("boq", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to generate BOQ: {str(e)}"
@@ -174,43 +761,291 @@ def create_boq(session_id: str):
     return ChatResponse(
         session_id=session_id,
         agent_message=boq_output,
-        status=status,
-        progress=100
+        status="done",
+        progress=100,
+        version=current_state.get("version", 0)
+    )
+
+@app.post("/create_boq/{session_id}/stream")
+async def create_boq_stream(session_id: str, mode: str = BOQ_MODE):
+    """
+    Stream the BOQ table as Server-Sent Events: `token` events with text
+    chunks, then a `done` event with the full table (or an `error` event).
+    Engine modes, and a table the background job already generated, are sent
+    in a single `token` event.
+    """
+    validate_boq_mode(mode)
+    current_state = await validate_session(session_id)
+    info_summary = get_info_summary(current_state)
+    stored = stored_boq(session_id, current_state, mode)
+
+    async def events():
+        parts = []
+        try:
+            chunks = stream_boq(info_summary, mode, current_state.get("answers")) if stored is None else one_chunk(stored)
+            async for text in chunks:
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except LLMUnavailable as e:
+            yield unavailable_event(e)
+            return
+        except Exception as e:
+            metrics.record_error("boq", e)
+            yield sse_event("error", {"detail": f"Failed to generate BOQ: {str(e)}"})
+            return
+
+        yield sse_event("done", ChatResponse(
+            session_id=session_id,
+            agent_message="".join(parts),
+            status="done",
+            progress=100,
+            version=current_state.get("version", 0)
+        ).model_dump())
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/boq/{session_id}", response_model=BoqStatus, status_code=202)
+async def request_boq(session_id: str, mode: str = BOQ_MODE):
+    """
+    Queue BOQ generation for a completed session, e.g. after a failed job or
+    for another mode. A job that is still pending is left to finish; 503 if
+    the queue still holds an earlier job for the session.
+    """
+    validate_boq_mode(mode)
+    state = await validate_session(session_id)
+    get_info_summary(state)
+    boq = current_boq(session_id, state)
+    if boq is None or boq["status"] != "pending":
+        boq = boq_state("pending", mode)
+        if not await store_boq_state(session_id, boq):
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        if not await queue_boq_job(session_id, mode):
+            raise HTTPException(status_code=503, detail=BOQ_JOB_BUSY, headers={"Retry-After": str(BOQ_POLL_INTERVAL)})
+    return to_boq_status(session_id, boq)
+
+@app.get("/boq/{session_id}", response_model=BoqStatus)
+async def boq_status(session_id: str):
+    """Status of the session's background BOQ job: pending, ready or failed"""
+    boq = current_boq(session_id, await session_record(session_id))
+    if boq is None:
+        raise HTTPException(status_code=404, detail="No BOQ has been requested for this session")
+    return to_boq_status(session_id, boq)
+
+@app.get("/boq/{session_id}/result", response_model=BoqResult)
+async def boq_result(session_id: str, response: Response, format: str = "markdown",
+                     if_none_match: Optional[str] = Header(None, alias="If-None-Match")):
+    """
+    The table generated by the session's BOQ job. 202 with Retry-After while
+    it is pending, 500 if the job failed (the client can fall back to
+    /create_boq/{session_id}/stream), 404 if none was requested.
+    format=json adds the table parsed. A ready table is sent with an ETag,
+    and 304 if it has not changed since If-None-Match.
+    """
+    validate_table_format(format)
+    state = await session_record(session_id)
+    boq = current_boq(session_id, state)
+    if boq is None:
+        raise HTTPException(status_code=404, detail="No BOQ has been requested for this session")
+    if boq["status"] == "pending":
+        return JSONResponse(status_code=202, content={"detail": "The BOQ is still being generated", "status": "pending"},
+                            headers={"Retry-After": str(BOQ_POLL_INTERVAL)})
+    if boq["status"] == "failed":
+        raise HTTPException(status_code=500, detail=boq.get("error") or "Failed to generate BOQ")
+    etag = entity_tag(state.get("version", 0), "boq", format)
+    cached = not_modified("boq_result", etag, if_none_match)
+    if cached is not None:
+        return cached
+    set_validators(response, etag)
+    return BoqResult(
+        session_id=session_id,
+        agent_message=boq["result"],
+        status="done",
+        progress=100,
+        version=state.get("version", 0),
+        table=to_table(boq["result"]) if format == "json" else None
+    )
+
+BATCH_MEDIA_TYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+@app.post("/batch/boq")
+async def batch_boq(request: BatchRequest):
+    """
+    BOQs for a portfolio of projects without a conversation each: one row per
+    item (id, status, mode, attempts, elapsed_s, boq, error), streamed as JSON
+    lines or CSV in completion order as the items finish. For inputs larger
+    than BATCH_MAX_ITEMS, or to resume after a disconnect, use
+    `python create_boq.py batch`.
+    """
+    validate_boq_mode(request.mode)
+    if request.format not in BATCH_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{request.format}'. Use one of: jsonl, csv")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per request")
+    try:
+        items = [normalize_item(raw, str(n)) for n, raw in enumerate(request.items, 1)]
+    except (AttributeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e) if isinstance(e, ValueError) else "Items must be objects")
+    if len({item["id"] for item in items}) != len(items):
+        raise HTTPException(status_code=400, detail="Item ids must be unique")
+
+    async def rows():
+        if request.format == "csv":
+            yield csv_header()
+        async for row in iter_batch(items, request.mode):
+            yield format_row(row, request.format)
+
+    return StreamingResponse(rows(), media_type=BATCH_MEDIA_TYPES[request.format])
+
+@app.patch("/session/{session_id}/answers/{question_id}", response_model=AnswerEditResponse)
+async def edit_answer(session_id: str, question_id: str, edit: AnswerEdit):
+    """
+    Change one answer of a completed conversation. The summary is re-rendered
+    and a generated BOQ is patched in place: only the rows that read this
+    question are recomputed (see create_boq.patch_boq), and those that changed
+    are returned. Without a generated BOQ, a job is queued for the new answers
+    (BOQ_ON_COMPLETION). 409 while a BOQ job is still running.
+    """
+    if question_id not in QUESTION_IDS:
+        raise HTTPException(status_code=404, detail=f"Unknown question id: {question_id}. "
+                                                    f"Expected {QUESTION_IDS[0]}..{QUESTION_IDS[-1]}")
+    answer = edit.answer.strip()
+    if not answer:
+        raise HTTPException(status_code=400, detail="The answer must not be empty.")
+
+    async with session_lock(session_id):
+        state = await validate_session(session_id)
+        get_info_summary(state)
+        answers = {**(state.get("answers") or {}), question_id: answer}
+        # No LLM turn reviews the edit, so answers the validator would send back for confirmation are refused
+        check = check_answer(QUESTION_IDS.index(question_id), answer, answers)
+        if check.status in ("unclear", "implausible"):
+            raise HTTPException(status_code=422, detail=f"Please give an exact value: {check.note}.")
+        answer = answers[question_id] = check.recorded(answer)
+        boq = current_boq(session_id, state)
+        if boq is not None and boq["status"] == "pending":
+            return JSONResponse(status_code=409,
+                                content={"detail": "The BOQ is still being generated; edit the answer once it is ready"},
+                                headers={"Retry-After": str(BOQ_POLL_INTERVAL)})
+
+        changes = []
+        if boq is not None and boq["status"] == "ready":
+            with metrics.stage("boq_patch"):
+                table, changes = await patch_boq(boq["result"], answers, question_id, boq["mode"])
+            boq = boq_state("ready", boq["mode"], attempts=boq.get("attempts", 0), result=table)
+        else:
+            boq = None
+
+        # Same writes as a completing turn, recorded as a new checkpoint of the session
+        summary = render_summary_table(answers)
+        update = {"answers": {question_id: answer}, "next_response": summary, "history": [AIMessage(content=summary)],
+                  "status": "done", "progress": 100, "validated": True}
+        graph = await get_graph()
+        config = graph_config(session_id, state.get("checkpoint_id"))
+        config["configurable"]["checkpoint_ns"] = ""
+        written = await graph.aupdate_state(config, update, as_node="validate")
+        version = await commit_turn(session_id, state, update, written["configurable"]["checkpoint_id"], "edit", boq)
+
+    return AnswerEditResponse(
+        session_id=session_id,
+        question_id=question_id,
+        answer=answer,
+        summary=summary,
+        boq_status="ready" if boq is not None else "pending" if BOQ_ON_COMPLETION else None,
+        changes=changes,
+        version=version
     )
-    
 
 @app.get("/session/{session_id}", response_model=SessionInfo)
-def get_session_info(session_id: str):
-    """Get current session information - useful for debugging and recovery"""
-    state = validate_session(session_id)
-    
+async def get_session_info(session_id: str, response: Response, since: int = 0, limit: Optional[int] = None,
+                           format: str = "markdown",
+                           if_none_match: Optional[str] = Header(None, alias="If-None-Match")):
+    """
+    Get current session information - useful for debugging and recovery.
+    history holds up to limit entries (all by default, none with limit=0)
+    starting at since; a client that has the history up to an earlier
+    history_total passes it as since to get only the newer turns.
+    format=json adds the completed summary as a parsed table. Sent with an
+    ETag, and 304 if the session has not changed since If-None-Match.
+    """
+    if since < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="since and limit must not be negative")
+    validate_table_format(format)
+    record = await session_record(session_id)
+    etag = entity_tag(record.get("version", 0), "session", since, "all" if limit is None else limit, format)
+    cached = not_modified("session", etag, if_none_match)
+    if cached is not None:
+        return cached
+    state = await validate_session(session_id, record)
+
+    history = state.get("history", [])
+    page = history[since:] if limit is None else history[since:since + limit]
+    status = state.get("status", "not done")
+    next_response = state.get("next_response", "")
+    set_validators(response, etag)
     return SessionInfo(
         session_id=session_id,
-        status=state.get("status", "not done"),
-        history=[msg.content if hasattr(msg, 'content') else str(msg) 
-                 for msg in state.get("history", [])],
-        next_response=state.get("next_response", ""),
-        created_at=state.get("created_at", datetime.now()).isoformat()
+        status=status,
+        history=[msg.content if hasattr(msg, 'content') else str(msg) for msg in page],
+        next_response=next_response,
+        answers=state.get("answers") or {},
+        created_at=state.get("created_at", datetime.now()).isoformat(),
+        version=state.get("version", 0),
+        history_start=min(since, len(history)),
+        history_total=len(history),
+        summary_table=to_table(next_response) if format == "json" and status == "done" else None
     )
 
 @app.delete("/session/{session_id}")
-def delete_session(session_id: str):
+async def delete_session(session_id: str):
     """Manually delete a session"""
-    with session_lock:
-        if session_id not in sessions:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        del sessions[session_id]
+    speculations.discard(session_id)
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    graph = await get_graph()
+    await graph.checkpointer.adelete_thread(session_id)
     return {"message": "Session deleted successfully"}
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "active_sessions": len(sessions)
+        "active_sessions": await session_store.count(),
+        "cache": await get_response_cache().stats(),
+        "llm_admission": get_admission().stats(),
+        "startup": startup_report
     }
 
-if __name__ == "__main__":
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timings, LLM latency, token usage and error counts in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+startup_report["import_s"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+
+def serve(app_path: str = "fastapi_app:app", argv=None):
+    """
+    Run under uvicorn. With --workers N (or WEB_CONCURRENCY) uvicorn starts N
+    processes; every request reads and commits its session through the shared
+    store, so any worker can serve any session.
+    """
+    import argparse
     import uvicorn
-    uvicorn.run("fastapi_app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="CSA Backend API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--no-reload", action="store_true", help="disable auto-reload (single worker)")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and SESSION_STORE == "memory":
+        parser.error("--workers > 1 needs a store shared by the workers: set SESSION_STORE=sqlite")
+    if args.workers > 1 and RESPONSE_CACHE == "memory":
+        logger.warning("[startup] RESPONSE_CACHE=memory is per worker: cached responses are not shared "
+                       "(use RESPONSE_CACHE=disk)")
+    uvicorn.run(app_path, host=args.host, port=args.port, workers=args.workers,
+                reload=args.workers == 1 and not args.no_reload)
+
+if __name__ == "__main__":
+    serve()
\ No newline at end of file
@@ -0,0 +1,265 @@
+#llm_admission.py
+"""
+Admission control for outbound chat model calls.
+
+Every LLM request in the process goes through one controller:
+- a token bucket sized by estimated tokens per request, refilled at the
+  provider's tokens-per-minute quota;
+- a cap on requests in flight;
+- a bounded wait queue with a timeout.
+
+Provider 429s are retried with jittered exponential backoff that honors
+Retry-After, and the bucket is paused for everyone in the meantime. Timeouts,
+connection errors and 5xx responses get the same backoff, since the SDK's own
+retries are turned off (see llm_registry.create_model). When the
+queue is full, the wait times out or retries run out, callers get
+LLMUnavailable, which the API turns into a clean 429/503 instead of writing
+an error into the conversation (LLMFailed, 502, for any other failure of the turn).
+"""
+import os
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import httpx
+import metrics
+
+try:
+    from openai import APIConnectionError
+except ImportError:
+    APIConnectionError = httpx.TransportError
+
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))   # provider TPM quota, 0 = no bucket
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "64"))            # concurrent requests to the provider
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "256"))                 # callers allowed to wait for admission
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))          # seconds a caller may wait
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))                 # retries of a rate-limited call
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))           # seconds, doubled per attempt
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_OUTPUT_TOKENS = int(os.getenv("LLM_OUTPUT_TOKENS", "300"))           # completion allowance per request
+
+CHARS_PER_TOKEN = 4
+
+# Statuses worth retrying (as the OpenAI SDK does); only 429 means "over quota"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    """The model cannot take this request now; carries the HTTP status to return"""
+    status_code = 503
+
+    def __init__(self, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class LLMSaturated(LLMUnavailable):
+    """Admission queue full, or the wait for admission timed out"""
+    status_code = 503
+
+
+class LLMRateLimited(LLMUnavailable):
+    """Provider quota still exceeded after the allowed retries"""
+    status_code = 429
+
+
+class LLMFailed(LLMUnavailable):
+    """The model call failed or its answer could not be used (not retryable here)"""
+    status_code = 502
+
+
+def estimate_tokens(messages) -> int:
+    """Prompt tokens (character approximation) plus the completion allowance"""
+    if isinstance(messages, str):
+        chars = len(messages)
+    else:
+        chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // CHARS_PER_TOKEN + LLM_OUTPUT_TOKENS
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Seconds the provider asked us to wait if error is retryable (0 when it
+    gives no hint), None if it is not.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(error, (APIConnectionError, httpx.TransportError)):
+        return 0.0
+    if status not in RETRYABLE_STATUS:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form: fall back to our own backoff
+    return 0.0
+
+
+class TokenBucket:
+    """Tokens refill continuously up to capacity; waiters are served first come, first served"""
+
+    def __init__(self, tokens_per_minute: float):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = tokens_per_minute
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        """Hold all admissions (provider asked us to back off)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float, deadline: float):
+        """Take tokens, waiting for the refill; raises TimeoutError if that would pass deadline"""
+        tokens = min(tokens, self.capacity)  # one oversized request still gets through
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self.paused_until - now, (tokens - self.tokens) / self.rate if self.tokens < tokens else 0.0)
+                if wait <= 0:
+                    self.tokens -= tokens
+                    return
+                if now + wait > deadline:
+                    raise TimeoutError
+                await asyncio.sleep(wait)
+
+
+class AdmissionController:
+    """Shared gate in front of the chat model (see module docstring)"""
+
+    def __init__(self, tokens_per_minute: float = LLM_TOKENS_PER_MINUTE, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                 queue_size: int = LLM_QUEUE_SIZE, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.waiting = 0
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def admit(self, tokens: int):
+        """Hold an in-flight slot (and bucket tokens) for the duration of the block"""
+        if self.waiting >= self.queue_size:
+            metrics.LLM_ADMISSIONS.inc(1, "queue_full")
+            raise LLMSaturated("Too many requests waiting for the model, try again shortly",
+                               retry_after=self.queue_timeout / 2)
+        deadline = time.monotonic() + self.queue_timeout
+        self.waiting += 1
+        try:
+            with metrics.stage("llm_queue"):
+                if self.bucket is not None:
+                    # Bounded here too: callers queued behind the bucket lock have deadlines as well
+                    await asyncio.wait_for(self.bucket.acquire(tokens, deadline), deadline - time.monotonic())
+                await asyncio.wait_for(self.slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except (TimeoutError, asyncio.TimeoutError):
+            metrics.LLM_ADMISSIONS.inc(1, "timeout")
+            raise LLMSaturated("Timed out waiting for the model, try again shortly",
+                               retry_after=self.queue_timeout / 2) from None
+        finally:
+            self.waiting -= 1
+        metrics.LLM_ADMISSIONS.inc(1, "admitted")
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+
+    def _backoff(self, attempt: int, hint: float) -> float:
+        """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+        return max(hint, random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt)))
+
+    async def _retry(self, error: BaseException, attempt: int):
+        """
+        Back off before another attempt. Once retries are used up, a 429 becomes
+        LLMRateLimited and any other error is raised as it is.
+        """
+        hint = retry_after(error)
+        rate_limited = getattr(error, "status_code", None) == 429
+        # A wait longer than we would ever back off is passed on to the client instead
+        if attempt >= self.max_retries or hint > LLM_BACKOFF_MAX:
+            if not rate_limited:
+                raise error
+            metrics.LLM_ADMISSIONS.inc(1, "rate_limited")
+            raise LLMRateLimited("Model rate limit reached, try again shortly",
+                                 retry_after=hint or LLM_BACKOFF_BASE) from error
+        delay = self._backoff(attempt, hint)
+        if rate_limited and self.bucket is not None:
+            self.bucket.pause(delay)
+        metrics.LLM_ADMISSIONS.inc(1, "retried")
+        metrics.log(f"[llm] {type(error).__name__}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """Run fn() once admitted, retrying 429s and transient errors"""
+        attempt = 0
+        while True:
+            async with self.admit(tokens):
+                try:
+                    return await fn()
+                except Exception as e:
+                    if retry_after(e) is None:
+                        raise
+                    error = e
+            # Backoff happens outside the slot, so it is not held while sleeping
+            await self._retry(error, attempt)
+            attempt += 1
+
+    async def stream(self, make_stream: Callable[[], AsyncIterator[Any]], tokens: int) -> AsyncIterator[Any]:
+        """Iterate make_stream() once admitted; errors are retried only before the first chunk"""
+        attempt = 0
+        while True:
+            started = False
+            async with self.admit(tokens):
+                try:
+                    async for chunk in make_stream():
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started or retry_after(e) is None:
+                        raise
+                    error = e
+            await self._retry(error, attempt)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "bucket_tokens": round(self.bucket.tokens) if self.bucket is not None else None,
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission() -> AdmissionController:
+    """Process-wide controller, created on first use"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+def configure(**kwargs) -> AdmissionController:
+    """Replace the process-wide controller (benchmarks, tuning at startup)"""
+    global _controller
+    _controller = AdmissionController(**kwargs)
+    return _controller
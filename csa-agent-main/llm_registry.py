@@ -0,0 +1,155 @@
+#llm_registry.py
+"""
+Process-wide chat model registry.
+
+Models are created on first use and shared by the chat node and the BOQ
+generator, together with one keep-alive HTTP connection pool (HTTP/2 when the
+h2 package is installed). Nothing here touches credentials at import time.
+
+"default" is LLM_MODEL; "fast" (LLM_FAST_MODEL) is the small deployment the
+chat node routes routine turns to (see model_router).
+"""
+import os
+import time
+import threading
+from typing import Dict, Optional
+import httpx
+from langchain.chat_models import init_chat_model
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "azure_openai")
+LLM_API_VERSION = os.getenv("LLM_API_VERSION", "2025-01-01-preview")
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "")   # e.g. "gpt-4o-mini"; "" = no fast tier
+
+# Models created on first use, by registry name
+MODEL_NAMES = {"default": LLM_MODEL, "fast": LLM_FAST_MODEL}
+
+# Connection pool shared by every model in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+_lock = threading.RLock()
+_models: Dict[str, object] = {}
+_structured: Dict[tuple, object] = {}
+_pooled = set()  # names of models created here on the shared pool
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_warmed_at = float("-inf")
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=LLM_KEEPALIVE_EXPIRY)
+
+
+def http_clients():
+    """Shared (sync, async) HTTP clients, created on first call"""
+    global _http_client, _http_async_client
+    with _lock:
+        if _http_async_client is None:
+            _http_client = httpx.Client(http2=HTTP2, limits=_limits(), timeout=LLM_TIMEOUT)
+            _http_async_client = httpx.AsyncClient(http2=HTTP2, limits=_limits(), timeout=LLM_TIMEOUT)
+    return _http_client, _http_async_client
+
+
+def create_model(model: str = LLM_MODEL):
+    """New chat model bound to the shared connection pool"""
+    http_client, http_async_client = http_clients()
+    # max_retries=0: rate-limit retries are done by llm_admission, which also
+    # holds back other callers while the provider asks us to wait
+    return init_chat_model(model, model_provider=LLM_PROVIDER, api_version=LLM_API_VERSION,
+                           http_client=http_client, http_async_client=http_async_client, max_retries=0)
+
+
+def get_llm(name: str = "default"):
+    """
+    Shared chat model registered under name. Names in MODEL_NAMES are created
+    from their model on first use; other names must be registered first.
+    """
+    llm = _models.get(name)
+    if llm is None:
+        with _lock:
+            llm = _models.get(name)
+            if llm is None:
+                if not MODEL_NAMES.get(name):
+                    raise KeyError(f"No model registered as '{name}'")
+                llm = _models[name] = create_model(MODEL_NAMES[name])
+                _pooled.add(name)
+    return llm
+
+
+def available(name: str) -> bool:
+    """Whether get_llm(name) has a model to return"""
+    return name in _models or bool(MODEL_NAMES.get(name))
+
+
+def model_name(name: str = "default") -> str:
+    """Model behind a registry name, for cache keys (the name itself for registered models)"""
+    return MODEL_NAMES.get(name) or name
+
+
+def get_structured_llm(schema, name: str = "default"):
+    """get_llm(name).with_structured_output(schema), built once per (name, schema)"""
+    key = (name, schema)
+    runnable = _structured.get(key)
+    if runnable is None:
+        runnable = _structured[key] = get_llm(name).with_structured_output(schema)
+    return runnable
+
+
+async def prewarm():
+    """
+    Create the default model and open a keep-alive connection to its endpoint,
+    so the next call skips model setup and the TCP/TLS handshake. Does nothing
+    if a connection was opened within half the keep-alive expiry, or for a
+    registered (non-pooled) model. Failures are left for the real call to report.
+    """
+    global _warmed_at
+    if time.monotonic() - _warmed_at < LLM_KEEPALIVE_EXPIRY / 2:
+        return
+    _warmed_at = time.monotonic()
+    try:
+        llm = get_llm()
+        endpoint = getattr(llm, "azure_endpoint", None) or getattr(llm, "openai_api_base", None)
+        if "default" in _pooled and endpoint:
+            await http_clients()[1].head(endpoint)
+    except Exception:
+        pass
+
+
+def register(llm, name: str = "default"):
+    """Install a model under name (replaces the lazy default, e.g. with a stub)"""
+    with _lock:
+        _models[name] = llm
+        _pooled.discard(name)
+        for key in [k for k in _structured if k[0] == name]:
+            del _structured[key]
+
+
+async def aclose():
+    """
+    Close the shared connection pool (application shutdown). Models bound to it
+    are dropped and recreated on next use; registered models are kept.
+    """
+    global _http_client, _http_async_client
+    with _lock:
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+        for name in _pooled:
+            _models.pop(name, None)
+        for key in [k for k in _structured if k[0] in _pooled]:
+            del _structured[key]
+        _pooled.clear()
+    if http_async_client is not None:
+        await http_async_client.aclose()
+    if http_client is not None:
+        http_client.close()
@@ -1,21 +1,48 @@
 # main.py
 import os
-from typing import TypedDict, Optional, List, Annotated, Literal
+import re
+import json
+import asyncio
+from functools import lru_cache
+from typing import TypedDict, Optional, List, Dict, Annotated, Literal, get_args, get_origin, get_type_hints, Callable
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain.chat_models import init_chat_model
-from prompts import nda_llm_prompt
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from llm_registry import get_structured_llm, model_name
+from llm_admission import get_admission, estimate_tokens, LLMUnavailable, LLMFailed
+from response_cache import get_response_cache, cache_key
+from model_router import get_router
+import metrics
+from prompts import (NDA_SYSTEM_PROMPT, SECTION_SYSTEM_PROMPT, INTAKE_SYSTEM_PROMPT, QUESTIONS, QUESTION_IDS,
+                     QUESTION_SECTIONS, SECTIONS, nda_conversation_prompt, section_conversation_prompt,
+                     format_message, format_answered, format_recorded, render_summary_table)
+from answer_validator import (LOCAL_VALIDATION, next_question, asked, check_answer, review_answers,
+                              format_intake, intake_follow_up)
 from pydantic import BaseModel, Field
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the LLM
-llm = init_chat_model("gpt-4o", model_provider="azure_openai", api_version="2025-01-01-preview")
+# Prompt history: "section" sends only the active section's questions and transcript,
+# with earlier sections' answers as a digest; "full" sends every question and the
+# whole transcript every turn; "compact" is "full" with validated Q&A pairs older
+# than the window folded into an answered-so-far list
+PROMPT_HISTORY_MODE = os.getenv("PROMPT_HISTORY_MODE", "section")
+PROMPT_HISTORY_WINDOW = int(os.getenv("PROMPT_HISTORY_WINDOW", "4"))  # messages kept verbatim
 
 # Structured output model
+class QuestionAnswer(BaseModel):
+    """A validated answer to one of prompts.QUESTIONS"""
+    question_id: Literal[tuple(QUESTION_IDS)] = Field(
+        ...,
+        description="Id of the question being answered (Q1, Q2, ...)"
+    )
+    answer: str = Field(
+        ...,
+        description="Concise statement of the user's validated answer, keeping all numbers and details"
+    )
+
 class LLM_Response(BaseModel):
     """Structured response from the LLM"""
     status: Literal["done", "not done"] = Field(
@@ -24,15 +51,100 @@ class LLM_Response(BaseModel):
     )
     next_response: str = Field(
         ..., 
-        description="The next message to send to the user (question, clarification, or final response table)"
+        description="The next message to send to the user (question or clarification); empty when done"
+    )
+    answers: List[QuestionAnswer] = Field(
+        default_factory=list,
+        description="Answers validated or corrected on this turn only"
     )
     progress: int = Field(
         ..., 
         description="Progress percentage (0-100)"
     )
 
-# Bind structured output to LLM
-structured_llm = llm.with_structured_output(LLM_Response)
+class IntakeExtraction(BaseModel):
+    """Answers found in a document pasted for bulk intake"""
+    answers: List[QuestionAnswer] = Field(
+        default_factory=list,
+        description="One entry per question the document answers"
+    )
+
+@lru_cache(maxsize=None)
+def response_schema(schema) -> dict:
+    return schema.model_json_schema()
+
+async def invoke_structured_llm(messages, schema=LLM_Response, namespace: str = "chat", tier: str = "default",
+                                valid: Optional[Callable[[BaseModel], bool]] = None):
+    """
+    Structured chat call behind the response cache: a retried turn with the
+    same model, schema and prompt reuses the stored response. tier is the
+    llm_registry name of the model to call (see model_router). A response
+    valid() rejects is returned but not cached, so a retry asks the model again.
+    """
+    key = cache_key(namespace, model_name(tier), response_schema(schema), [m.content for m in messages])
+    config = {"metadata": {"llm_tier": tier}}
+
+    async def generate():
+        response = await get_admission().call(lambda: get_structured_llm(schema, tier).ainvoke(messages, config),
+                                              estimate_tokens(messages))
+        return response.model_dump_json()
+
+    with metrics.stage("llm_call"):
+        raw = await get_response_cache().get_or_compute(
+            key, generate, valid and (lambda raw: valid(schema.model_validate_json(raw))))
+    with metrics.stage("structured_parse"):
+        return schema.model_validate_json(raw)
+
+class NextResponseStream:
+    """
+    Incrementally extracts the next_response field from a streamed LLM_Response.
+    Feed it raw JSON chunks; it returns only the newly generated text.
+    Scans each character once, so long summary tables stream in linear time.
+    """
+    KEY = re.compile(r'"next_response"\s*:\s*"')
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None      # index of the first undecoded character of the value
+        self.closed = False
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        if self.closed:
+            return ""
+        if self.pos is None:
+            match = self.KEY.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        # Advance over complete characters / escape sequences only
+        i, end = self.pos, len(self.buffer)
+        while i < end:
+            ch = self.buffer[i]
+            if ch == '"':
+                self.closed = True
+                break
+            if ch == "\\":
+                size = 6 if self.buffer[i + 1:i + 2] == "u" else 2
+                if i + size > end:
+                    break
+                i += size
+            else:
+                i += 1
+
+        raw, self.pos = self.buffer[self.pos:i], i
+        return json.loads(f'"{raw}"') if raw else ""
+
+def chunk_text(chunk) -> str:
+    """Raw text of a streamed message chunk (JSON content or tool-call arguments)"""
+    if isinstance(chunk.content, str) and chunk.content:
+        return chunk.content
+    return "".join(tc.get("args") or "" for tc in getattr(chunk, "tool_call_chunks", []))
+
+def merge_answers(existing: Optional[Dict[str, str]], new: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Reducer for GraphState.answers: later answers to the same question replace earlier ones"""
+    return {**(existing or {}), **(new or {})}
 
 # Define the Graph State
 class GraphState(TypedDict, total=False):
@@ -41,62 +153,325 @@ class GraphState(TypedDict, total=False):
     next_response: Optional[str]             # Current response to user
     status: Optional[str]                    # "done" or "not done"
     progress: Optional[int]                  # Progress percentage
-    user_message: Optional[str]              # Temp holder for API mode
+    answers: Annotated[Dict[str, str], merge_answers]  # Validated answers by question id (Q1..Qn)
+    user_message: Optional[str]              # New user message, added to history by the node that answers it
     mode: Optional[str]                      # "cli" or "api"
+    transcript: Optional[str]                # Formatted history, extended each turn ("full" mode)
+    transcript_len: Optional[int]            # Number of history messages already in transcript
+    answered: Optional[str]                  # Answered-so-far lines ("compact" mode)
+    answered_len: Optional[int]              # Number of history messages folded into answered
+    validated: Optional[bool]                # Last user message was accepted by validate_node
+    intake_request: Optional[dict]           # Temp holder for bulk intake: {"document", "answers"}
+    intake: Optional[str]                    # Answers recorded from bulk intake, shown in the prompt
+    section: Optional[str]                   # Section the transcript belongs to ("section" mode)
+    section_start: Optional[int]             # Index of the history message that opened that section
+
+# GraphState without reducers, for the section subgraphs: a subgraph's output is
+# then only its own writes (the turn's messages and answers), which the parent
+# graph's reducers apply
+SectionState = TypedDict("SectionState", {
+    name: get_args(hint)[0] if get_origin(hint) is Annotated else hint
+    for name, hint in get_type_hints(GraphState, include_extras=True).items()
+}, total=False)
+
+def pending_messages(state: GraphState) -> List:
+    """
+    The turn's user message, not yet in history. Nodes add it together with
+    their reply, so a turn that fails (e.g. rate limited) leaves history as it was.
+    """
+    return [HumanMessage(content=state["user_message"])] if state.get("user_message") else []
+
+def active_section(answers: Dict[str, str]) -> str:
+    """Section of the first open question (the last section once all are answered)"""
+    index = next_question(answers)
+    return QUESTION_SECTIONS[-1 if index is None else index]
+
+def section_start(history: List, section: str) -> int:
+    """
+    Index of the agent message that opened the section: the first one asking
+    one of its questions since the last one asking another section's
+    (local turns may have moved through the section already), else the last
+    agent message
+    """
+    start = None
+    for i in range(len(history) - 1, -1, -1):
+        if history[i].type != "ai":
+            continue
+        if any(asked(index, history[i].content) for index in SECTIONS[section]):
+            start = i
+        elif start is not None or any(asked(index, history[i].content) for index in range(len(QUESTIONS))):
+            break
+    if start is None:
+        start = next((i for i in range(len(history) - 1, -1, -1) if history[i].type == "ai"), 0)
+    return start
+
+def build_section_prompt(state: GraphState, history: List, section: str):
+    """
+    Prompt text for one section: its transcript, starting at the agent message
+    that opened the section, the answers of earlier sections, and the question
+    that follows it. Returns (state_updates, prompt_text).
+    """
+    answers = state.get("answers") or {}
+    if state.get("section") == section:
+        start = state.get("section_start") or 0
+        transcript = state.get("transcript") or ""
+        done = max(state.get("transcript_len") or 0, start)
+    else:
+        start = section_start(state.get("history", []), section)
+        transcript, done = "", start
+    new_lines = [format_message(m) for m in history[done:]]
+    transcript = "\n".join(([transcript] if transcript else []) + new_lines)
+
+    indices = SECTIONS[section]
+    earlier = "\n".join(format_recorded(i, answers[qid]) for i, qid in enumerate(QUESTION_IDS)
+                        if i < indices[0] and qid in answers)
+    following = next((i for i in range(indices[-1] + 1, len(QUESTIONS)) if QUESTION_IDS[i] not in answers), None)
+    after = QUESTIONS[following] if following is not None else \
+        "No questions remain after this section: once it is answered, the questionnaire is complete."
+    own = tuple(f"- {QUESTION_IDS[i]} (" for i in indices)
+    intake = "\n".join(line for line in (state.get("intake") or "").splitlines() if line.startswith(own))
+    return {"section": section, "section_start": start, "transcript": transcript, "transcript_len": len(history)}, \
+        section_conversation_prompt(section, transcript, earlier, intake, after)
+
+def build_conversation_prompt(state: GraphState, pending: List = (), section: Optional[str] = None):
+    """
+    Per-turn prompt text plus the state updates that keep it incremental:
+    only messages added since the previous turn are formatted. section
+    defaults to the active one ("section" mode).
+    Returns (state_updates, prompt_text).
+    """
+    history = state.get("history", []) + list(pending)
+
+    if PROMPT_HISTORY_MODE == "section":
+        return build_section_prompt(state, history, section or active_section(state.get("answers") or {}))
+
+    if PROMPT_HISTORY_MODE == "compact":
+        lines = [state["answered"]] if state.get("answered") else []
+        done = state.get("answered_len") or 0
+        # Fold messages that have left the verbatim window; the agent has already
+        # moved past them, so those answers count as validated
+        boundary = len(history) - PROMPT_HISTORY_WINDOW
+        while done < boundary:
+            msg = history[done]
+            if msg.type == "human":
+                lines.append(f"- answered: {msg.content}")
+                done += 1
+            elif done + 1 < len(history) and history[done + 1].type == "human":
+                lines.append(format_answered(msg, history[done + 1]))
+                done += 2
+            else:
+                done += 1  # agent message superseded by another agent message
+        answered = "\n".join(lines)
+        transcript = "\n".join(format_message(m) for m in history[done:])
+        return {"answered": answered, "answered_len": done}, \
+            nda_conversation_prompt(transcript, answered, state.get("intake") or "")
+
+    transcript = state.get("transcript") or ""
+    new_lines = [format_message(m) for m in history[state.get("transcript_len") or 0:]]
+    transcript = "\n".join(([transcript] if transcript else []) + new_lines)
+    return {"transcript": transcript, "transcript_len": len(history)}, \
+        nda_conversation_prompt(transcript, intake=state.get("intake") or "")
+
+def progress_of(answers: Dict[str, str]) -> int:
+    return int(len(answers) * 100 / len(QUESTIONS))
+
+def next_step(answers: Dict[str, str], next_response: str) -> dict:
+    """
+    State updates for a turn answered without the chat model: next_response,
+    or the summary table once every question has an answer.
+    """
+    if next_question(answers) is None:
+        return {'status': 'done', 'next_response': render_summary_table(answers), 'progress': 100}
+    return {'status': 'not done', 'next_response': next_response, 'progress': progress_of(answers)}
+
+# Define Validate Node
+def local_turn(state: GraphState) -> Optional[GraphState]:
+    """
+    State updates answering the turn without the chat model: the user message
+    is a well-formed answer to the question just asked (numbers, yes/no,
+    selections). None if the turn needs the LLM node.
+    """
+    history = state.get("history", [])
+    answers = state.get("answers") or {}
+    index = next_question(answers)
+    reply = (state.get("user_message") or "").strip()
+    if (not LOCAL_VALIDATION or index is None or not reply or not history
+            or history[-1].type != "ai" or not asked(index, history[-1].content)):
+        return None
+
+    with metrics.stage("local_validate"):
+        check = check_answer(index, reply, answers)
+    if check.status != "accepted":
+        return None
+
+    new_answers = {QUESTION_IDS[index]: check.recorded(reply)}
+    answers = merge_answers(answers, new_answers)
+    following = next_question(answers)
+    updates = next_step(answers, QUESTIONS[following] if following is not None else "")
+    return {
+        **updates,
+        'history': pending_messages(state) + [AIMessage(content=updates['next_response'])],
+        'user_message': None,
+        'answers': new_answers,
+        'validated': True
+    }
+
+async def validate_node(state: GraphState) -> GraphState:
+    """
+    Validate node: records a well-formed answer to the question just asked
+    and asks the next question, without an LLM round trip (see local_turn).
+    Anything else is left to the LLM node.
+    """
+    updates = local_turn(state)
+    if updates is None:
+        return {'validated': False}
+    metrics.TURNS.inc(1, "local")
+
+    if state.get("mode") == "cli":
+        print(f"\nAgent: {updates['next_response']}\nAnd Progress is {updates['progress']}\n")
+
+    return updates
+
+# Define Intake Node
+async def intake_node(state: GraphState) -> GraphState:
+    """
+    Intake node: records a whole answer set at once, from JSON answers by
+    question id and/or a pasted document (one structured LLM call extracts its
+    answers). Unclear or implausible answers are held back for confirmation;
+    the reply asks the first question that is still open.
+    """
+    request = state.get("intake_request") or {}
+    given: Dict[str, str] = {}
+    if request.get("document"):
+        messages = [SystemMessage(content=INTAKE_SYSTEM_PROMPT), HumanMessage(content=request["document"])]
+        extraction = await invoke_structured_llm(messages, IntakeExtraction, "intake")
+        given = {a.question_id: a.answer for a in extraction.answers}
+    # Explicit answers win over ones read from the document
+    given.update(request.get("answers") or {})
+
+    with metrics.stage("intake_review"):
+        accepted, flagged = review_answers(given, state.get("answers") or {})
+        answers = merge_answers(state.get("answers"), accepted)
+    index = next_question(answers)
+    updates = next_step(answers, intake_follow_up(len(accepted), index, flagged) if index is not None else "")
+    metrics.TURNS.inc(1, "intake")
+
+    return {
+        **updates,
+        'history': [AIMessage(content=updates['next_response'])],
+        'answers': accepted,
+        'intake': format_intake(accepted, flagged),
+        'intake_request': None
+    }
+
+def response_problem(response: LLM_Response, answers: Dict[str, str], section: Optional[str] = None,
+                     strict: bool = True) -> Optional[str]:
+    """
+    Why an LLM_Response can't be used for the turn, or None: no message to
+    send, answers to questions past the active section, "done" with questions
+    still open, or progress out of range. Not strict (the default model's
+    answer, with no tier left to escalate to), the last two are let through:
+    llm_node asks the open question and recounts progress itself.
+    """
+    if response.status != "done" and not response.next_response.strip():
+        return "empty next_response"
+    if section is not None:
+        last = SECTIONS[section][-1]
+        ahead = [a.question_id for a in response.answers if QUESTION_IDS.index(a.question_id) > last]
+        if ahead:
+            return f"answers past section {section}: {', '.join(ahead)}"
+    if not strict:
+        return None
+    open_index = next_question(merge_answers(answers, {a.question_id: a.answer for a in response.answers}))
+    if response.status == "done" and open_index is not None:
+        return f"done with {QUESTION_IDS[open_index]} open"
+    if not 0 <= response.progress <= 100:
+        return f"progress {response.progress}"
+    return None
 
 # Define LLM Node
-def llm_node(state: GraphState) -> GraphState:
+async def llm_node(state: GraphState, section: Optional[str] = None) -> GraphState:
     """
-    LLM node: Processes conversation history and generates next response
+    LLM node: Processes conversation history and generates next response.
+    Async so the API can keep many LLM round trips in flight on one worker.
+    Each section subgraph runs it for its own section (default: the active one).
+    The model tier is picked per turn by model_router.
     """
-    messages_history = state.get("history", [])
-    
-    # Generate system prompt with current conversation context
-    system_prompt = nda_llm_prompt(messages_history)
-    messages_for_llm = [HumanMessage(content=system_prompt)]
+    # Static instructions first (cacheable prefix), then the conversation so far
+    scoped = PROMPT_HISTORY_MODE == "section"
+    answers = state.get("answers") or {}
+    section = section or active_section(answers)
+    pending = pending_messages(state)
+    with metrics.stage("prompt_build"):
+        prompt_updates, conversation = build_conversation_prompt(state, pending, section)
+    messages_for_llm = [SystemMessage(content=SECTION_SYSTEM_PROMPT if scoped else NDA_SYSTEM_PROMPT),
+                        HumanMessage(content=conversation)]
     
     try:
-        # Get structured response from LLM
-        response = structured_llm.invoke(messages_for_llm)
+        # Get structured response from LLM: the fast tier for routine turns,
+        # escalating to the default model if its response is unusable. Only
+        # responses the check accepts are cached, so a retry isn't served the rejected one
+        def check(response: LLM_Response, tier: str) -> Optional[str]:
+            return response_problem(response, answers, section if scoped else None, strict=tier == "fast")
+
+        router = get_router()
+        route = router.choose(state.get("user_message") or "", len(QUESTIONS) - len(answers))
+        response, _ = await router.call(
+            route, lambda tier: invoke_structured_llm(messages_for_llm, tier=tier,
+                                                      valid=lambda response: check(response, tier) is None),
+            check)
+        new_answers = {a.question_id: a.answer for a in response.answers}
+        next_response = response.next_response
+
+        # The final summary is rendered from the recorded answers plus this turn's,
+        # not generated by the model; "done" with a question still open is not accepted
+        answers = merge_answers(answers, new_answers)
+        status = response.status
+        open_index = next_question(answers)
+        if status == "done" and open_index is not None:
+            status = "not done"
+            next_response = next_response.strip() or QUESTIONS[open_index]
+        if status == "done":
+            next_response = render_summary_table(answers)
+        # A section prompt only shows the model its own questions, so count progress here
+        progress = response.progress if not scoped and status == response.status and 0 <= response.progress <= 100 \
+            else progress_of(answers)
+        metrics.TURNS.inc(1, "llm")
         
         # Create AI message for history
-        ai_message = AIMessage(content=response.next_response)
+        ai_message = AIMessage(content=next_response)
         
         # Print in CLI mode
         if state.get("mode") == "cli":
-            print(f"\nAgent: {response.next_response}\nAnd Progress is {response.progress}\n")
+            print(f"\nAgent: {next_response}\nAnd Progress is {progress}\n")
         
         return {
-            'history': [ai_message],
-            'status': response.status,
-            'next_response': response.next_response,
-            'progress': response.progress
+            **prompt_updates,
+            'history': pending + [ai_message],
+            'user_message': None,
+            'status': status,
+            'next_response': next_response,
+            'answers': new_answers,
+            'progress': progress
         }
     
+    except LLMUnavailable:
+        # Model saturated or rate limited: fail the turn (the API answers 429/503)
+        # rather than recording an error message in the conversation
+        raise
+
     except Exception as e:
-        error_message = f"Error processing request: {str(e)}"
-        print(f"\n[ERROR] {error_message}\n")
-        
-        return {
-            'history': [AIMessage(content=error_message)],
-            'status': 'not done',
-            'next_response': error_message,
-            'progress': 0
-        }
+        # Any other failure fails the turn the same way (502): nothing is recorded,
+        # so the conversation and its progress stay as they were and the client can resend
+        metrics.record_error("llm_node", e)
+        raise LLMFailed(f"The model could not answer this turn, try again ({type(e).__name__})") from e
 
 # Define Human Node (CLI mode)
 def human_node(state: GraphState) -> GraphState:
     """
-    Human node: Collects user input in CLI mode or uses pre-provided message
+    Human node: Collects user input in CLI mode. The answer is held in
+    user_message until the validate or LLM node records it in history.
     """
-    # Check if message was provided via API
-    user_message = state.get("user_message")
-    if user_message:
-        return {
-            'history': [HumanMessage(content=user_message)],
-            'user_message': None  # Clear after use
-        }
-    
     # CLI mode: prompt for user input
     try:
         user_answer = input("You: ").strip()
@@ -106,7 +481,7 @@ def human_node(state: GraphState) -> GraphState:
             user_answer = input("You: ").strip()
         
         print()  # Add spacing
-        return {'history': [HumanMessage(content=user_answer)]}
+        return {'user_message': user_answer}
     
     except (EOFError, KeyboardInterrupt):
         print("\n\n[INFO] Conversation aborted by user.")
@@ -116,7 +491,26 @@ def human_node(state: GraphState) -> GraphState:
         print(f"\n[ERROR] Input error: {str(e)}\n")
         return {'status': 'done'}
 
-# Routing function
+# Routing functions
+def route_start(state: GraphState) -> Literal["intake", "validate"]:
+    """Bulk intake requests go to the intake node, everything else through validation"""
+    return "intake" if state.get("intake_request") else "validate"
+
+def section_node(section: str) -> str:
+    """Graph node name of a section subgraph, e.g. "sip_trunk_isp" """
+    return re.sub(r"[^a-z0-9]+", "_", section.lower()).strip("_")
+
+SECTION_NODES = {section: section_node(section) for section in SECTIONS}
+
+def route_after_validate(state: GraphState) -> str:
+    """
+    The active section's subgraph answers the turn unless validate_node already
+    did; the section follows from the recorded answers, without an LLM call
+    """
+    if not state.get("validated"):
+        return SECTION_NODES[active_section(state.get("answers") or {})]
+    return route_after_llm(state)
+
 def route_after_llm(state: GraphState) -> Literal["end", "human"]:
     """
     Determines next step after LLM processes:
@@ -135,30 +529,82 @@ def route_after_llm(state: GraphState) -> Literal["end", "human"]:
     return "human"
 
 # Build the Graph
-def build_graph():
-    """Construct the conversation graph"""
+def build_section_graph(section: str):
+    """
+    Subgraph for one questionnaire section: an LLM node prompted with only
+    that section's questions and transcript. Compiled without a checkpointer;
+    the turn is checkpointed once by the parent graph.
+    """
+    async def section_llm_node(state: SectionState) -> SectionState:
+        return await llm_node(state, section)
+
+    graph = StateGraph(SectionState)
+    graph.add_node("llm", section_llm_node)
+    graph.add_edge(START, "llm")
+    graph.add_edge("llm", END)
+    return graph.compile(checkpointer=False, name=SECTION_NODES[section])
+
+def build_graph(checkpointer=None):
+    """
+    Construct the conversation graph: intake, local validation, then one
+    subgraph per questionnaire section for turns that need the LLM.
+    With a checkpointer, state is kept per thread_id and each invocation only
+    needs to pass the new message.
+    """
     graph = StateGraph(GraphState)
     
     # Add nodes
-    graph.add_node("llm", llm_node)
+    graph.add_node("intake", intake_node)
+    graph.add_node("validate", validate_node)
+    for section, node in SECTION_NODES.items():
+        graph.add_node(node, build_section_graph(section))
     graph.add_node("human", human_node)
     
     # Define edges
-    graph.add_edge(START, "llm")
     graph.add_conditional_edges(
-        "llm",
-        route_after_llm,
+        START,
+        route_start,
         {
+            "intake": "intake",
+            "validate": "validate"
+        }
+    )
+    graph.add_conditional_edges(
+        "validate",
+        route_after_validate,
+        {
+            **{node: node for node in SECTION_NODES.values()},
             "end": END,
             "human": "human"
         }
     )
-    graph.add_edge("human", "llm")
+    for node in ("intake", *SECTION_NODES.values()):
+        graph.add_conditional_edges(
+            node,
+            route_after_llm,
+            {
+                "end": END,
+                "human": "human"
+            }
+        )
+    graph.add_edge("human", "validate")
     
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+_app = None
+
+def get_app():
+    """Checkpointer-less graph for the CLI, compiled on first use"""
+    global _app
+    if _app is None:
+        _app = build_graph()
+    return _app
 
-# Compile the app
-app = build_graph()
+def __getattr__(name):
+    # `main.app` keeps working, but is no longer compiled at import time
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module 'main' has no attribute '{name}'")
 
 # CLI Interface
 def run_conversation():
@@ -181,8 +627,8 @@ def run_conversation():
     print("-" * 70)
     
     try:
-        # Run the graph with recursion limit
-        final_state = app.invoke(state, {"recursion_limit": 250})
+        # Run the graph with recursion limit (human node runs in a worker thread)
+        final_state = asyncio.run(get_app().ainvoke(state, {"recursion_limit": 250}))
         
         print("\n" + "=" * 70)
         print("  Conversation Completed Successfully")
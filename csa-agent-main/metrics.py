@@ -0,0 +1,292 @@
+#metrics.py
+"""
+Turn-pipeline instrumentation: per-stage timings, LLM latency, token usage and
+error counts, rendered in Prometheus text format for /metrics.
+
+With METRICS_ENABLED=0 every hook is a shared no-op (no clock reads, no locks).
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [trace %(trace_id)s] %(message)s"
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds: sub-millisecond prompt building up to long generations
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# USD per million (input, output) tokens, per model tier, for csa_llm_cost_usd_total
+LLM_PRICES = {
+    "default": (float(os.getenv("LLM_PRICE_INPUT", "2.5")), float(os.getenv("LLM_PRICE_OUTPUT", "10"))),
+    "fast": (float(os.getenv("LLM_FAST_PRICE_INPUT", "0.15")), float(os.getenv("LLM_FAST_PRICE_OUTPUT", "0.6"))),
+}
+
+_NULL = nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self.series: Dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, series in sorted(self.series.items()):
+                base = _labels(self.labels, label_values)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.series: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.series.items()):
+                lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+STAGE_SECONDS = Histogram("csa_stage_seconds", "Time spent per turn-pipeline stage", ("stage",))
+LLM_SECONDS = Histogram("csa_llm_request_seconds", "Chat model request latency", ("model",))
+LLM_TOKENS = Counter("csa_llm_tokens_total", "Tokens reported by the chat model", ("model", "kind"))
+ERRORS = Counter("csa_errors_total", "Errors by pipeline stage", ("stage",))
+TURNS = Counter("csa_turns_total", "Conversation turns by how they were answered (llm, local, intake)", ("path",))
+LLM_ADMISSIONS = Counter("csa_llm_admission_total",
+                         "LLM admission outcomes (admitted, queue_full, timeout, retried, rate_limited)", ("outcome",))
+SESSION_CONFLICTS = Counter("csa_session_conflicts_total",
+                            "Turns rejected with 409 because another turn on the session committed first",
+                            ("endpoint",))
+SPECULATIONS = Counter("csa_speculative_turns_total",
+                       "Turns answered ahead while the user typed, by outcome (prepared, used, discarded)",
+                       ("outcome",))
+BOQ_JOBS = Counter("csa_boq_jobs_total", "Background BOQ jobs by outcome (queued, retried, ready, failed)",
+                   ("outcome",))
+LLM_TIER_SECONDS = Histogram("csa_llm_tier_seconds", "Chat model request latency by model tier", ("tier",))
+LLM_COST = Counter("csa_llm_cost_usd_total", "Estimated chat model spend by model tier (see LLM_PRICES)", ("tier",))
+MODEL_ROUTES = Counter("csa_model_routes_total",
+                       "Chat turns by model tier and routing reason (escalated = fast tier answer rejected)",
+                       ("tier", "reason"))
+RESPONSE_BYTES = Counter("csa_response_bytes_total",
+                         "Compressed response bodies by encoding, before (raw) and after (sent) compression",
+                         ("encoding", "kind"))
+NOT_MODIFIED = Counter("csa_not_modified_total", "Session and BOQ reads answered 304 from the client's ETag",
+                       ("endpoint",))
+IDEMPOTENT_REPLAYS = Counter("csa_idempotent_replays_total",
+                             "Repeated Idempotency-Key turns answered from the session record", ("endpoint",))
+REGISTRY = [STAGE_SECONDS, LLM_SECONDS, LLM_TOKENS, ERRORS, TURNS, LLM_ADMISSIONS, SESSION_CONFLICTS, SPECULATIONS,
+            BOQ_JOBS, LLM_TIER_SECONDS, LLM_COST, MODEL_ROUTES, RESPONSE_BYTES, NOT_MODIFIED, IDEMPOTENT_REPLAYS]
+
+
+# ---------------------------------------------------------------------------
+# Trace IDs and per-turn stage accounting
+# ---------------------------------------------------------------------------
+
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+# Seconds per stage for the current turn; graph nodes run in copies of the
+# request context, so they add to the same dict
+turn_stages_var: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("turn_stages", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def set_trace(trace_id: Optional[str]):
+    """Bind a session's trace ID to the current request (used in log lines)"""
+    trace_id_var.set(trace_id)
+
+
+class TraceFilter(logging.Filter):
+    """Stamps each record with the current trace ID (record.trace_id, "-" outside a session)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get() or "-"
+        return True
+
+
+def log_handler(stream=None) -> logging.Handler:
+    """stderr (or stream) handler whose lines carry the trace ID, so one session's lines can be grepped together"""
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(TraceFilter())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def configure_logging(*names: str):
+    """
+    Log the application's loggers (names, plus this module's) at LOG_LEVEL.
+    Adds log_handler() to the root logger unless the host (uvicorn
+    --log-config, a test runner) has already set up its own.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(log_handler())
+    for name in (__name__, *names):
+        logging.getLogger(name).setLevel(LOG_LEVEL)
+
+
+def log(message: str):
+    """Info line from the turn pipeline; the handler adds the current trace ID"""
+    logger.info(message)
+
+
+def record_error(stage: str, error: BaseException):
+    ERRORS.inc(1, stage)
+    logger.error(f"{stage}: {error}")
+
+
+@contextmanager
+def _timed_stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        stages = turn_stages_var.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage (no-op when metrics are disabled)"""
+    return _timed_stage(name) if METRICS_ENABLED else _NULL
+
+
+@contextmanager
+def _timed_turn(graph_stage: str, inner_stages: Tuple[str, ...]):
+    stages: Dict[str, float] = {}
+    token = turn_stages_var.set(stages)
+    start = time.perf_counter()
+    try:
+        yield stages
+    finally:
+        total = time.perf_counter() - start
+        try:
+            turn_stages_var.reset(token)
+        except ValueError:
+            pass  # closed from another context (e.g. an abandoned SSE stream)
+        # Graph overhead: the whole invocation minus the time spent inside nodes
+        overhead = max(0.0, total - sum(stages.get(s, 0.0) for s in inner_stages))
+        STAGE_SECONDS.observe(overhead, graph_stage)
+        STAGE_SECONDS.observe(total, "turn")
+        log("turn " + " ".join(f"{k}={v * 1000:.1f}ms" for k, v in
+                               {**stages, graph_stage: overhead, "turn": total}.items()))
+
+
+NODE_STAGES = ("prompt_build", "llm_call", "structured_parse", "local_validate", "intake_review")
+
+
+def graph_turn():
+    """Times a graph invocation and records graph_overhead (total minus the node stages)"""
+    return _timed_turn("graph_overhead", NODE_STAGES) if METRICS_ENABLED else _NULL
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback: chat model latency, token usage, spend and model errors.
+    The tier comes from the run's "llm_tier" metadata (default when unset).
+    """
+    raise_error = False
+    run_inline = True
+
+    def __init__(self):
+        self.started: Dict[Any, Tuple[float, str, str]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        self.started[run_id] = (time.perf_counter(), model, metadata.get("llm_tier", "default"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start, model, tier = self.started.pop(run_id, (None, "unknown", "default"))
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            LLM_SECONDS.observe(elapsed, model)
+            LLM_TIER_SECONDS.observe(elapsed, tier)
+        usage = _usage(response)
+        if usage:
+            input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+            LLM_TOKENS.inc(input_tokens, model, "input")
+            LLM_TOKENS.inc(output_tokens, model, "output")
+            input_price, output_price = LLM_PRICES.get(tier, LLM_PRICES["default"])
+            LLM_COST.inc((input_tokens * input_price + output_tokens * output_price) / 1e6, tier)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.started.pop(run_id, None)
+        ERRORS.inc(1, "llm_call")
+
+
+def _usage(response) -> Optional[Dict[str, int]]:
+    """Token usage from an LLMResult: message usage_metadata, else llm_output token_usage"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return {"input_tokens": token_usage.get("prompt_tokens", 0),
+                "output_tokens": token_usage.get("completion_tokens", 0)}
+    return None
+
+
+_handler = MetricsCallbackHandler()
+
+
+def callbacks() -> List[BaseCallbackHandler]:
+    """Callbacks to put in a graph/run config (empty when disabled)"""
+    return [_handler] if METRICS_ENABLED else []
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
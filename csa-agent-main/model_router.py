@@ -0,0 +1,131 @@
+#model_router.py
+"""
+Model tier routing for the chat node.
+
+Most LLM turns are a short acknowledgement plus the next question, which the
+small "fast" model (llm_registry.LLM_FAST_MODEL) handles well. The router picks
+a tier per turn:
+- "summary": the turn can complete the questionnaire (at most one question
+  open), so it goes to the default model;
+- "complex": a long or number-heavy reply (room and user counts to split per
+  building) goes to the default model, unless its recent latency is over
+  MODEL_LATENCY_BUDGET;
+- anything else is "simple" and goes to the fast model.
+
+A fast answer that fails to parse or is rejected by the caller's check is
+escalated to the default model within the same turn. The default model's
+answer is checked too; if it is rejected as well, the turn fails with
+AnswerRejected rather than using it. Both tiers share the
+admission controller (one provider quota), and the calls are told apart in
+metrics by the "llm_tier" run metadata.
+"""
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import llm_registry
+import metrics
+from llm_admission import LLMUnavailable
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "auto")                      # auto (on when a fast model is set), on, off
+MODEL_FAST_MAX_CHARS = int(os.getenv("MODEL_FAST_MAX_CHARS", "160"))    # longer replies go to the default model
+MODEL_FAST_MAX_NUMBERS = int(os.getenv("MODEL_FAST_MAX_NUMBERS", "5"))  # replies with more numbers too
+MODEL_LATENCY_BUDGET = float(os.getenv("MODEL_LATENCY_BUDGET", "0"))    # seconds per default call, 0 = no budget
+MODEL_LATENCY_SMOOTHING = 0.2                                           # weight of the newest call in the average
+
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+TIERS = ("fast", "default")
+
+
+class AnswerRejected(Exception):
+    """The default model's answer failed the caller's check (nothing left to escalate to)"""
+
+
+class ModelRouter:
+    """Picks the model tier for a chat turn and escalates rejected fast answers"""
+
+    def __init__(self, routing: str = MODEL_ROUTING, max_chars: int = MODEL_FAST_MAX_CHARS,
+                 max_numbers: int = MODEL_FAST_MAX_NUMBERS, latency_budget: float = MODEL_LATENCY_BUDGET):
+        if routing not in ("auto", "on", "off"):
+            raise ValueError(f"Unknown MODEL_ROUTING '{routing}' (expected 'auto', 'on' or 'off')")
+        self.routing = routing
+        self.max_chars = max_chars
+        self.max_numbers = max_numbers
+        self.latency_budget = latency_budget
+        self.latency: Dict[str, Optional[float]] = {tier: None for tier in TIERS}  # moving average per tier
+
+    def enabled(self) -> bool:
+        if self.routing == "auto":
+            return llm_registry.available("fast")
+        return self.routing == "on"
+
+    def choose(self, reply: str, open_questions: int) -> Tuple[str, str]:
+        """(tier, reason) for a turn answering reply with open_questions still unanswered"""
+        if not self.enabled():
+            return "default", "routing_off"
+        if open_questions <= 1:
+            return "default", "summary"
+        if len(reply) > self.max_chars or len(NUMBER.findall(reply)) > self.max_numbers:
+            slow = self.latency["default"]
+            if self.latency_budget and slow is not None and slow > self.latency_budget:
+                return "fast", "latency_budget"
+            return "default", "complex"
+        return "fast", "simple"
+
+    def observe(self, tier: str, seconds: float):
+        average = self.latency[tier]
+        self.latency[tier] = seconds if average is None else \
+            average + MODEL_LATENCY_SMOOTHING * (seconds - average)
+
+    async def call(self, route: Tuple[str, str], attempt: Callable[[str], Awaitable[Any]],
+                   check: Callable[[Any, str], Optional[str]]) -> Tuple[Any, str]:
+        """
+        attempt(tier) on the routed tier; a fast answer that raises or that
+        check(result, tier) objects to (returns a reason) is retried on the
+        default tier. A default answer check() objects to raises AnswerRejected.
+        Returns (result, tier that produced it). LLMUnavailable is not escalated.
+        """
+        tier, reason = route
+        metrics.MODEL_ROUTES.inc(1, tier, reason)
+        if tier == "fast":
+            start = time.perf_counter()
+            try:
+                result = await attempt("fast")
+                problem = check(result, "fast")
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                problem = f"{type(e).__name__}: {e}"
+            self.observe("fast", time.perf_counter() - start)
+            if problem is None:
+                return result, "fast"
+            metrics.MODEL_ROUTES.inc(1, "default", "escalated")
+            metrics.log(f"[router] fast model answer rejected, escalating: {problem.splitlines()[0][:200]}")
+
+        start = time.perf_counter()
+        result = await attempt("default")
+        self.observe("default", time.perf_counter() - start)
+        problem = check(result, "default")
+        if problem is not None:
+            metrics.MODEL_ROUTES.inc(1, "default", "rejected")
+            raise AnswerRejected(problem)
+        return result, "default"
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_router() -> ModelRouter:
+    """Process-wide router, created on first use"""
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
+
+
+def configure(**kwargs) -> ModelRouter:
+    """Replace the process-wide router (benchmarks, tuning at startup)"""
+    global _router
+    _router = ModelRouter(**kwargs)
+    return _router
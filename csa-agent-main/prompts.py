@@ -1,4 +1,5 @@
 # prompts.py
+import re
 import json
 
 #FOR DEMO
@@ -30,30 +31,99 @@ QUESTIONS = [
     "**Video Conferencing - Room Types & Quantities** - Please specify the number of rooms required for each Video Conferencing type:\n Meeting Pods/Silent Room/Focus Room (1-2 Person)\n Huddle Room (1-3 Person/Chair)\n Small Room (3-6 Person/Chair)\n Executive Director personal office (1-3 Person/Chair)\n Medium meeting room (6-8 Person/Chair)\n Large meeting room (8-14 Person/Chair)\n Board Room (12-18 Person/Chair)",]
 
 
-def format_questions(questions):
-    return "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions))
+# Stable keys for per-question answers: Q1..Qn, matching the numbering in format_questions
+QUESTION_IDS = [f"Q{i+1}" for i in range(len(QUESTIONS))]
+
+
+def format_questions(questions, indices=None):
+    """Numbered question list; with indices, only those questions, keeping their numbers"""
+    indices = range(len(questions)) if indices is None else indices
+    return "\n".join(f"{i+1}. {questions[i]}" for i in indices)
+
+def format_message(msg) -> str:
+    """One transcript line for a LangChain message"""
+    role = 'User' if msg.type == 'human' else 'AI Assistant'
+    return f"{role}: {msg.content}"
 
 def format_answers(messages_history: list):
     # Convert messages to a simpler format for the prompt
-    formatted = []
-    for msg in messages_history:
-        if hasattr(msg, 'type'):
-            role = 'User' if msg.type == 'human' else 'AI Assistant'
-            formatted.append(f"{role}: {msg.content}")
+    formatted = [format_message(msg) for msg in messages_history if hasattr(msg, 'type')]
     return "\n".join(formatted) if formatted else "No conversation yet."
 
-def nda_llm_prompt(messages_history: list) -> str:
+def question_label(text: str) -> str:
+    """Short label for an agent question: its bold section heading, else its first line"""
+    match = re.search(r"\*\*(.+?)\*\*", text)
+    if match:
+        return match.group(1).strip()
+    first_line = text.strip().splitlines()[0] if text.strip() else ""
+    return first_line[:80]
+
+def question_text(text: str) -> str:
+    """Question without its bold heading, sub-items joined onto one line"""
+    body = re.sub(r"^\s*\*\*.+?\*\*\s*-?\s*", "", text)
+    return re.sub(r"\s*\n\s*-?\s*", " ", body).strip()
+
+def _table_cell(text: str) -> str:
+    return re.sub(r"\s*\n\s*", "; ", str(text).replace("|", "/")).strip()
+
+def render_summary_table(answers: dict) -> str:
+    """
+    Final summary table (Section, Question, User Response) from the per-question
+    answers map, in question order. Rendered locally instead of by the model.
+    """
+    rows = ["| Section | Question | User Response |", "| --- | --- | --- |"]
+    for question_id, question in zip(QUESTION_IDS, QUESTIONS):
+        answer = answers.get(question_id)
+        response = _table_cell(answer) if answer else "[Not provided]"
+        rows.append(f"| {question_label(question)} | {_table_cell(question_text(question))} | {response} |")
+    return "\n".join(rows)
+
+def format_answered(question_msg, answer_msg) -> str:
+    """Compact answered-so-far line for a question/answer pair"""
+    return f"- {question_label(question_msg.content)} — answered: {answer_msg.content}"
+
+def question_section(text: str) -> str:
+    """Questionnaire section of a question: its heading up to " - " (e.g. "SIP Trunk & ISP")"""
+    return question_label(text).split(" - ")[0].strip()
+
+def group_sections(sections: list) -> dict:
+    """{section: question indices}, sections in questionnaire order"""
+    grouped = {}
+    for index, section in enumerate(sections):
+        grouped.setdefault(section, []).append(index)
+    return grouped
+
+# Section of each question, and the sections in order with their question indices
+QUESTION_SECTIONS = [question_section(q) for q in QUESTIONS]
+SECTIONS = group_sections(QUESTION_SECTIONS)
+
+def format_recorded(index: int, answer: str) -> str:
+    """Prompt line for a recorded answer, e.g. "- Q8 (SIP Trunk & ISP - General): ..." """
+    return f"- {QUESTION_IDS[index]} ({question_label(QUESTIONS[index])}): {answer}"
+
+SECTION_SCOPE = """
+=== SECTION SCOPE ===
+The questionnaire is gathered one section at a time. The next message names the current section and lists its questions, numbered as in the full questionnaire.
+- Answers from earlier sections are listed under EARLIER SECTIONS (validated). Do not ask them again, but use them to check consistency.
+- The conversation shown is the current section's part only.
+- When every question of the section is answered, ask the question given under AFTER THIS SECTION. If it says the questionnaire is complete, follow the DONE STATE rules.
+"""
+
+def nda_system_prompt(scoped: bool = False) -> str:
+    """
+    Instructions for the whole questionnaire, or (scoped) the same rules for
+    one section at a time, whose questions come with the conversation
+    """
+    questions = "Listed in the next message, for the current section." if scoped else format_questions(QUESTIONS)
+    scope = SECTION_SCOPE if scoped else ""
     return f"""
 You are a smart AI assistant gathering data for infrastructure planning.
 
-Your goal is to systematically collect requirements by asking questions in order, validating responses, and producing a final summary table of questions and responses provided by the user. This final summary tabular response will be used to generate BOQ (Bill of Quantities) by other application.
+Your goal is to systematically collect requirements by asking questions in order, validating responses, and recording each validated response against its question. The recorded responses become the final summary table, which will be used to generate BOQ (Bill of Quantities) by other application.
 
 === QUESTIONS TO ASK (in order) ===
-{format_questions(QUESTIONS)}
-
-=== CONVERSATION SO FAR ===
-{format_answers(messages_history)}
-
+{questions}
+{scope}
 === QUESTION FORMATTING RULES ===
 - Include the section label (e.g., **IP Telephony - General Requirements**) when asking questions from the list above. **YOU MUST INCLUDE THE BOLD HEADING AT THE START OF THE QUESTION.**
 - Even if you rephrase the question, you MUST keep the heading exactly as is.
@@ -71,7 +141,7 @@ Before moving to the next question, ensure the current answer meets these criter
 - Treat these as unanswered: empty string "", whitespace only " ", or "not provided by user"
 - If answer is missing/unclear, stay on the same question
 - do not skip ahead to the next question until current one is sufficiently answered OR user explicitly says to proceed with incomplete info
-- if None/NA provided by user for quantities things, put it as 0 for final response summary.
+- if None/NA provided by user for quantities things, put it as 0 in the recorded answer.
 
 === PROGRESSION RULES ===
 - Ask questions one at a time in sequential order
@@ -79,14 +149,19 @@ Before moving to the next question, ensure the current answer meets these criter
 - Only move to next question after current answer or current sub part is validated
 - If user explicitly says to skip or accept rough estimates, note it and proceed
 - If user has given approval to move to next question then move to next question with reasonable assumptions for answer to this question and don't reask that question even if answer provided incomplete or details are not clear.
+- Questions listed under ANSWERS RECORDED FROM INTAKE were answered up front; do not ask them again. Continue with the first question that has no recorded answer, and confirm any answer marked NEEDS CONFIRMATION when you reach its question.
 - Please do not bother the user much, do not keep on asking questions repeatedly, after some time, if things look fine to have the final summary table or if user says to proceed for final summary table, then proceed to the creation of final summary table with reasonable assumptions and set status to "done" and progress to 100. We need to have good user-experience. Too many conversations are not required.
 
+=== RECORDING ANSWERS ===
+- Every time an answer is validated (or accepted as incomplete by the user), record it in the answers field with its question id (Q1, Q2, ... as numbered above).
+- Only include answers validated or corrected on this turn; answers recorded on earlier turns are kept automatically. To correct an earlier answer, record it again with the same id.
+- Write each answer as a concise, self-contained statement of what the user provided, keeping every number and per-building detail (e.g., "Executive Phone: 5, Manager Phone: 15, Other: 0").
+
 === DONE STATE ===
 When ALL questions have been answered (or explicitly accepted as incomplete by user):
 1. Set status to "done" and progress to 100.
-2. Generate a comprehensive final summary of questions and responses in clean Professional Markdown Tabular format. 
-3. We can have a table with 3 columns: Section, Question, and User Response.
-4. Output only the final summary table, without any running commentary or text.
+2. Make sure every answer has been recorded in the answers field (include the answer to the last question on this turn).
+3. Set next_response to an empty string. The final summary table is generated from the recorded answers by the application, do not write it.
 
 === OUTPUT FORMAT (for non-Done turns) ===
 - Output ONLY your next message to the user
@@ -95,8 +170,67 @@ When ALL questions have been answered (or explicitly accepted as incomplete by u
 - One question or one clarification at a time
 
 === STRUCTURED RESPONSE REQUIREMENT ===
-You MUST respond with exactly these three fields:
+You MUST respond with exactly these four fields:
 - status: "done" or "not done"
-- next_response: Your message (question, clarification, or final response table)
+- next_response: Your message (question or clarification), empty when status is "done"
+- answers: Answers validated on this turn, as a list of question_id and answer pairs (empty list if none)
 - progress: An integer between 0 and 100 representing the completion percentage (e.g. 20 for 20%). Calculate this based on the number of questions successfully answered divided by the total number of questions (8 questions total). When status is "done", progress MUST be 100.
+
+The conversation so far is provided in the next message.
+"""
+
+# Static instructions: rules plus the question list. Built once so every turn sends a
+# byte-identical system message that the provider can serve from its prompt cache.
+NDA_SYSTEM_PROMPT = nda_system_prompt()
+# Shared by every section, so a section change keeps the cached prefix
+SECTION_SYSTEM_PROMPT = nda_system_prompt(scoped=True)
+SECTION_QUESTIONS = {section: format_questions(QUESTIONS, indices) for section, indices in SECTIONS.items()}
+
+def nda_conversation_prompt(transcript: str, answered: str = "", intake: str = "") -> str:
+    """
+    Per-turn part of the prompt. The transcript only ever grows at the end, so
+    consecutive turns share a prefix too.
+    """
+    parts = []
+    if intake:
+        parts.append(f"=== ANSWERS RECORDED FROM INTAKE ===\n{intake}\n")
+    if answered:
+        parts.append(f"=== ANSWERED SO FAR (validated) ===\n{answered}\n")
+    parts.append(f"=== CONVERSATION SO FAR ===\n{transcript or 'No conversation yet.'}")
+    return "\n".join(parts)
+
+def section_conversation_prompt(section: str, transcript: str, earlier: str = "", intake: str = "",
+                                after: str = "") -> str:
+    """
+    Per-turn part of a section prompt: the section's questions, answers from
+    elsewhere, what follows the section, then the section's transcript
+    """
+    parts = [f"=== CURRENT SECTION: {section} ===\n",
+             f"=== QUESTIONS TO ASK (in order) ===\n{SECTION_QUESTIONS[section]}\n"]
+    if earlier:
+        parts.append(f"=== EARLIER SECTIONS (validated) ===\n{earlier}\n")
+    if intake:
+        parts.append(f"=== ANSWERS RECORDED FROM INTAKE ===\n{intake}\n")
+    parts.append(f"=== AFTER THIS SECTION ===\n{after}\n")
+    parts.append(f"=== CONVERSATION SO FAR ===\n{transcript or 'No conversation yet.'}")
+    return "\n".join(parts)
+
+def nda_llm_prompt(messages_history: list) -> str:
+    """Full prompt as a single string, rebuilt from the whole history"""
+    return NDA_SYSTEM_PROMPT + "\n" + nda_conversation_prompt(format_answers(messages_history))
+
+# Bulk intake: one structured call that pulls every answer out of a pasted document
+INTAKE_SYSTEM_PROMPT = f"""
+You are extracting infrastructure planning requirements from a document the user provided (a spec sheet, an email or notes).
+
+=== QUESTIONS ===
+{format_questions(QUESTIONS)}
+
+=== INSTRUCTIONS ===
+- For every question the document answers, record the answer with its question id (Q1, Q2, ... as numbered above).
+- Write each answer as a concise, self-contained statement of what the document says, keeping every number and per-building detail (e.g., "Executive Phone: 5, Manager Phone: 15, Other: 0").
+- Leave out questions the document does not answer. Do not guess or fill in defaults.
+- If the document states None/NA for quantities, record 0.
+
+The document is provided in the next message.
 """
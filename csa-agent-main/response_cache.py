@@ -0,0 +1,243 @@
+#response_cache.py
+"""
+Content-addressed cache for LLM responses.
+
+Keys are a SHA-256 of the namespace, model and prompt/input, so identical
+requests (a refreshed BOQ page, a repeated chat prompt) reuse the stored result
+instead of running a new generation. Entries expire after a TTL and the least
+recently used ones are evicted beyond a size limit.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+from threading import RLock
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Backend selection: "memory", "disk" (SQLite file, shared across workers) or "off"
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "memory")
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))            # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+
+def cache_key(namespace: str, *parts: Any) -> str:
+    """Content address of a request: hash of the namespace and every input that affects the output"""
+    payload = json.dumps([namespace, *parts], sort_keys=True, default=str, ensure_ascii=False)
+    return f"{namespace}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+class ResponseCache(ABC):
+    """
+    String values by key, with TTL and LRU eviction.
+    Keeps hit/miss counters per namespace (the key prefix).
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+    @abstractmethod
+    async def _get(self, key: str) -> Optional[str]:
+        """Stored value, or None if missing or expired"""
+
+    @abstractmethod
+    async def _put(self, key: str, value: str):
+        """Store a value, evicting expired and least recently used entries"""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of stored entries"""
+
+    async def close(self):
+        """Release connections (called on application shutdown)"""
+
+    def _count(self, key: str, outcome: str):
+        namespace = key.split(":", 1)[0]
+        counter = self.counters.setdefault(namespace, {"hits": 0, "misses": 0})
+        counter[outcome] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._get(key)
+        self._count(key, "hits" if value is not None else "misses")
+        return value
+
+    async def put(self, key: str, value: str):
+        await self._put(key, value)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]],
+                             valid: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Cached value for key, else the result of compute(). Concurrent callers
+        with the same key share one computation. The result is stored only if
+        it succeeds and valid(value) accepts it, so an answer the caller would
+        reject is never served again; a stored value valid() rejects counts as
+        a miss.
+        """
+        value = await self.get(key)
+        if value is not None and (valid is None or valid(value)):
+            return value
+        pending = self.inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            value = await compute()
+            if valid is None or valid(value):
+                await self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters get the error; don't warn when there are none
+            raise
+        finally:
+            del self.inflight[key]
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "entries": await self.count(), "namespaces": self.counters}
+
+
+class MemoryResponseCache(ResponseCache):
+    """Process-local cache; entries kept in access order, so the front is the LRU end"""
+    backend = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+
+    async def _get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    async def _put(self, key: str, value: str):
+        self.entries[key] = (time.time() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def count(self) -> int:
+        return len(self.entries)
+
+
+class DiskResponseCache(ResponseCache):
+    """
+    SQLite-backed cache that survives restarts and is shared by workers on one
+    host. sqlite3 calls run on a worker thread, as in SQLiteSessionStore.
+    """
+    backend = "disk"
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed_at ON response_cache (accessed_at)")
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def _put(self, key: str, value: str):
+        await asyncio.to_thread(self._put_sync, key, value)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count_sync)
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "UPDATE response_cache SET accessed_at = ? WHERE key = ? AND expires_at >= ? RETURNING value",
+                (now, key, now)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _put_sync(self, key: str, value: str):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            self.conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            self.conn.execute(
+                """DELETE FROM response_cache WHERE key IN (
+                       SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entries,)
+            )
+
+    def _count_sync(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    async def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class NoResponseCache(ResponseCache):
+    """Caching disabled: every lookup is a miss"""
+    backend = "off"
+
+    async def _get(self, key: str) -> Optional[str]:
+        return None
+
+    async def _put(self, key: str, value: str):
+        pass
+
+    async def count(self) -> int:
+        return 0
+
+
+def create_response_cache(kind: str = RESPONSE_CACHE, path: str = RESPONSE_CACHE_PATH) -> ResponseCache:
+    """Build the cache selected by RESPONSE_CACHE"""
+    if kind == "memory":
+        return MemoryResponseCache()
+    if kind == "disk":
+        return DiskResponseCache(path)
+    if kind == "off":
+        return NoResponseCache()
+    raise ValueError(f"Unknown RESPONSE_CACHE '{kind}' (expected 'memory', 'disk' or 'off')")
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache, created on first use"""
+    global _cache
+    if _cache is None:
+        _cache = create_response_cache()
+    return _cache
+
+
+async def close_response_cache():
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -0,0 +1,281 @@
+#session_store.py
+import os
+import json
+import asyncio
+import sqlite3
+from threading import RLock
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from langgraph.checkpoint.memory import InMemorySaver
+from compact_sessions import CompactSaver
+
+# Backend selection: "memory" (single process) or "sqlite" (shared across workers)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+# Checkpoints kept by the memory backend: "compact" (latest only, packed turns) or "full" (every checkpoint)
+SESSION_STATE = os.getenv("SESSION_STATE", "compact")
+
+
+class SessionStore(ABC):
+    """
+    Session metadata storage (created_at, updated_at, status, progress).
+    The conversation itself lives in the LangGraph checkpointer returned by
+    open_checkpointer(), keyed by the same session_id (thread_id); the record's
+    checkpoint_id names the checkpoint its last committed turn produced.
+
+    Records carry a version bumped by every commit(), so turns on the same
+    session from different workers are serialized optimistically: the one
+    that commits second sees a newer version and is rejected.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session record, or None if it does not exist"""
+
+    @abstractmethod
+    async def put(self, session_id: str, record: Dict[str, Any]):
+        """Create or replace a session record"""
+
+    @abstractmethod
+    async def commit(self, session_id: str, record: Dict[str, Any], expected_version: int) -> bool:
+        """
+        Store record as version expected_version + 1 if the stored version is
+        still expected_version (0 for a new session). Returns False, storing
+        nothing, if another commit got there first.
+        """
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Remove a session; returns False if it did not exist"""
+
+    @abstractmethod
+    async def expire(self, cutoff: datetime, max_sessions: int) -> List[str]:
+        """
+        Remove sessions idle since before cutoff (by updated_at), then the least
+        recently updated ones beyond max_sessions. Returns the removed ids.
+        Cost is proportional to the number removed, not the number stored.
+        """
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of stored sessions"""
+
+    @abstractmethod
+    async def open_checkpointer(self):
+        """Checkpointer for the graph, backed by the same storage"""
+
+    async def close(self):
+        """Release connections (called on application shutdown)"""
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store; sessions are lost on restart.
+    Records are kept in update order, so the idle end of the OrderedDict is
+    the expiry/LRU index. All methods run on the event loop thread without
+    awaiting, so no lock is needed.
+    """
+
+    def __init__(self):
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.checkpointer = None
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        record = self.sessions.get(session_id)
+        return dict(record) if record is not None else None
+
+    async def put(self, session_id: str, record: Dict[str, Any]):
+        self.sessions[session_id] = dict(record)
+        self.sessions.move_to_end(session_id)
+
+    async def commit(self, session_id: str, record: Dict[str, Any], expected_version: int) -> bool:
+        current = self.sessions.get(session_id)
+        if (current.get("version", 0) if current is not None else 0) != expected_version:
+            return False
+        self.sessions[session_id] = {**record, "version": expected_version + 1}
+        self.sessions.move_to_end(session_id)
+        if isinstance(self.checkpointer, CompactSaver):
+            # Turns are serialized in this process, so the committed checkpoint is the
+            # latest one and its parent is no longer needed
+            self.checkpointer.prune([session_id])
+        return True
+
+    async def delete(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    async def expire(self, cutoff: datetime, max_sessions: int) -> List[str]:
+        expired = []
+        while self.sessions:
+            sid, data = next(iter(self.sessions.items()))
+            if data["updated_at"] >= cutoff and len(self.sessions) <= max_sessions:
+                break
+            del self.sessions[sid]
+            expired.append(sid)
+        return expired
+
+    async def count(self) -> int:
+        return len(self.sessions)
+
+    async def open_checkpointer(self):
+        self.checkpointer = CompactSaver() if SESSION_STATE == "compact" else InMemorySaver()
+        return self.checkpointer
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite store in WAL mode. Several uvicorn workers can point at the same
+    file; readers never block the writer and writers wait on busy_timeout.
+
+    Every checkpoint AsyncSqliteSaver writes holds the whole history, so a
+    commit deletes the thread's checkpoints older than the one it commits:
+    earlier turns, turns rejected with 409 and abandoned speculative turns.
+    A session keeps its committed checkpoint plus any written since (turns
+    in flight, answers prepared while the user types).
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        self.path = path
+        self.lock = RLock()
+        self.checkpointer_conn = None
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL DEFAULT '{}',
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:  # database created before versioned commits
+            self.conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    # sqlite3 calls run on a worker thread: a blocked writer must never stall the
+    # event loop, since the checkpointer's connection needs the loop to commit
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def put(self, session_id: str, record: Dict[str, Any]):
+        await asyncio.to_thread(self._put, session_id, record)
+
+    async def commit(self, session_id: str, record: Dict[str, Any], expected_version: int) -> bool:
+        return await asyncio.to_thread(self._commit, session_id, record, expected_version)
+
+    async def delete(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self._delete, session_id)
+
+    async def expire(self, cutoff: datetime, max_sessions: int) -> List[str]:
+        return await asyncio.to_thread(self._expire, cutoff, max_sessions)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+    def _get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT created_at, updated_at, data, version FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[2])
+        record["created_at"] = datetime.fromtimestamp(row[0])
+        record["updated_at"] = datetime.fromtimestamp(row[1])
+        record["version"] = row[3]
+        return record
+
+    @staticmethod
+    def _columns(record: Dict[str, Any]):
+        """created_at, updated_at and the JSON data column of a record"""
+        data = {k: v for k, v in record.items() if k not in ("created_at", "updated_at", "version")}
+        created_at = record.get("created_at", datetime.now()).timestamp()
+        updated_at = record.get("updated_at", datetime.now()).timestamp()
+        return created_at, updated_at, json.dumps(data)
+
+    def _put(self, session_id: str, record: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, created_at, updated_at, data, version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, *self._columns(record), record.get("version", 0))
+            )
+
+    def _commit(self, session_id: str, record: Dict[str, Any], expected_version: int) -> bool:
+        created_at, updated_at, data = self._columns(record)
+        with self.lock:
+            # Compare-and-set in one statement, so it holds across processes sharing the file
+            cursor = self.conn.execute(
+                """INSERT INTO sessions (session_id, created_at, updated_at, data, version)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (session_id) DO UPDATE SET
+                       updated_at = excluded.updated_at, data = excluded.data, version = excluded.version
+                   WHERE sessions.version = ?""",
+                (session_id, created_at, updated_at, data, expected_version + 1, expected_version)
+            )
+            committed = cursor.rowcount == 1
+            if committed and record.get("checkpoint_id") and self.checkpointer_conn is not None:
+                self._prune(session_id, record["checkpoint_id"])
+        return committed
+
+    def _prune(self, session_id: str, checkpoint_id: str):
+        """Drop the thread's checkpoints (all namespaces) superseded by checkpoint_id; ids sort by creation time"""
+        for table in ("writes", "checkpoints"):
+            self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < ?",
+                              (session_id, checkpoint_id))
+
+    def _delete(self, session_id: str) -> bool:
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def _expire(self, cutoff: datetime, max_sessions: int) -> List[str]:
+        with self.lock:
+            rows = self.conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ? RETURNING session_id",
+                (cutoff.timestamp(),)
+            ).fetchall()
+            # LRU overflow: everything past the newest max_sessions
+            rows += self.conn.execute(
+                """DELETE FROM sessions WHERE session_id IN (
+                       SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                   ) RETURNING session_id""",
+                (max_sessions,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    async def open_checkpointer(self):
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        self.checkpointer_conn = await aiosqlite.connect(self.path)
+        await self.checkpointer_conn.execute("PRAGMA busy_timeout=5000")
+        checkpointer = AsyncSqliteSaver(self.checkpointer_conn)
+        await checkpointer.setup()  # creates the checkpoint tables in WAL mode
+        return checkpointer
+
+    async def close(self):
+        if self.checkpointer_conn is not None:
+            await self.checkpointer_conn.close()
+            self.checkpointer_conn = None
+        with self.lock:
+            self.conn.close()
+
+
+def create_session_store(kind: str = SESSION_STORE, path: str = SESSION_DB_PATH) -> SessionStore:
+    """Build the store selected by SESSION_STORE"""
+    if kind == "memory":
+        return InMemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(path)
+    raise ValueError(f"Unknown SESSION_STORE '{kind}' (expected 'memory' or 'sqlite')")
@@ -0,0 +1,104 @@
+#speculation.py
+"""
+Speculative turns: work done while the user is typing, so the reply to their
+next message is partly or wholly ready when it arrives.
+
+The question sequence is fixed, so the next step follows from the session's
+committed checkpoint and the draft the frontend reports:
+
+- the conversation prompt (transcript or answered-so-far lines) is built for
+  the committed history, so an LLM turn only formats the new message;
+- a draft that passes local validation is answered ahead: its
+  acknowledgement and the next question are written as a checkpoint forked
+  from the committed one. If the message sent is exactly the draft and the
+  session has not moved, the turn commits that checkpoint without running
+  the graph. Otherwise it is discarded and stays unreferenced, like a turn
+  that lost a 409 race.
+
+Speculations are kept per worker, least recently used dropped beyond
+MAX_SPECULATIONS; a message that reaches another worker is answered as usual.
+"""
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from main import build_conversation_prompt, local_turn
+import metrics
+
+SPECULATIVE_TURNS = os.getenv("SPECULATIVE_TURNS", "0").lower() not in ("0", "false", "no", "off")
+MAX_SPECULATIONS = int(os.getenv("MAX_SPECULATIONS", "1000"))
+
+
+class Speculation:
+    """Work prepared for a session's next turn, valid while base_checkpoint_id is its committed checkpoint"""
+    __slots__ = ("base_checkpoint_id", "prompt_updates", "message", "checkpoint_id", "result")
+
+    def __init__(self, base_checkpoint_id: Optional[str]):
+        self.base_checkpoint_id = base_checkpoint_id
+        self.prompt_updates: Dict[str, Any] = {}     # prompt state for the committed history
+        self.message: Optional[str] = None           # draft the turn below answers
+        self.checkpoint_id: Optional[str] = None     # checkpoint answering message, if it was answered locally
+        self.result: Optional[Dict[str, Any]] = None  # that turn's state updates
+
+    def answers(self, message: str) -> bool:
+        return self.checkpoint_id is not None and message == self.message
+
+
+class SpeculationCache:
+    """One Speculation per session, least recently used evicted beyond max_entries"""
+
+    def __init__(self, max_entries: int = MAX_SPECULATIONS):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Speculation]" = OrderedDict()
+
+    def get(self, session_id: str, base_checkpoint_id: Optional[str]) -> Optional[Speculation]:
+        speculation = self.entries.get(session_id)
+        if speculation is None or speculation.base_checkpoint_id != base_checkpoint_id:
+            return None
+        return speculation
+
+    def put(self, session_id: str, speculation: Speculation):
+        self.entries[session_id] = speculation
+        self.entries.move_to_end(session_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def take(self, session_id: str, base_checkpoint_id: Optional[str], message: str) -> Optional[Speculation]:
+        """Remove and return the session's speculation if it was built on base_checkpoint_id"""
+        speculation = self.entries.pop(session_id, None)
+        if speculation is None:
+            return None
+        if speculation.checkpoint_id is not None and (speculation.base_checkpoint_id != base_checkpoint_id
+                                                      or not speculation.answers(message)):
+            metrics.SPECULATIONS.inc(1, "discarded")
+        return speculation if speculation.base_checkpoint_id == base_checkpoint_id else None
+
+    def discard(self, session_id: str):
+        self.entries.pop(session_id, None)
+
+
+async def prefetch(graph, config: Dict[str, Any], state: Dict[str, Any], draft: Optional[str],
+                   speculation: Optional[Speculation] = None) -> Speculation:
+    """
+    Prepare the next turn of the session whose committed state is state (config
+    pins its checkpoint): build the prompt once per committed checkpoint and
+    answer draft ahead if it passes local validation.
+    """
+    if speculation is None:
+        speculation = Speculation(config["configurable"].get("checkpoint_id"))
+        with metrics.stage("prompt_prefetch"):
+            speculation.prompt_updates, _ = build_conversation_prompt(state)
+    if not draft or draft == speculation.message:
+        return speculation
+
+    if speculation.checkpoint_id is not None:
+        metrics.SPECULATIONS.inc(1, "discarded")
+    speculation.message, speculation.checkpoint_id, speculation.result = draft, None, None
+    updates = local_turn({**state, "user_message": draft})
+    if updates is not None and speculation.base_checkpoint_id:
+        # Same writes as an API turn answered by validate_node
+        config = {**config, "configurable": {"checkpoint_ns": "", **config["configurable"]}}
+        written = await graph.aupdate_state(config, {"mode": "api", **updates}, as_node="validate")
+        speculation.checkpoint_id = written["configurable"]["checkpoint_id"]
+        speculation.result = updates
+        metrics.SPECULATIONS.inc(1, "prepared")
+    return speculation
@@ -0,0 +1,28 @@
+# tests/conftest.py
+import asyncio
+import httpx
+import pytest
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.load import install_fake_model
+import fastapi_app
+
+
+@pytest.fixture
+def fake_model():
+    """The scripted chat model, answering instantly"""
+    fake = FakeChatModel(latency=0, tokens_per_sec=0)
+    install_fake_model(fake)
+    return fake
+
+
+@pytest.fixture
+def api(fake_model):
+    """Runs scenario(client) against the app (lifespan started) on the fake model"""
+    def run(scenario):
+        async def main():
+            transport = httpx.ASGITransport(app=fastapi_app.app)
+            async with fastapi_app.app.router.lifespan_context(fastapi_app.app), \
+                    httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+                return await scenario(client)
+        return asyncio.run(main())
+    return run
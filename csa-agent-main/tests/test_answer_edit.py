@@ -0,0 +1,99 @@
+# tests/test_answer_edit.py
+import asyncio
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from boq_engine import (answers_from_summary, compute_boq, render_boq, patch_table, splice_rows, row_changes,
+                        table_rows, BOQ_DEPENDENCIES, TOTALS_HEADING, IPT, Q_OFFICE_HARDWARE)
+from create_boq import EXAMPLE_SUMMARY
+from prompts import QUESTION_IDS
+import fastapi_app
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+OFFICE_HARDWARE = QUESTION_IDS[Q_OFFICE_HARDWARE]
+EDITED = "Executive 9, Manager 15, Employee 100, Conference 3, no others"
+
+
+def edit_office_hardware(text: str, answer: str) -> str:
+    answers = answers_from_summary(EXAMPLE_SUMMARY)
+    answers[Q_OFFICE_HARDWARE] = answer
+    return splice_rows(text, patch_table(text, answers, Q_OFFICE_HARDWARE), BOQ_DEPENDENCIES[Q_OFFICE_HARDWARE])
+
+
+def changed_lines(before: str, after: str) -> list:
+    old, new = before.splitlines(), after.splitlines()
+    assert len(old) == len(new)
+    return [(a, b) for a, b in zip(old, new) if a != b]
+
+
+def test_edit_rerenders_only_the_rows_that_read_the_answer():
+    before = render_boq(compute_boq(answers_from_summary(EXAMPLE_SUMMARY)))
+    after = edit_office_hardware(before, "Executive 9, Manager 15, Employee 100, Conference 3, Other: None")
+    table = before[:before.index(TOTALS_HEADING)]
+    changed = [(a, b) for a, b in changed_lines(before, after) if a in table]
+    assert len(changed) == 1 and "Cisco 8845" in changed[0][0]
+    assert changed[0][0].replace("| 5 |", "| 9 |") == changed[0][1]
+    assert [(c.key, c.before, c.after) for c in row_changes(before, after, [IPT])] == [("executive_phone", "5", "9")]
+
+
+def test_edit_keeps_other_sections_byte_for_byte():
+    # an LLM-written table: its own spacing and wording, which the patch must not touch
+    engine = render_boq(compute_boq(answers_from_summary(EXAMPLE_SUMMARY)))
+    lines = engine[:engine.index(TOTALS_HEADING)].rstrip().splitlines()
+    for n, section, _, _ in table_rows(engine):
+        if section != IPT:
+            lines[n] = lines[n].replace("| ", "|  ")
+    before = "\n".join(lines + ["| | Extra row the model added | 2 | - |"])
+    after = edit_office_hardware(before, "Executive 9, Manager 15, Employee 100, Conference 3, Other: None")
+    rows_before = {n: section for n, section, _, _ in table_rows(before)}
+    untouched = [n for n, section in rows_before.items() if section != IPT]
+    assert [before.splitlines()[n] for n in untouched] == [after.splitlines()[n] for n in untouched]
+    assert "| | Extra row the model added | 2 | - |" in after.splitlines()
+
+
+def wait_for_boq(client, session_id: str):
+    async def wait():
+        for _ in range(200):
+            status = (await client.get(f"/boq/{session_id}")).json()
+            if status["status"] != "pending":
+                return status
+            await asyncio.sleep(0.01)
+        raise AssertionError("BOQ job did not finish")
+    return wait()
+
+
+def test_patch_endpoint_updates_answer_summary_and_boq(api):
+    async def scenario(client):
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        await wait_for_boq(client, session_id)
+        before = (await client.get(f"/boq/{session_id}/result")).json()["agent_message"]
+        resp = await client.patch(f"/session/{session_id}/answers/{OFFICE_HARDWARE}", json={"answer": EDITED})
+        after = (await client.get(f"/boq/{session_id}/result")).json()["agent_message"]
+        session = (await client.get(f"/session/{session_id}")).json()
+        return resp, before, after, session
+
+    resp, before, after, session = api(scenario)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["boq_status"] == "ready" and EDITED in body["summary"]
+    assert [(c["key"], c["before"], c["after"]) for c in body["changes"]] == [("executive_phone", "5", "9")]
+    assert session["answers"][OFFICE_HARDWARE] == EDITED and body["version"] == session["version"]
+    table_changes = [pair for pair in changed_lines(before, after) if pair[0].startswith("|")]
+    assert len(table_changes) == 1 and "Cisco 8845" in table_changes[0][0]
+
+
+def test_patch_endpoint_refuses_unknown_sessions_questions_and_pending_boqs(api, monkeypatch):
+    async def no_worker(job_id, payload):
+        return True
+
+    async def scenario(client):
+        unknown = await client.patch(f"/session/nope/answers/{OFFICE_HARDWARE}", json={"answer": EDITED})
+        monkeypatch.setattr(fastapi_app.boq_jobs, "enqueue", no_worker)   # the BOQ stays pending
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        question = await client.patch(f"/session/{session_id}/answers/Q99", json={"answer": EDITED})
+        pending = await client.patch(f"/session/{session_id}/answers/{OFFICE_HARDWARE}", json={"answer": EDITED})
+        session = (await client.get(f"/session/{session_id}")).json()
+        return unknown, question, pending, session
+
+    unknown, question, pending, session = api(scenario)
+    assert unknown.status_code == 404 and question.status_code == 404
+    assert pending.status_code == 409 and "Retry-After" in pending.headers
+    assert session["answers"][OFFICE_HARDWARE] == ANSWERS[OFFICE_HARDWARE]
@@ -0,0 +1,63 @@
+# tests/test_answer_validator.py
+import pytest
+from langchain_core.messages import AIMessage
+from answer_validator import check_answer, review_answers, Q_BUILDINGS, Q_NEOM_NETWORK
+from boq_engine import CATALOG_BY_KEY, Q_SIP_CALLING, Q_SERVICE_FEATURES, extract_value
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from prompts import QUESTIONS, QUESTION_IDS
+import main
+
+ONE_BUILDING = {QUESTION_IDS[Q_BUILDINGS]: "1 building"}
+
+
+@pytest.mark.parametrize("index, reply, recorded", [
+    (Q_NEOM_NETWORK, "yes, we will be on it", "Yes"),
+    (Q_NEOM_NETWORK, "No, not connected", "No"),
+    (Q_BUILDINGS, "3 buildings", "3 buildings"),
+    (Q_SIP_CALLING, "Local, Mobile, no International", "Local, Mobile, no International"),
+    (Q_SERVICE_FEATURES, "No voice mail, internal only", "No voice mail, internal only"),
+])
+def test_accepted_answers_and_what_is_recorded(index, reply, recorded):
+    check = check_answer(index, reply, ONE_BUILDING)
+    assert check.status == "accepted" and check.recorded(reply) == recorded
+
+
+@pytest.mark.parametrize("index, reply, status", [
+    (Q_NEOM_NETWORK, "Probably yes", "unclear"),
+    (Q_BUILDINGS, "3 buildings I think", "unclear"),
+    (Q_NEOM_NETWORK, "Not decided yet", "unclear"),
+    (Q_SIP_CALLING, "No international", "unreadable"),
+    (Q_SIP_CALLING, "All except International", "unreadable"),
+])
+def test_hedged_and_negative_answers_are_not_accepted(index, reply, status):
+    assert check_answer(index, reply, ONE_BUILDING).status == status
+
+
+def test_negated_calling_option_is_not_selected():
+    item = CATALOG_BY_KEY["calling_options"]
+    assert extract_value(item, "Local, Mobile, no International") == "Local, Mobile"
+    assert extract_value(item, "Local, National, not toll free") == "Local, National"
+    assert extract_value(item, "No international") is None
+
+
+def local_turn(index: int, reply: str):
+    answers = dict(zip(QUESTION_IDS[:index], SCRIPTED_ANSWERS[:index]))
+    state = {"history": [AIMessage(content=QUESTIONS[index])], "user_message": reply, "answers": answers}
+    return main.local_turn(state)
+
+
+def test_negative_selection_goes_to_the_model():
+    assert local_turn(Q_SIP_CALLING, "No international") is None
+    assert local_turn(Q_SIP_CALLING, "Local, Mobile") is not None
+
+
+def test_yes_no_answer_is_recorded_normalized():
+    assert local_turn(Q_NEOM_NETWORK, "yes, we will be on it")["answers"] == {QUESTION_IDS[Q_NEOM_NETWORK]: "Yes"}
+    assert local_turn(Q_NEOM_NETWORK, "Probably yes") is None
+
+
+def test_intake_records_normalized_answers_and_flags_hedged_ones():
+    given = {QUESTION_IDS[Q_BUILDINGS]: "2 buildings I think", QUESTION_IDS[Q_NEOM_NETWORK]: "yes we are"}
+    accepted, flagged = review_answers(given, {})
+    assert accepted == {QUESTION_IDS[Q_NEOM_NETWORK]: "Yes"}
+    assert flagged[QUESTION_IDS[Q_BUILDINGS]][1].note == "a tentative answer"
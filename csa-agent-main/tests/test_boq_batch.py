@@ -0,0 +1,84 @@
+# tests/test_boq_batch.py
+import csv
+import json
+import asyncio
+import argparse
+from benchmarks.fake_llm import SCRIPTED_ANSWERS, summary_table
+from prompts import QUESTION_IDS
+import boq_batch
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+
+
+def cli_args(input_path, output_path, **overrides) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    boq_batch.add_arguments(parser)
+    args = parser.parse_args([str(input_path), "-o", str(output_path), "--mode", "engine", "--retry-delay", "0"])
+    for name, value in overrides.items():
+        setattr(args, name, value)
+    return args
+
+
+def write_portfolio(path, count: int):
+    with open(path, "w") as f:
+        for n in range(count):
+            item = {"id": f"p{n}", "answers": ANSWERS} if n % 2 else {"id": f"p{n}", "info_summary": summary_table()}
+            f.write(json.dumps(item) + "\n")
+
+
+def test_engine_batch_writes_one_ready_row_per_item(tmp_path):
+    write_portfolio(tmp_path / "in.jsonl", 6)
+    output = tmp_path / "out.jsonl"
+    assert asyncio.run(boq_batch.run_cli(cli_args(tmp_path / "in.jsonl", output))) == 0
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["id"] for row in rows) == [f"p{n}" for n in range(6)]
+    assert all(row["status"] == "ready" and row["attempts"] == 1 for row in rows)
+    # Summaries and answer sets give the same table
+    assert len({row["boq"] for row in rows}) == 1 and rows[0]["boq"].startswith("## BOQ")
+
+
+def test_rerun_resumes_from_the_output_file(tmp_path):
+    write_portfolio(tmp_path / "in.jsonl", 4)
+    output = tmp_path / "out.jsonl"
+    asyncio.run(boq_batch.run_cli(cli_args(tmp_path / "in.jsonl", output)))
+    # A crash mid-write: the last row torn, another item never written
+    lines = output.read_text().splitlines()
+    done = [json.loads(line)["id"] for line in lines[:2]]
+    output.write_text("\n".join(lines[:2]) + "\n" + lines[2][:40])
+
+    asyncio.run(boq_batch.run_cli(cli_args(tmp_path / "in.jsonl", output)))
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["id"] for row in rows) == [f"p{n}" for n in range(4)]
+    assert [row["id"] for row in rows[:2]] == done
+
+
+def test_failing_item_is_retried_then_reported(tmp_path, monkeypatch):
+    write_portfolio(tmp_path / "in.jsonl", 3)
+    output = tmp_path / "out.csv"
+    generate = boq_batch.generate_boq
+
+    async def flaky(info_summary, mode, answers):
+        if answers is not None:
+            raise RuntimeError("model down")
+        return await generate(info_summary, mode, answers)
+
+    monkeypatch.setattr(boq_batch, "generate_boq", flaky)
+    assert asyncio.run(boq_batch.run_cli(cli_args(tmp_path / "in.jsonl", output, retries=2))) == 1
+
+    with open(output, newline="") as f:
+        rows = {row["id"]: row for row in csv.DictReader(f)}
+    assert [rows[item_id]["status"] for item_id in ("p0", "p1", "p2")] == ["ready", "failed", "ready"]
+    assert rows["p1"]["attempts"] == "3" and rows["p1"]["error"] == "model down"
+
+
+def test_batch_endpoint_streams_csv_rows(api):
+    items = [{"id": "a", "answers": ANSWERS}, {"id": "b", "info_summary": summary_table()}]
+
+    async def scenario(client):
+        return await client.post("/batch/boq", json={"items": items, "mode": "engine", "format": "csv"})
+
+    resp = api(scenario)
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(resp.text.splitlines(keepends=True)))
+    assert sorted((row["id"], row["status"]) for row in rows) == [("a", "ready"), ("b", "ready")]
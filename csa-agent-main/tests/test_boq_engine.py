@@ -0,0 +1,84 @@
+# tests/test_boq_engine.py
+import asyncio
+from boq_engine import (CATALOG, OPTIONAL, NOT_SPECIFIED, answers_from_summary, compute_boq, render_boq,
+                        render_template_rows, table_rows, patch_table, splice_rows, priced_lines, VC, Q_VIDEO_ROOMS)
+from create_boq import EXAMPLE_SUMMARY, generate_boq
+
+# Qty/Value cells the LLM writes for EXAMPLE_SUMMARY (its free-text rows are
+# reworded from run to run and are left out)
+EXPECTED_EXAMPLE = {
+    "executive_phone": "5", "manager_phone": "15", "employee_phone": "100", "conference_phone": "3",
+    "other_phone": "0", "living_room_phone": "100", "bed_room_phone": "200", "wash_room_phone": "0",
+    "voice_mail": "Yes", "calling": "Internal + SIP Trunk",
+    "coordinates": "25.276987, 55.296249", "dids": "50", "channels": "30",
+    "calling_options": "Local, Mobile, International",
+    "supervisors": "2", "seat_agents": "10", "call_recordings": "Yes", "concurrent_calls": "15",
+    "meeting_pods": "2", "huddle_room": "4",
+    "small_room_bar": "2", "small_room_board": OPTIONAL,
+    "executive_office_bar": "1", "executive_office_board": OPTIONAL,
+    "medium_room_board": "1", "medium_room_kit": OPTIONAL,
+    "large_room": "1", "board_room": "1",
+}
+
+
+def qty_by_key(text: str) -> dict:
+    return {key: cells[2] for _, _, key, cells in table_rows(text) if key is not None}
+
+
+def test_engine_matches_llm_table_for_example_summary():
+    table = asyncio.run(generate_boq(EXAMPLE_SUMMARY, "engine"))
+    values = qty_by_key(table)
+    assert {key: values.get(key) for key in EXPECTED_EXAMPLE} == EXPECTED_EXAMPLE
+    assert list(values) == [item.key for item in CATALOG]
+
+
+def test_alternative_takes_the_quantity_when_asked_for():
+    answers = answers_from_summary(EXAMPLE_SUMMARY)
+    answers[Q_VIDEO_ROOMS] = ("Small Rooms: 2 with Webex Board, Executive Director Office: 1, "
+                              "Medium Meeting Rooms: 3 with Room Kit EQ, Board Room: 1")
+    values = qty_by_key(render_boq(compute_boq(answers)))
+    assert (values["small_room_bar"], values["small_room_board"]) == (OPTIONAL, "2")
+    assert (values["executive_office_bar"], values["executive_office_board"]) == ("1", OPTIONAL)
+    assert (values["medium_room_board"], values["medium_room_kit"]) == (OPTIONAL, "3")
+    assert values["large_room"] == NOT_SPECIFIED
+
+
+def test_each_room_is_counted_once():
+    lines = compute_boq(answers_from_summary(EXAMPLE_SUMMARY)).lines
+    rooms = sum(line.quantity or 0 for line in lines if line.section == VC)
+    assert rooms == 2 + 4 + 2 + 1 + 1 + 1 + 1
+
+
+def test_llm_template_marks_alternatives_optional():
+    values = qty_by_key(render_template_rows([VC]))
+    assert [key for key, value in values.items() if value == OPTIONAL] == \
+           ["small_room_board", "executive_office_board", "medium_room_kit"]
+
+
+def test_totals_for_example_summary():
+    table = compute_boq(answers_from_summary(EXAMPLE_SUMMARY))
+    lines = {line.key: line for line in table.lines}
+    assert lines["executive_phone"].total == 5 * 1250
+    assert lines["small_room_board"].total is None      # [Optional]: no quantity
+    assert lines["dids"].total is None                  # priced on request
+    assert table.section_totals() == {
+        "IP Telephony": 5 * 1250 + 15 * 1600 + 100 * 950 + 3 * 3500 + 100 * 950 + 200 * 600,
+        VC: 4 * 18000 + 2 * 38000 + 38000 + 95000 + 75000 + 80000,
+    }
+    assert table.grand_total == sum(table.section_totals().values())
+
+    text = render_boq(table)
+    assert "- Executive Phone: Cisco 8845: 5 x 1,250 = 6,250" in text
+    assert "- Section total: 436,000" in text
+    assert text.endswith(f"**Grand total: {table.grand_total:,}**")
+    # the totals block adds no table rows
+    assert len(table_rows(text)) == len(table.lines)
+
+
+def test_totals_follow_an_edited_answer():
+    answers = answers_from_summary(EXAMPLE_SUMMARY)
+    before = render_boq(compute_boq(answers))
+    answers[Q_VIDEO_ROOMS] = answers[Q_VIDEO_ROOMS].replace("Huddle Rooms: 4", "Huddle Rooms: 6")
+    after = splice_rows(before, patch_table(before, answers, Q_VIDEO_ROOMS), [VC])
+    assert after == render_boq(compute_boq(answers))
+    assert priced_lines(after).grand_total == priced_lines(before).grand_total + 2 * 18000
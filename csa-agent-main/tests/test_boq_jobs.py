@@ -0,0 +1,137 @@
+# tests/test_boq_jobs.py
+import asyncio
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from boq_jobs import InProcessJobQueue
+from prompts import QUESTION_IDS
+import fastapi_app
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+
+
+def run_jobs(outcomes: list, jobs: list, retries: int = 2):
+    """
+    Runs jobs (job id, payload) on a one-worker queue whose handler fails
+    while outcomes says so. Returns (handler calls, failures, enqueue results).
+    """
+    calls, failures = [], []
+
+    async def handler(job_id, payload, attempt):
+        calls.append((job_id, attempt))
+        await asyncio.sleep(0)
+        if outcomes[len(calls) - 1] == "fail":
+            raise RuntimeError(f"attempt {attempt}")
+
+    async def on_failure(job_id, payload, error):
+        failures.append((job_id, str(error)))
+
+    async def scenario():
+        queue = InProcessJobQueue(handler, on_failure, workers=1, retries=retries, retry_delay=0)
+        await queue.start()
+        queued = [await queue.enqueue(job_id, payload) for job_id, payload in jobs]
+        pending = queue.pending(jobs[0][0])
+        await queue.queue.join()
+        assert not queue.pending(jobs[0][0])
+        await queue.close()
+        return queued, pending
+
+    queued, pending = asyncio.run(scenario())
+    return calls, failures, queued, pending
+
+
+def test_job_runs_once_per_id():
+    calls, failures, queued, pending = run_jobs(["ok", "ok"], [("a", {}), ("a", {}), ("b", {})])
+    assert queued == [True, False, True] and pending
+    assert calls == [("a", 1), ("b", 1)] and failures == []
+
+
+def test_failed_attempt_is_retried():
+    calls, failures, _, _ = run_jobs(["fail", "ok"], [("a", {})])
+    assert calls == [("a", 1), ("a", 2)] and failures == []
+
+
+def test_failure_handler_runs_after_the_last_retry():
+    calls, failures, _, _ = run_jobs(["fail"] * 3, [("a", {})], retries=2)
+    assert calls == [("a", 1), ("a", 2), ("a", 3)]
+    assert failures == [("a", "attempt 3")]
+
+
+async def boq_settled(client, session_id: str) -> dict:
+    for _ in range(200):
+        status = (await client.get(f"/boq/{session_id}")).json()
+        if status["status"] != "pending":
+            return status
+        await asyncio.sleep(0.01)
+    raise AssertionError("BOQ job did not finish")
+
+
+def test_completed_session_gets_its_boq_in_the_background(api):
+    async def scenario(client):
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        status = await boq_settled(client, session_id)
+        result = await client.get(f"/boq/{session_id}/result")
+        return status, result
+
+    status, result = api(scenario)
+    assert (status["status"], status["mode"], status["attempts"]) == ("ready", fastapi_app.BOQ_MODE, 1)
+    assert result.status_code == 200 and result.json()["agent_message"].startswith("## BOQ")
+
+
+def test_failed_job_is_reported_and_can_be_requested_again(api, monkeypatch):
+    generate = fastapi_app.generate_boq_content
+    failing = {"on": True}
+
+    async def flaky(info_summary, mode, answers=None):
+        if failing["on"]:
+            raise RuntimeError("model down")
+        return await generate(info_summary, mode, answers)
+
+    monkeypatch.setattr(fastapi_app, "generate_boq_content", flaky)
+    monkeypatch.setattr(fastapi_app.boq_jobs, "retry_delay", 0)
+
+    async def scenario(client):
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        failed = await boq_settled(client, session_id)
+        result = await client.get(f"/boq/{session_id}/result")
+        failing["on"] = False
+        requeued = await client.post(f"/boq/{session_id}")
+        ready = await boq_settled(client, session_id)
+        return failed, result, requeued, ready
+
+    failed, result, requeued, ready = api(scenario)
+    assert (failed["status"], failed["attempts"]) == ("failed", fastapi_app.boq_jobs.retries + 1)
+    assert "model down" in failed["error"]
+    assert result.status_code == 500
+    assert requeued.status_code == 202 and requeued.json()["status"] == "pending"
+    assert ready["status"] == "ready"
+
+
+def test_refused_job_is_not_left_pending(api, monkeypatch):
+    async def busy(job_id, payload):
+        return False
+
+    async def scenario(client):
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        await boq_settled(client, session_id)
+        monkeypatch.setattr(fastapi_app.boq_jobs, "enqueue", busy)
+        requested = await client.post(f"/boq/{session_id}", params={"mode": "engine"})
+        status = (await client.get(f"/boq/{session_id}")).json()
+        return requested, status
+
+    requested, status = api(scenario)
+    assert requested.status_code == 503 and "Retry-After" in requested.headers
+    assert status["status"] == "failed" and status["error"] == fastapi_app.BOQ_JOB_BUSY
+
+
+def test_completing_turn_with_a_refused_job_marks_it_failed(api, monkeypatch):
+    async def busy(job_id, payload):
+        return False
+
+    monkeypatch.setattr(fastapi_app.boq_jobs, "enqueue", busy)
+
+    async def scenario(client):
+        resp = await client.post("/intake", json={"answers": ANSWERS})
+        return resp, (await client.get(f"/boq/{resp.json()['session_id']}")).json()
+
+    resp, status = api(scenario)
+    assert resp.status_code == 200 and resp.json()["status"] == "done"
+    assert status["status"] == "failed"
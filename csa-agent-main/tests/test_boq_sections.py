@@ -0,0 +1,120 @@
+# tests/test_boq_sections.py
+import asyncio
+import json
+from typing import Optional
+import pytest
+from langchain_core.messages import AIMessageChunk
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from boq_engine import table_rows, SECTIONS, IPT, SIP, CC, VC
+from prompts import QUESTION_IDS
+from response_cache import MemoryResponseCache
+import create_boq
+import fastapi_app
+import response_cache
+
+SLICES = {section: f"summary of {section}" for section in SECTIONS}
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+
+
+def section_of(messages) -> str:
+    return next(section for section in SECTIONS if f"**{section}** rows" in messages[-1].content)
+
+
+def install_sections(monkeypatch, rows: dict, delays: dict, log: Optional[list] = None):
+    """
+    Section calls writing rows[section] (a list of rows, or other text),
+    delays[section] seconds apart; each write is noted in log as (section, n)
+    """
+    async def completion(messages, valid=None):
+        section = section_of(messages)
+        lines = rows[section] if isinstance(rows[section], list) else [rows[section]]
+        for n, row in enumerate(lines):
+            await asyncio.sleep(delays[section])
+            if log is not None:
+                log.append((section, n))
+            yield ("\n" if n else "") + row
+    monkeypatch.setattr(create_boq, "stream_completion", completion)
+
+
+def section_table(section: str, count: int) -> list:
+    return [f"| {f'**{section}**' if n == 0 else ''} | Row {n} | {n} | - |" for n in range(count)]
+
+
+def collect(slices: dict, log: Optional[list] = None) -> tuple:
+    """Chunks of stream_sections (each also noted in log), and the exception it ended with (or None)"""
+    async def run():
+        chunks = []
+        try:
+            async for chunk in create_boq.stream_sections(slices):
+                chunks.append(chunk)
+                if log is not None:
+                    log.append(chunk)
+        except Exception as e:
+            return chunks, e
+        return chunks, None
+    return asyncio.run(run())
+
+
+def test_sections_are_merged_in_boq_order(monkeypatch):
+    rows = {section: section_table(section, 3) for section in SECTIONS}
+    # the first section is the slowest to write; the last one finishes first
+    log = []
+    install_sections(monkeypatch, rows, {IPT: 0.02, SIP: 0.01, CC: 0.005, VC: 0.001}, log)
+    chunks, error = collect(SLICES, log)
+    assert error is None
+    table = "".join(chunks)
+    assert [section for _, section, _, _ in table_rows(table)] == [s for s in SECTIONS for _ in range(3)]
+    assert table.startswith("## BOQ\n") and table.endswith(rows[VC][-1] + "\n")
+    # the last section was written before the first, but is sent after it
+    assert log.index((VC, 2)) < log.index((IPT, 0))
+    # the first section streams row by row: its first row is sent before its last is written
+    assert log.index(rows[IPT][0] + "\n") < log.index((IPT, 2))
+
+
+def test_section_without_rows_fails_the_table_in_its_place(monkeypatch):
+    rows = {section: section_table(section, 2) for section in SECTIONS}
+    rows[CC] = "I could not find any call center details."
+    install_sections(monkeypatch, rows, {section: 0.001 for section in SECTIONS})
+    chunks, error = collect(SLICES)
+    assert isinstance(error, create_boq.EmptySection) and error.section == CC
+    streamed = "".join(chunks)
+    assert [section for _, section, _, _ in table_rows(streamed)] == [IPT, IPT, SIP, SIP]
+
+
+def test_empty_section_is_not_cached(monkeypatch):
+    answers = iter(["No rows, sorry.", "| **Video Conferencing** | Huddle Room | 4 | 18000 |"])
+
+    class Model:
+        def astream(self, messages, config=None):
+            async def chunks():
+                yield AIMessageChunk(content=next(answers))
+            return chunks()
+
+    monkeypatch.setattr(create_boq, "get_llm", lambda: Model())
+    monkeypatch.setattr(response_cache, "_cache", MemoryResponseCache())
+
+    async def rows():
+        return [row async for row in create_boq.section_rows(VC, "Huddle 4")]
+
+    with pytest.raises(create_boq.EmptySection):
+        asyncio.run(rows())
+    assert asyncio.run(rows()) == ["| **Video Conferencing** | Huddle Room | 4 | 18000 |"]
+    assert asyncio.run(rows()) == ["| **Video Conferencing** | Huddle Room | 4 | 18000 |"]   # now from the cache
+
+
+def test_stream_endpoint_reports_an_empty_section(api, monkeypatch):
+    rows = {section: section_table(section, 2) for section in SECTIONS}
+    rows[VC] = ""
+    install_sections(monkeypatch, rows, {section: 0 for section in SECTIONS})
+    monkeypatch.setattr(fastapi_app, "BOQ_ON_COMPLETION", False)
+
+    async def scenario(client):
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        return await client.post(f"/create_boq/{session_id}/stream", params={"mode": "llm"})
+
+    events = [block.split("\n") for block in api(scenario).text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names[-1] == "error" and "done" not in names
+    assert VC in json.loads(events[-1][1].removeprefix("data: "))["detail"]
+    streamed = "".join(json.loads(lines[1].removeprefix("data: "))["text"] for lines in events[:-1])
+    assert [section for _, section, _, _ in table_rows(streamed)] == [IPT, IPT, SIP, SIP, CC, CC]
@@ -0,0 +1,65 @@
+# tests/test_compact_sessions.py
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import InMemorySaver
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from compact_sessions import CompactSaver, DERIVED_CHANNELS
+from prompts import QUESTIONS, QUESTION_IDS, render_summary_table
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+CONFIG = {"configurable": {"thread_id": "session", "checkpoint_ns": ""}}
+
+
+def finished_conversation() -> dict:
+    """Channel values of a completed session: every turn, then the summary table"""
+    history = []
+    for question, answer in zip(QUESTIONS, SCRIPTED_ANSWERS):
+        history += [AIMessage(content=question), HumanMessage(content=answer)]
+    summary = render_summary_table(ANSWERS)
+    history.append(AIMessage(content=summary))
+    transcript = "\n".join(f"{m.type}: {m.content}" for m in history)
+    return {"history": history, "answers": ANSWERS, "status": "done", "progress": 100, "next_response": summary,
+            "validated": True, "transcript": transcript, "transcript_len": len(history)}
+
+
+def save(saver, values: dict) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = {channel: 1 for channel in values}
+    config = saver.put(CONFIG, checkpoint, {"source": "loop", "step": len(values["history"])},
+                       checkpoint["channel_versions"])
+    saver.put_writes(config, [("status", "done")], "task")
+    return config
+
+
+def size(serialized) -> int:
+    return len(serialized[1])
+
+
+def test_checkpoint_loads_back_unchanged():
+    values = finished_conversation()
+    saver = CompactSaver()
+    config = save(saver, values)
+    loaded = saver.get_tuple(config)
+    expected = {k: v for k, v in values.items() if k not in DERIVED_CHANNELS}
+    assert loaded.checkpoint["channel_values"] == expected
+    assert [type(m) for m in loaded.checkpoint["channel_values"]["history"]] == [type(m) for m in values["history"]]
+    assert loaded.metadata["step"] == len(values["history"])
+    assert loaded.pending_writes == [("task", "status", "done")]
+    assert saver.get_tuple(CONFIG).config == config
+
+
+def test_compact_record_is_smaller_than_full_checkpoint():
+    values = finished_conversation()
+    compact, full = CompactSaver(), InMemorySaver()
+    save(compact, values)
+    save(full, values)
+
+    record = compact.threads["session"][""]
+    texts = sum(len(text) if isinstance(text, bytes) else len(text.encode()) for _, text in record.turns)
+    compact_size = size(record.checkpoint) + size(record.metadata) + size(record.values) + texts
+    stored = full.storage["session"][""]
+    full_size = sum(size(checkpoint) + size(metadata) for checkpoint, metadata, _ in stored.values()) + \
+        sum(size(blob) for blob in full.blobs.values())
+    assert any(isinstance(text, bytes) for _, text in record.turns)   # the summary table is compressed
+    assert compact_size < full_size / 2, (compact_size, full_size)
@@ -0,0 +1,69 @@
+# tests/test_idempotency.py
+import json
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+import fastapi_app
+import response_cache
+
+
+def sse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def history_length(client, session_id: str) -> int:
+    return (await client.get(f"/session/{session_id}")).json()["history_total"]
+
+
+def test_chat_replays_repeated_key_without_response_cache(api):
+    assert response_cache.RESPONSE_CACHE == "off"
+
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        headers = {"Idempotency-Key": "turn-1"}
+        first = await client.post(f"/chat/{session_id}", json={"message": SCRIPTED_ANSWERS[0]}, headers=headers)
+        length = await history_length(client, session_id)
+        again = await client.post(f"/chat/{session_id}", json={"message": SCRIPTED_ANSWERS[0]}, headers=headers)
+        assert again.status_code == 200 and again.json() == first.json()
+        assert await history_length(client, session_id) == length
+
+        other = await client.post(f"/chat/{session_id}", json={"message": "4 buildings"}, headers=headers)
+        assert other.status_code == 422
+
+        # The key outlives later turns
+        await client.post(f"/chat/{session_id}", json={"message": SCRIPTED_ANSWERS[1]})
+        late = await client.post(f"/chat/{session_id}", json={"message": SCRIPTED_ANSWERS[0]}, headers=headers)
+        assert late.json() == first.json()
+    api(scenario)
+
+
+def test_stream_replays_repeated_key(api):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        headers = {"Idempotency-Key": "turn-1"}
+        body = {"message": SCRIPTED_ANSWERS[0]}
+        first = sse_events((await client.post(f"/chat/{session_id}/stream", json=body, headers=headers)).text)
+        length = await history_length(client, session_id)
+        again = sse_events((await client.post(f"/chat/{session_id}/stream", json=body, headers=headers)).text)
+        assert again[-1] == first[-1] and first[-1][0] == "done"
+        assert again[0] == ("token", {"text": first[-1][1]["agent_message"]})
+        assert await history_length(client, session_id) == length
+
+        # A /chat retry of the streamed turn is recognized too
+        replayed = await client.post(f"/chat/{session_id}", json=body, headers=headers)
+        assert replayed.json() == first[-1][1]
+    api(scenario)
+
+
+def test_records_are_bounded(api, monkeypatch):
+    monkeypatch.setattr(fastapi_app, "IDEMPOTENCY_KEYS", 2)
+
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        for n, answer in enumerate(SCRIPTED_ANSWERS[:3]):
+            await client.post(f"/chat/{session_id}", json={"message": answer}, headers={"Idempotency-Key": str(n)})
+        record = await fastapi_app.session_store.get(session_id)
+        assert list(record["idempotency"]) == ["1", "2"]
+    api(scenario)
@@ -0,0 +1,54 @@
+# tests/test_intake.py
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from prompts import QUESTIONS, QUESTION_IDS
+import fastapi_app
+import metrics
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+
+
+def llm_calls() -> int:
+    return sum(series[-1] for series in metrics.LLM_SECONDS.series.values())
+
+
+def test_json_answers_fill_the_session_without_an_llm_call(api):
+    given = {qid: ANSWERS[qid] for qid in QUESTION_IDS[:5]}
+
+    async def scenario(client):
+        calls = llm_calls()
+        resp = await client.post("/intake", json={"answers": given})
+        session = (await client.get(f"/session/{resp.json()['session_id']}")).json()
+        return resp, session, llm_calls() - calls
+
+    resp, session, calls = api(scenario)
+    assert resp.status_code == 200 and calls == 0
+    assert session["answers"] == given
+    assert resp.json()["status"] == "not done" and QUESTIONS[5] in resp.json()["agent_message"]
+
+
+def test_complete_answer_set_finishes_the_conversation(api, monkeypatch):
+    monkeypatch.setattr(fastapi_app, "BOQ_ON_COMPLETION", False)  # its BOQ job would call the model
+
+    async def scenario(client):
+        calls = llm_calls()
+        resp = await client.post("/intake", json={"answers": ANSWERS})
+        return resp.json(), llm_calls() - calls
+
+    resp, calls = api(scenario)
+    assert calls == 0
+    assert (resp["status"], resp["progress"]) == ("done", 100)
+    assert SCRIPTED_ANSWERS[-1] in resp["agent_message"]
+
+
+def test_document_is_read_in_one_call(api):
+    document = "Project notes.\n" + "\n".join(SCRIPTED_ANSWERS[:3])
+
+    async def scenario(client):
+        calls = llm_calls()
+        resp = await client.post("/intake", json={"document": document})
+        session = (await client.get(f"/session/{resp.json()['session_id']}")).json()
+        return session, llm_calls() - calls
+
+    session, calls = api(scenario)
+    assert calls == 1
+    assert session["answers"] == {qid: ANSWERS[qid] for qid in QUESTION_IDS[:3]}
@@ -0,0 +1,143 @@
+# tests/test_llm_admission.py
+import time
+import asyncio
+import pytest
+from langchain_core.messages import HumanMessage
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.load import install_fake_model
+import llm_admission
+import fastapi_app
+from llm_admission import AdmissionController, LLMRateLimited, LLMSaturated
+import metrics
+
+MESSAGES = [HumanMessage(content="Write the BOQ")]
+# Free text the local validator leaves to the chat model
+FREE_TEXT = "We have three buildings, I think"
+
+
+def admissions(outcome: str) -> float:
+    return metrics.LLM_ADMISSIONS.series.get((outcome,), 0)
+
+
+def call_tokens(fake: FakeChatModel) -> int:
+    """Tokens one plain call on the fake model charges against its quota"""
+    content = fake._content(MESSAGES)
+    return fake._usage(MESSAGES, content)["total_tokens"]
+
+
+def test_backoff_doubles_up_to_the_cap_and_honors_retry_after(monkeypatch):
+    monkeypatch.setattr(llm_admission.random, "uniform", lambda low, high: high)
+    controller = AdmissionController()
+    base, cap = llm_admission.LLM_BACKOFF_BASE, llm_admission.LLM_BACKOFF_MAX
+    assert [controller._backoff(attempt, 0.0) for attempt in range(3)] == [base, base * 2, base * 4]
+    assert controller._backoff(30, 0.0) == cap
+    assert controller._backoff(0, base * 3) == base * 3
+
+
+def test_rate_limited_call_waits_for_retry_after_and_succeeds():
+    fake = FakeChatModel(latency=0)
+    # Room for one call; the second one is short by 0.3 s of refill
+    tokens = call_tokens(fake)
+    fake.quota_tpm = 2 * tokens * 60 / (60 + 0.3)
+    controller = AdmissionController(max_retries=2)
+    retried = admissions("retried")
+
+    async def scenario():
+        await controller.call(lambda: fake.ainvoke(MESSAGES), tokens)
+        start = time.perf_counter()
+        response = await controller.call(lambda: fake.ainvoke(MESSAGES), tokens)
+        return response, time.perf_counter() - start
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.content.startswith("## BOQ")
+    assert fake.rate_limited_calls == 1
+    assert admissions("retried") == retried + 1
+    assert elapsed >= 0.3
+
+
+def test_quota_exhausted_after_retries_raises_rate_limited():
+    fake = FakeChatModel(latency=0)
+    tokens = call_tokens(fake)
+    fake.quota_tpm = tokens * 60 / 61  # short by one second of refill on every call
+    controller = AdmissionController(max_retries=0)
+
+    with pytest.raises(LLMRateLimited) as error:
+        asyncio.run(controller.call(lambda: fake.ainvoke(MESSAGES), tokens))
+    assert error.value.status_code == 429
+    assert error.value.retry_after == pytest.approx(1.0, abs=0.01)
+
+
+def test_full_queue_raises_saturated():
+    controller = AdmissionController(max_in_flight=1, queue_size=1, queue_timeout=5)
+    slow = FakeChatModel(latency=0.2)
+
+    async def scenario():
+        running = asyncio.create_task(controller.call(lambda: slow.ainvoke(MESSAGES), 10))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.create_task(controller.call(lambda: slow.ainvoke(MESSAGES), 10))
+        await asyncio.sleep(0.05)
+        assert (controller.in_flight, controller.waiting) == (1, 1)
+        with pytest.raises(LLMSaturated) as error:
+            await controller.call(lambda: slow.ainvoke(MESSAGES), 10)
+        await asyncio.gather(running, waiting)
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503 and error.retry_after
+
+
+async def history_total(client, session_id: str) -> int:
+    return (await client.get(f"/session/{session_id}")).json()["history_total"]
+
+
+def test_rate_limited_turn_returns_429_and_records_nothing(api, monkeypatch):
+    monkeypatch.setattr(llm_admission, "_controller", AdmissionController(max_retries=0))
+
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        before = await history_total(client, session_id)
+        install_fake_model(FakeChatModel(latency=0, quota_tpm=60))  # one token a second: never enough
+        resp = await client.post(f"/chat/{session_id}", json={"message": FREE_TEXT})
+        return resp, before, await history_total(client, session_id)
+
+    resp, before, after = api(scenario)
+    assert resp.status_code == 429 and int(resp.headers["Retry-After"]) > 0
+    assert after == before
+
+
+def test_full_queue_turn_returns_503(api, monkeypatch):
+    install_fake_model(FakeChatModel(latency=0.2))
+    monkeypatch.setattr(llm_admission, "_controller", AdmissionController(max_in_flight=1, queue_size=1))
+
+    async def turn(client, session_id: str, buildings: str, delay: float):
+        await asyncio.sleep(delay)  # in order: one call in flight, one waiting, one turned away
+        # Different prompts, so the calls are not shared as one cache miss
+        return await client.post(f"/chat/{session_id}", json={"message": f"We have {buildings} buildings, I think"})
+
+    async def scenario(client):
+        sessions = [(await client.post("/start")).json()["session_id"] for _ in range(3)]
+        turns = [turn(client, session_id, buildings, n * 0.05)
+                 for n, (session_id, buildings) in enumerate(zip(sessions, ("two", "three", "four")))]
+        return await asyncio.gather(*turns)
+
+    responses = api(scenario)
+    assert [resp.status_code for resp in responses] == [200, 200, 503]
+    assert int(responses[2].headers["Retry-After"]) > 0
+
+
+def test_unusable_answer_returns_502_and_keeps_progress(api):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        await client.post(f"/chat/{session_id}", json={"message": "3 buildings"})
+        before = (await client.get(f"/session/{session_id}")).json()
+        install_fake_model(FakeChatModel(latency=0, malformed_rate=1.0))
+        resp = await client.post(f"/chat/{session_id}", json={"message": FREE_TEXT})
+        after = (await client.get(f"/session/{session_id}")).json()
+        return resp, before, after, await fastapi_app.session_store.get(session_id)
+
+    resp, before, after, record = api(scenario)
+    assert resp.status_code == 502
+    for field in ("history_total", "answers", "version"):
+        assert after[field] == before[field], field
+    assert record["progress"] > 0
+    assert not any("Error processing request" in str(message) for message in after["history"])
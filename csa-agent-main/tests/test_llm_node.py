@@ -0,0 +1,151 @@
+# tests/test_llm_node.py
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage
+import main
+import model_router
+import response_cache
+from llm_admission import LLMFailed
+from model_router import ModelRouter
+from response_cache import MemoryResponseCache
+from main import LLM_Response, QuestionAnswer
+from prompts import QUESTIONS, QUESTION_IDS, render_summary_table
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+
+
+def run_turn(monkeypatch, answers: dict, response: LLM_Response, reply: str = "That's all") -> dict:
+    async def invoke(messages, schema=LLM_Response, namespace="chat", tier="default", valid=None):
+        return response
+    monkeypatch.setattr(main, "invoke_structured_llm", invoke)
+    state = {"history": [AIMessage(content=QUESTIONS[-1])], "user_message": reply, "answers": answers}
+    return asyncio.run(main.llm_node(state))
+
+
+def test_done_without_answers_renders_summary_from_recorded_answers(monkeypatch):
+    response = LLM_Response(status="done", next_response="", answers=[], progress=100)
+    updates = run_turn(monkeypatch, ANSWERS, response)
+    assert updates["status"] == "done"
+    assert updates["next_response"] == render_summary_table(ANSWERS)
+
+
+def test_done_merges_this_turns_answers(monkeypatch):
+    recorded = {qid: answer for qid, answer in ANSWERS.items() if qid != QUESTION_IDS[-1]}
+    response = LLM_Response(status="done", next_response="", progress=100,
+                            answers=[QuestionAnswer(question_id=QUESTION_IDS[-1], answer=SCRIPTED_ANSWERS[-1])])
+    updates = run_turn(monkeypatch, recorded, response, SCRIPTED_ANSWERS[-1])
+    assert updates["status"] == "done"
+    assert updates["next_response"] == render_summary_table(ANSWERS)
+
+
+def test_done_with_question_open_keeps_asking(monkeypatch):
+    recorded = {qid: answer for qid, answer in ANSWERS.items() if qid != QUESTION_IDS[-1]}
+    response = LLM_Response(status="done", next_response="", answers=[], progress=100)
+    updates = run_turn(monkeypatch, recorded, response)
+    assert updates["status"] == "not done"
+    assert updates["next_response"] == QUESTIONS[-1]
+    assert updates["progress"] == main.progress_of(recorded)
+
+
+class ScriptedModel:
+    """Structured model answering with the given responses in turn, recording the tiers asked"""
+    def __init__(self, responses: list):
+        self.responses = responses
+        self.tiers = []
+
+    def bind(self, schema, tier):
+        model = self
+
+        class Bound:
+            async def ainvoke(self, messages, config=None):
+                model.tiers.append(tier)
+                return model.responses[len(model.tiers) - 1]
+        return Bound()
+
+
+def run_cached_turns(monkeypatch, routing: str, reply: str, responses: list, turns: int) -> tuple:
+    """llm_node turns on the same state behind a fresh memory cache: (outcomes, tiers called)"""
+    model = ScriptedModel(responses)
+    monkeypatch.setattr(main, "get_structured_llm", model.bind)
+    monkeypatch.setattr(response_cache, "_cache", MemoryResponseCache())
+    monkeypatch.setattr(model_router, "_router", ModelRouter(routing=routing))
+    state = {"history": [AIMessage(content=QUESTIONS[0])], "user_message": reply, "answers": {}}
+
+    async def scenario():
+        outcomes = []
+        for _ in range(turns):
+            try:
+                outcomes.append(await main.llm_node(state))
+            except LLMFailed as e:
+                outcomes.append(e)
+        return outcomes
+    return asyncio.run(scenario()), model.tiers
+
+
+GOOD = LLM_Response(status="not done", next_response=QUESTIONS[1], progress=5,
+                    answers=[QuestionAnswer(question_id=QUESTION_IDS[0], answer="Yes")])
+
+
+def test_rejected_default_answer_is_not_served_to_the_retry(monkeypatch):
+    bad = LLM_Response(status="not done", next_response="", answers=[], progress=0)
+    outcomes, tiers = run_cached_turns(monkeypatch, "off", "Yes", [bad, GOOD], 3)
+    assert isinstance(outcomes[0], LLMFailed)
+    assert [o["next_response"] for o in outcomes[1:]] == [QUESTIONS[1]] * 2
+    assert tiers == ["default", "default"]
+
+
+def test_rejected_fast_answer_is_not_cached(monkeypatch):
+    bad = LLM_Response(status="done", next_response="", answers=[], progress=100)
+    outcomes, tiers = run_cached_turns(monkeypatch, "on", "Yes", [bad, GOOD, bad], 2)
+    assert [o["next_response"] for o in outcomes] == [QUESTIONS[1]] * 2
+    # the retry asks the fast model again, then reuses the accepted default answer
+    assert tiers == ["fast", "default", "fast"]
+
+
+SIP_SECTION = "SIP Trunk & ISP"
+BEFORE_SIP = {qid: ANSWERS[qid] for qid in QUESTION_IDS[:7]}
+
+
+def sip_response(*question_ids: str) -> LLM_Response:
+    return LLM_Response(status="not done", next_response="Thanks. Next question?", progress=70,
+                        answers=[QuestionAnswer(question_id=qid, answer=ANSWERS[qid]) for qid in question_ids])
+
+
+def run_scoped_turn(monkeypatch, mode: str, response: LLM_Response) -> tuple:
+    """A default-tier turn in the SIP section under PROMPT_HISTORY_MODE=mode: (updates or error, checks made)"""
+    checks = []
+    response_problem = main.response_problem
+
+    def recording_problem(response, answers, section=None, strict=True):
+        checks.append((section, strict))
+        return response_problem(response, answers, section, strict)
+
+    monkeypatch.setattr(main, "PROMPT_HISTORY_MODE", mode)
+    monkeypatch.setattr(main, "response_problem", recording_problem)
+    monkeypatch.setattr(model_router, "_router", ModelRouter(routing="off"))
+    try:
+        return run_turn(monkeypatch, BEFORE_SIP, response, ANSWERS["Q8"]), checks
+    except LLMFailed as e:
+        return e, checks
+
+
+def test_section_turn_accepts_answers_in_its_section(monkeypatch):
+    updates, checks = run_scoped_turn(monkeypatch, "section", sip_response("Q8", "Q9"))
+    assert checks == [(SIP_SECTION, False)]
+    assert updates["answers"] == {"Q8": ANSWERS["Q8"], "Q9": ANSWERS["Q9"]}
+    assert updates["progress"] == main.progress_of({**BEFORE_SIP, "Q8": ANSWERS["Q8"], "Q9": ANSWERS["Q9"]})
+
+
+def test_section_turn_rejects_answers_past_its_section(monkeypatch):
+    error, checks = run_scoped_turn(monkeypatch, "section", sip_response("Q8", "Q10"))
+    assert checks == [(SIP_SECTION, False)]
+    assert isinstance(error, LLMFailed)
+    assert main.response_problem(sip_response("Q8", "Q10"), BEFORE_SIP, SIP_SECTION) == \
+        "answers past section SIP Trunk & ISP: Q10"
+
+
+def test_full_history_turn_is_not_limited_to_a_section(monkeypatch):
+    updates, checks = run_scoped_turn(monkeypatch, "full", sip_response("Q8", "Q10"))
+    assert checks == [(None, False)]
+    assert updates["answers"] == {"Q8": ANSWERS["Q8"], "Q10": ANSWERS["Q10"]}
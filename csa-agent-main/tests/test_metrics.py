@@ -0,0 +1,77 @@
+# tests/test_metrics.py
+import io
+import re
+import logging
+import pytest
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+import fastapi_app
+import metrics
+
+
+def counts(text: str, name: str) -> dict:
+    """label set -> value of every sample of one metric in /metrics output"""
+    return {labels: float(value) for labels, value in re.findall(rf"^{name}\{{(.*)\}} (\S+)$", text, re.MULTILINE)}
+
+
+def test_metrics_expose_stage_histograms_after_a_turn(api):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        before = (await client.get("/metrics")).text
+        # Free text the local validator leaves to the chat model
+        resp = await client.post(f"/chat/{session_id}", json={"message": "We have three buildings, I think"})
+        assert resp.status_code == 200
+        return before, await client.get("/metrics")
+
+    before, resp = api(scenario)
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert "# TYPE csa_stage_seconds histogram" in text
+    old, new = counts(before, "csa_stage_seconds_count"), counts(text, "csa_stage_seconds_count")
+    for stage in ("store_get", "checkpoint_get", "prompt_build", "llm_call", "structured_parse",
+                  "graph_overhead", "store_put", "turn"):
+        key = f'stage="{stage}"'
+        assert new.get(key, 0) > old.get(key, 0), stage
+    turns = int(new['stage="turn"'])
+    assert f'csa_stage_seconds_bucket{{stage="turn",le="+Inf"}} {turns}' in text
+    assert any(value > 0 for value in counts(text, "csa_llm_request_seconds_count").values())
+    assert counts(text, "csa_turns_total").get('path="llm"', 0) > counts(before, "csa_turns_total").get('path="llm"', 0)
+
+
+def test_local_turn_skips_the_model(api):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        before = counts((await client.get("/metrics")).text, "csa_turns_total")
+        await client.post(f"/chat/{session_id}", json={"message": SCRIPTED_ANSWERS[0]})
+        return before, counts((await client.get("/metrics")).text, "csa_turns_total")
+
+    before, after = api(scenario)
+    assert after.get('path="local"', 0) == before.get('path="local"', 0) + 1
+    assert after.get('path="llm"', 0) == before.get('path="llm"', 0)
+
+
+@pytest.fixture
+def log_lines():
+    """Lines the application loggers write through metrics.log_handler"""
+    stream = io.StringIO()
+    handler = metrics.log_handler(stream)
+    loggers = [metrics.logger, logging.getLogger("fastapi_app")]
+    for logger in loggers:
+        logger.addHandler(handler)
+    yield lambda: stream.getvalue().splitlines()
+    for logger in loggers:
+        logger.removeHandler(handler)
+
+
+def test_log_lines_carry_the_sessions_trace_id(api, log_lines):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        return session_id, (await fastapi_app.session_store.get(session_id))["trace_id"]
+
+    session_id, trace_id = api(scenario)
+    started = [line for line in log_lines() if line.endswith(f"session {session_id} started")]
+    assert len(started) == 1 and f" INFO metrics [trace {trace_id}] " in started[0]
+
+
+def test_errors_are_logged_at_error_level_outside_a_session(log_lines):
+    metrics.record_error("boq", RuntimeError("model down"))
+    assert log_lines()[-1].endswith(" ERROR metrics [trace -] boq: model down")
@@ -0,0 +1,84 @@
+# tests/test_model_router.py
+import asyncio
+import pytest
+from model_router import ModelRouter, AnswerRejected
+from llm_admission import LLMSaturated
+import metrics
+
+
+def routes(tier: str, reason: str) -> float:
+    return metrics.MODEL_ROUTES.series.get((tier, reason), 0)
+
+
+@pytest.mark.parametrize("reply, open_questions, expected", [
+    ("Yes", 5, ("fast", "simple")),
+    ("Yes", 1, ("default", "summary")),
+    ("Living Room 100, Bed Room 200, Wash Room 0, Kitchen 20, Lobby 4, Gym 2", 5, ("default", "complex")),
+    ("x" * 200, 5, ("default", "complex")),
+])
+def test_choose_reasons(reply, open_questions, expected):
+    assert ModelRouter(routing="on").choose(reply, open_questions) == expected
+
+
+def test_choose_with_routing_off():
+    assert ModelRouter(routing="off").choose("Yes", 5) == ("default", "routing_off")
+
+
+def test_slow_default_model_sends_complex_turns_to_the_fast_one():
+    router = ModelRouter(routing="on", latency_budget=2.0)
+    router.observe("default", 1.0)
+    assert router.choose("x" * 200, 5) == ("default", "complex")
+    router.observe("default", 30.0)
+    assert router.choose("x" * 200, 5) == ("fast", "latency_budget")
+
+
+def run_call(router, route, answers: dict, check):
+    calls = []
+
+    async def attempt(tier):
+        calls.append(tier)
+        answer = answers[tier]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    return asyncio.run(router.call(route, attempt, check)), calls
+
+
+def reject(bad: str):
+    return lambda result, tier: f"{tier} said {bad}" if result == bad else None
+
+
+def test_rejected_fast_answer_is_escalated():
+    escalated = routes("default", "escalated")
+    (result, tier), calls = run_call(ModelRouter(routing="on"), ("fast", "simple"),
+                                     {"fast": "bad", "default": "good"}, reject("bad"))
+    assert (result, tier, calls) == ("good", "default", ["fast", "default"])
+    assert routes("default", "escalated") == escalated + 1
+
+
+def test_failing_fast_call_is_escalated():
+    (result, tier), calls = run_call(ModelRouter(routing="on"), ("fast", "simple"),
+                                     {"fast": ValueError("truncated JSON"), "default": "good"}, reject("bad"))
+    assert (result, tier, calls) == ("good", "default", ["fast", "default"])
+
+
+def test_accepted_fast_answer_is_used():
+    (result, tier), calls = run_call(ModelRouter(routing="on"), ("fast", "simple"),
+                                     {"fast": "good", "default": "unused"}, reject("bad"))
+    assert (result, tier, calls) == ("good", "fast", ["fast"])
+
+
+def test_unavailable_model_is_not_escalated():
+    with pytest.raises(LLMSaturated):
+        run_call(ModelRouter(routing="on"), ("fast", "simple"),
+                 {"fast": LLMSaturated("queue full"), "default": "good"}, reject("bad"))
+
+
+def test_rejected_default_answer_raises():
+    rejected = routes("default", "rejected")
+    with pytest.raises(AnswerRejected, match="default said bad"):
+        run_call(ModelRouter(routing="on"), ("fast", "simple"), {"fast": "bad", "default": "bad"}, reject("bad"))
+    with pytest.raises(AnswerRejected):
+        run_call(ModelRouter(routing="off"), ("default", "routing_off"), {"default": "bad"}, reject("bad"))
+    assert routes("default", "rejected") == rejected + 2
@@ -0,0 +1,64 @@
+# tests/test_response_cache.py
+import asyncio
+from response_cache import MemoryResponseCache, DiskResponseCache, cache_key
+
+
+def computations(values: list):
+    """compute() returning the given values in turn, and the list of calls made"""
+    calls = []
+
+    async def compute():
+        calls.append(len(calls))
+        return values[len(calls) - 1]
+    return compute, calls
+
+
+def test_result_is_stored_and_reused():
+    cache = MemoryResponseCache()
+    key = cache_key("chat", "prompt")
+    compute, calls = computations(["first", "second"])
+
+    async def scenario():
+        return [await cache.get_or_compute(key, compute) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == ["first", "first"] and len(calls) == 1
+
+
+def test_rejected_result_is_returned_but_not_stored(tmp_path):
+    for cache in (MemoryResponseCache(), DiskResponseCache(str(tmp_path / "cache.db"))):
+        key = cache_key("chat", "prompt")
+        compute, calls = computations(["bad", "good", "unused"])
+        valid = lambda value: value != "bad"
+
+        async def scenario():
+            return [await cache.get_or_compute(key, compute, valid) for _ in range(3)]
+
+        assert asyncio.run(scenario()) == ["bad", "good", "good"] and len(calls) == 2
+        asyncio.run(cache.close())
+
+
+def test_stored_value_rejected_later_is_a_miss():
+    cache = MemoryResponseCache()
+    key = cache_key("chat", "prompt")
+    compute, calls = computations(["old", "new"])
+
+    async def scenario():
+        await cache.get_or_compute(key, compute)
+        return await cache.get_or_compute(key, compute, lambda value: value != "old")
+
+    assert asyncio.run(scenario()) == "new" and len(calls) == 2
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = MemoryResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("chat:k", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["value"] * 5 and len(calls) == 1
@@ -0,0 +1,61 @@
+# tests/test_session_commit.py
+import asyncio
+from datetime import datetime
+import pytest
+from prompts import QUESTION_IDS
+from session_store import InMemorySessionStore, SQLiteSessionStore
+import fastapi_app
+import metrics
+
+
+def record(status: str) -> dict:
+    return {"created_at": datetime.now(), "updated_at": datetime.now(), "status": status, "progress": 0}
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_one_of_two_concurrent_commits_wins(kind, tmp_path):
+    async def scenario():
+        if kind == "memory":
+            first = second = InMemorySessionStore()
+        else:
+            # two workers sharing the database file
+            first, second = (SQLiteSessionStore(str(tmp_path / "sessions.db")) for _ in range(2))
+        assert await first.commit("s", record("started"), 0)
+        results = await asyncio.gather(first.commit("s", record("a"), 1), second.commit("s", record("b"), 1))
+        stored = await second.get("s")
+        for store in {first, second}:
+            await store.close()
+        return results, stored
+
+    results, stored = asyncio.run(scenario())
+    assert sorted(results) == [False, True]
+    assert stored["version"] == 2 and stored["status"] == ("a" if results[0] else "b")
+
+
+def test_concurrent_turns_on_one_session_one_gets_409(api, monkeypatch):
+    commit = fastapi_app.session_store.commit
+
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        # as if on two workers: no shared session lock, and both turns read the
+        # session before either commits
+        monkeypatch.setattr(fastapi_app, "session_lock", lambda session_id: asyncio.Lock())
+        both_read = asyncio.Barrier(2)
+
+        async def commit_after_both_read(*args):
+            await both_read.wait()
+            return await commit(*args)
+
+        monkeypatch.setattr(fastapi_app.session_store, "commit", commit_after_both_read)
+        conflicts = metrics.SESSION_CONFLICTS.series.get(("chat",), 0)
+        responses = await asyncio.gather(*(client.post(f"/chat/{session_id}", json={"message": message})
+                                           for message in ("3 buildings", "4 buildings")))
+        monkeypatch.setattr(fastapi_app.session_store, "commit", commit)
+        session = (await client.get(f"/session/{session_id}")).json()
+        return responses, session, metrics.SESSION_CONFLICTS.series.get(("chat",), 0) - conflicts
+
+    responses, session, conflicts = api(scenario)
+    assert sorted(r.status_code for r in responses) == [200, 409] and conflicts == 1
+    winner = next(r for r in responses if r.status_code == 200)
+    assert session["version"] == winner.json()["version"] == 2
+    assert session["answers"] == {QUESTION_IDS[0]: "3 buildings" if winner is responses[0] else "4 buildings"}
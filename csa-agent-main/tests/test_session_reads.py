@@ -0,0 +1,94 @@
+# tests/test_session_reads.py
+import asyncio
+import gzip
+import httpx
+from benchmarks.fake_llm import SCRIPTED_ANSWERS
+from compression import CompressionMiddleware
+from prompts import QUESTION_IDS
+
+ANSWERS = dict(zip(QUESTION_IDS, SCRIPTED_ANSWERS))
+
+
+def test_unchanged_session_is_answered_with_304(api):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        first = await client.get(f"/session/{session_id}")
+        etag = first.headers["ETag"]
+        again = await client.get(f"/session/{session_id}", headers={"If-None-Match": etag})
+        other_page = await client.get(f"/session/{session_id}", params={"since": 1},
+                                      headers={"If-None-Match": etag})
+        await client.post(f"/chat/{session_id}", json={"message": SCRIPTED_ANSWERS[0]})
+        changed = await client.get(f"/session/{session_id}", headers={"If-None-Match": etag})
+        return first, again, other_page, changed
+
+    first, again, other_page, changed = api(scenario)
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+    assert again.status_code == 304 and again.content == b"" and again.headers["ETag"] == first.headers["ETag"]
+    assert other_page.status_code == 200
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+
+
+def test_history_is_paged_with_since_and_limit(api):
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        for answer in SCRIPTED_ANSWERS[:3]:
+            await client.post(f"/chat/{session_id}", json={"message": answer})
+        pages = {}
+        for params in ({}, {"since": 2, "limit": 2}, {"since": 5}, {"since": 99}, {"limit": 0}):
+            pages[tuple(params.items())] = (await client.get(f"/session/{session_id}", params=params)).json()
+        bad = await client.get(f"/session/{session_id}", params={"since": -1})
+        return pages, bad
+
+    pages, bad = api(scenario)
+    full = pages[()]
+    assert full["history_total"] == len(full["history"]) == 7 and full["history_start"] == 0
+    page = pages[(("since", 2), ("limit", 2))]
+    assert (page["history"], page["history_start"], page["history_total"]) == (full["history"][2:4], 2, 7)
+    assert pages[(("since", 5),)]["history"] == full["history"][5:]
+    assert (pages[(("since", 99),)]["history"], pages[(("since", 99),)]["history_start"]) == ([], 7)
+    assert pages[(("limit", 0),)]["history"] == [] and pages[(("limit", 0),)]["answers"] == full["answers"]
+    assert bad.status_code == 400
+
+
+def compressed_responses(sizes: list, accept_encoding: str = "gzip", minimum_size: int = 100) -> list:
+    """Responses of an app sending bodies of the given sizes through CompressionMiddleware"""
+    async def app(scope, receive, send):
+        size = int(scope["path"].strip("/"))
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/plain"), (b"content-length", str(size).encode())]})
+        await send({"type": "http.response.body", "body": b"a" * size})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=CompressionMiddleware(app, minimum_size=minimum_size))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(f"/{size}", headers={"Accept-Encoding": accept_encoding}) for size in sizes]
+    return asyncio.run(scenario())
+
+
+def test_only_bodies_above_the_threshold_are_gzipped():
+    small, large = compressed_responses([99, 100])
+    assert "content-encoding" not in small.headers and small.content == b"a" * 99
+    assert large.headers["content-encoding"] == "gzip" and large.content == b"a" * 100
+    assert int(large.headers["content-length"]) == len(gzip.compress(b"a" * 100, compresslevel=6, mtime=0))
+    assert "Accept-Encoding" in large.headers["vary"]
+
+
+def test_bodies_are_sent_as_is_without_gzip_in_accept_encoding():
+    (response,) = compressed_responses([1000], accept_encoding="identity")
+    assert "content-encoding" not in response.headers and len(response.content) == 1000
+
+
+def test_completed_session_read_is_gzipped(api, monkeypatch):
+    import fastapi_app
+    monkeypatch.setattr(fastapi_app, "BOQ_ON_COMPLETION", False)
+
+    async def scenario(client):
+        session_id = (await client.post("/intake", json={"answers": ANSWERS})).json()["session_id"]
+        full = await client.get(f"/session/{session_id}", headers={"Accept-Encoding": "gzip"})
+        health = await client.get("/health", headers={"Accept-Encoding": "gzip"})
+        return full, health
+
+    full, health = api(scenario)
+    assert full.headers["content-encoding"] == "gzip" and int(full.headers["content-length"]) < len(full.content)
+    assert full.json()["status"] == "done"
+    assert len(health.content) < 1024 and "content-encoding" not in health.headers
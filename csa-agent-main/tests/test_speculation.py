@@ -0,0 +1,57 @@
+# tests/test_speculation.py
+from prompts import QUESTION_IDS, QUESTIONS
+import fastapi_app
+import metrics
+
+
+def speculations(outcome: str) -> float:
+    return metrics.SPECULATIONS.series.get((outcome,), 0)
+
+
+def run_typed_turn(api, monkeypatch, draft: str, message: str) -> tuple:
+    """Start a session, report draft as typed, send message; returns (typing, chat, session, counter deltas)"""
+    monkeypatch.setattr(fastapi_app, "SPECULATIVE_TURNS", True)
+
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        counts = {outcome: speculations(outcome) for outcome in ("prepared", "used", "discarded")}
+        typing = (await client.post(f"/chat/{session_id}/typing", json={"draft": draft})).json()
+        chat = await client.post(f"/chat/{session_id}", json={"message": message})
+        session = (await client.get(f"/session/{session_id}")).json()
+        return typing, chat, session, {outcome: speculations(outcome) - n for outcome, n in counts.items()}
+    return api(scenario)
+
+
+def test_turn_answered_ahead_is_committed_when_the_message_matches(api, monkeypatch):
+    typing, chat, session, counts = run_typed_turn(api, monkeypatch, "3 buildings", "3 buildings")
+    assert typing["answered_ahead"]
+    assert chat.status_code == 200 and QUESTIONS[1] in chat.json()["agent_message"]
+    assert session["answers"] == {QUESTION_IDS[0]: "3 buildings"}
+    assert counts == {"prepared": 1, "used": 1, "discarded": 0}
+
+
+def test_turn_answered_ahead_is_discarded_when_the_message_differs(api, monkeypatch):
+    typing, chat, session, counts = run_typed_turn(api, monkeypatch, "3 buildings", "4 buildings")
+    assert typing["answered_ahead"]
+    assert chat.status_code == 200
+    assert counts == {"prepared": 1, "used": 0, "discarded": 1}
+    # the speculative reply to the draft is not part of the conversation
+    assert session["answers"] == {QUESTION_IDS[0]: "4 buildings"}
+    assert "4 buildings" in map(str, session["history"])
+    assert not any("3 buildings" in str(entry) for entry in session["history"])
+    assert session["history_total"] == 3
+
+
+def test_discarded_turn_stays_out_of_later_turns(api, monkeypatch):
+    monkeypatch.setattr(fastapi_app, "SPECULATIVE_TURNS", True)
+
+    async def scenario(client):
+        session_id = (await client.post("/start")).json()["session_id"]
+        await client.post(f"/chat/{session_id}/typing", json={"draft": "3 buildings"})
+        await client.post(f"/chat/{session_id}", json={"message": "4 buildings"})
+        await client.post(f"/chat/{session_id}", json={"message": "Yes"})
+        return (await client.get(f"/session/{session_id}")).json()
+
+    session = api(scenario)
+    assert session["answers"] == {QUESTION_IDS[0]: "4 buildings", QUESTION_IDS[1]: "Yes"}
+    assert not any("3 buildings" in str(entry) for entry in session["history"])